@@ -0,0 +1,151 @@
+"""各项基准测试：曲库扫描、播放列表加载、曲目加载、跳转、壁纸切换和图标加载"""
+import random
+import time
+
+from .runner import benchmark, time_calls
+from .synthetic import library_paths, make_images, make_library
+
+# 各规模的重复次数：小曲库多跑几次取中位数，十万首只跑一次
+_REPEATS = {1000: 5, 10000: 3}
+# 曲目加载基准使用的曲目数和跳转次数
+LOAD_TRACKS = 200
+SEEK_COUNT = 1000
+# 壁纸源图尺寸、窗口尺寸和切换次数
+WALLPAPER_SIZE = (3000, 2000)
+WINDOW_SIZE = (1280, 720)
+WALLPAPER_SWITCHES = 10
+ICON_COUNT = 20
+
+
+def repeats(size):
+    return _REPEATS.get(size, 1)
+
+
+def fixture_library(ctx, size):
+    return make_library(ctx.path("fixtures", f"library_{size}"), size)
+
+
+@benchmark("library.scan")
+def library_scan(ctx):
+    """LibraryIndex：空数据库首次扫描，以及文件未变化时的增量重新扫描"""
+    from player.library_index import LibraryIndex
+
+    for size in ctx.sizes:
+        root = fixture_library(ctx, size)
+        cold, warm = [], []
+        for _ in range(repeats(size)):
+            db_path = ctx.fresh_path("library.db")
+            start = time.perf_counter()
+            library = LibraryIndex(db_path)
+            library.add_root(root)
+            library.rescan()
+            cold.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            library.rescan()
+            warm.append(time.perf_counter() - start)
+            library.close()
+        ctx.record(f"library.scan.cold.{size}", cold, tracks=size)
+        ctx.record(f"library.scan.warm.{size}", warm, tracks=size)
+
+
+@benchmark("playlist.load_default_playlist")
+def playlist_load(ctx):
+    """PlaylistManager.load_default_playlist：首次加载（空曲库）和重启后再次加载"""
+    root = ctx.tk_root()
+    from player.playlist_manager import PlaylistManager
+
+    for size in ctx.sizes:
+        folder = fixture_library(ctx, size)
+        cold, warm = [], []
+        for _ in range(repeats(size)):
+            db_path = ctx.fresh_path("playlist.db")
+            for samples in (cold, warm):
+                manager = PlaylistManager(root, library_db=db_path)
+                manager.toggle_playlist()
+                start = time.perf_counter()
+                manager.load_default_playlist(folder)
+                root.update_idletasks()
+                samples.append(time.perf_counter() - start)
+                manager.frame.destroy()
+                manager.library.close()
+        ctx.record(f"playlist.load_default_playlist.cold.{size}", cold, tracks=size)
+        ctx.record(f"playlist.load_default_playlist.warm.{size}", warm, tracks=size)
+
+
+def new_player(ctx):
+    from player.audio_player import AudioPlayer
+    from player.media_probe import MetadataCache
+    from player.seek_table import SeekTableCache
+
+    player = AudioPlayer(metadata_cache=MetadataCache(ctx.fresh_path("metadata.json")),
+                         seek_tables=SeekTableCache(ctx.fresh_path("seektables")))
+    player.start()
+    return player
+
+
+@benchmark("player.load")
+def player_load(ctx):
+    """AudioPlayer.load：元数据缓存未命中（解析文件头）和命中时的延迟"""
+    paths = library_paths(fixture_library(ctx, 1000))[:LOAD_TRACKS]
+    player = new_player(ctx)
+    ctx.record("player.load.cold", time_calls(player.load, [(path,) for path in paths]))
+    ctx.record("player.load.warm", time_calls(player.load, [(path,) for path in paths]))
+    ctx.record("player.preload", time_calls(player.preload, [(path,) for path in paths]))
+
+
+@benchmark("player.seek")
+def player_seek(ctx):
+    """AudioPlayer.set_position：播放中随机跳转的延迟"""
+    paths = library_paths(fixture_library(ctx, 1000))
+    player = new_player(ctx)
+    player.load(paths[0])
+    player.play()
+    rng = random.Random(0)
+    positions = [(rng.uniform(0, 300),) for _ in range(SEEK_COUNT)]
+    ctx.record("player.seek", time_calls(player.set_position, positions))
+
+
+@benchmark("wallpaper")
+def wallpaper(ctx):
+    """壁纸：后台解码缩放的耗时，以及有显示器时从点击切换到显示出来的时间"""
+    ctx.require_pil()
+    from player.image_cache import decode_scaled
+
+    paths = make_images(ctx.path("fixtures", "wallpapers"), 5, WALLPAPER_SIZE)
+    ctx.record("wallpaper.decode", time_calls(decode_scaled, [(path, WINDOW_SIZE) for path in paths * 2]),
+               source=list(WALLPAPER_SIZE), target=list(WINDOW_SIZE))
+
+    root = ctx.tk_root()
+    from player.wallpaper_manager import WallpaperManager
+
+    manager = WallpaperManager(root, config_file=ctx.fresh_path("wallpaper_config.json"))
+    for path in paths:
+        manager.add_wallpaper(path)
+    seconds = []
+    for _ in range(WALLPAPER_SWITCHES):
+        start = time.perf_counter()
+        manager.change_play_ground()
+        wanted = manager.wallpaper_list[manager.current_index]
+        while manager.shown_path != wanted and time.perf_counter() - start < 10:
+            root.update()
+            time.sleep(0.0005)
+        seconds.append(time.perf_counter() - start)
+    manager.store.flush()
+    ctx.record("wallpaper.switch", seconds)
+
+
+@benchmark("icon")
+def icon(ctx):
+    """按钮图标：缩略图缓存未命中、命中，以及有显示器时创建 PhotoImage 的耗时"""
+    ctx.require_pil()
+    from player.icon_cache import IconCache
+
+    paths = make_images(ctx.path("fixtures", "icons"), ICON_COUNT, (512, 512), suffix=".png")
+    cache_dir = ctx.fresh_path("icons")
+    cold_cache = IconCache(cache_dir)
+    ctx.record("icon.load.cold", time_calls(cold_cache.load_image, [(path,) for path in paths]))
+    cold_cache.hashes.index.flush()  # 模拟重启：下一个实例从磁盘读取哈希索引
+    ctx.record("icon.load.warm", time_calls(IconCache(cache_dir).load_image, [(path,) for path in paths]))
+
+    ctx.tk_root()
+    ctx.record("icon.photo", time_calls(IconCache(cache_dir).photo, [(path,) for path in paths]))
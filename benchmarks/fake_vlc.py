@@ -0,0 +1,121 @@
+"""基准测试用的 python-vlc 替身：只实现播放器用到的接口，不加载 libVLC、不输出声音
+
+install() 把它注册为 sys.modules["vlc"]，之后 player.audio_player.import_vlc() 导入的就是它。
+每个操作可以配置固定延迟（LATENCY，秒），用于模拟真实 libVLC 的开销；默认为 0，
+此时测到的是播放器自身代码路径的开销。
+"""
+import sys
+import time
+
+LATENCY = {
+    "instance": 0.0,
+    "parse": 0.0,
+    "set_media": 0.0,
+    "play": 0.0,
+    "set_time": 0.0,
+}
+
+
+def _delay(operation):
+    seconds = LATENCY.get(operation, 0.0)
+    if seconds:
+        time.sleep(seconds)
+
+
+class EventType:
+    MediaPlayerEndReached = "MediaPlayerEndReached"
+    MediaPlayerTimeChanged = "MediaPlayerTimeChanged"
+    MediaPlayerLengthChanged = "MediaPlayerLengthChanged"
+
+
+class MediaParseFlag:
+    local = 0
+    network = 1
+
+
+class Media:
+    def __init__(self, path):
+        self.path = path
+        self.duration = -1
+
+    def parse(self):
+        _delay("parse")
+        self.duration = 1000
+
+    def parse_with_options(self, flags, timeout):
+        self.parse()
+
+    def get_duration(self):
+        return self.duration
+
+
+class EventManager:
+    def __init__(self):
+        self.callbacks = {}
+
+    def event_attach(self, event_type, callback, *args):
+        self.callbacks[event_type] = (callback, args)
+
+
+class MediaPlayer:
+    def __init__(self):
+        self.events = EventManager()
+        self.media = None
+        self.playing = False
+        self.time_ms = 0
+        self.volume = 100
+        self.device = None
+
+    def event_manager(self):
+        return self.events
+
+    def set_media(self, media):
+        _delay("set_media")
+        self.media = media
+        self.time_ms = 0
+
+    def audio_output_device_set(self, module, device):
+        self.device = device
+
+    def audio_set_volume(self, volume):
+        self.volume = volume
+
+    def play(self):
+        _delay("play")
+        self.playing = True
+        return 0
+
+    def pause(self):
+        self.playing = False
+
+    def stop(self):
+        self.playing = False
+        self.time_ms = 0
+
+    def is_playing(self):
+        return self.playing
+
+    def get_time(self):
+        return self.time_ms
+
+    def set_time(self, time_ms):
+        _delay("set_time")
+        self.time_ms = time_ms
+
+
+class Instance:
+    def __init__(self, *args):
+        _delay("instance")
+
+    def media_new(self, path):
+        return Media(path)
+
+    def media_player_new(self):
+        return MediaPlayer()
+
+
+def install():
+    """把本模块注册为 vlc，返回它"""
+    module = sys.modules[__name__]
+    sys.modules["vlc"] = module
+    return module
@@ -0,0 +1,81 @@
+"""基准测试入口：在无界面的 Linux 上用替身 libVLC 和合成音频运行，结果写成 JSON 并与基线比较
+
+    python -m benchmarks.run                       # 运行全部，写入 cache/benchmarks/results-*.json
+    python -m benchmarks.run --only player --sizes 1000
+    python -m benchmarks.run --save-baseline       # 把本次结果保存为基线
+    python -m benchmarks.run --baseline other.json --threshold 0.5
+
+与基线相比有项目变慢超过阈值时以退出码 1 结束，可直接用于 CI。
+
+基线 benchmarks/baseline.json 随代码提交，meta 中记录了生成它的提交、Python 版本和机器。
+有意改变性能的提交（或更换了跑基准的机器）之后，在同一台机器上用默认规模重新生成并一起提交：
+
+    python -m benchmarks.run --save-baseline
+"""
+import argparse
+import os
+import sys
+
+if __package__ in (None, ""):
+    # 以 python benchmarks/run.py 运行时也能导入 player 和 benchmarks
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_vlc, runner
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = "1000,10000,100000"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="音乐播放器基准测试")
+    parser.add_argument("--only", action="append", default=[], metavar="NAME",
+                        help="只运行名称以此开头的基准测试（可重复），例如 library、player、wallpaper")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="曲库规模，逗号分隔（默认 1000,10000,100000）")
+    parser.add_argument("--workdir", default="cache/benchmarks", help="合成曲库、临时数据库和结果所在目录")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径（默认写入工作目录）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="用于比较的基线 JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="中位数变慢超过这个比例时视为回退（默认 0.25）")
+    parser.add_argument("--vlc-latency-ms", type=float, default=0.0,
+                        help="给替身 libVLC 的每个操作加上固定延迟，模拟真实开销")
+    args = parser.parse_args(argv)
+
+    fake_vlc.install()
+    for operation in fake_vlc.LATENCY:
+        fake_vlc.LATENCY[operation] = args.vlc_latency_ms / 1000
+    from benchmarks import cases  # noqa: F401  注册所有基准测试
+
+    context = runner.Context(args.workdir, [int(size) for size in args.sizes.split(",") if size])
+    try:
+        results = runner.run(context, args.only)
+    finally:
+        context.close()
+    results["meta"]["vlc_latency_ms"] = args.vlc_latency_ms
+
+    output = args.output or context.path(f"results-{results['meta']['created'].replace(':', '')}.json")
+    runner.save(results, output)
+    print(f"Results written to {output}")
+
+    if args.save_baseline:
+        runner.save(results, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+
+    regressions, improvements = runner.compare(results, runner.load(args.baseline), args.threshold)
+    for name, old, new, ratio in improvements:
+        print(f"  faster  {name:<48} {old:>10.3f} -> {new:>10.3f} ms  (x{ratio:.2f})")
+    for name, old, new, ratio in regressions:
+        print(f"  SLOWER  {name:<48} {old:>10.3f} -> {new:>10.3f} ms  (x{ratio:.2f})")
+    if regressions:
+        print(f"{len(regressions)} regression(s) against {args.baseline}")
+        return 1
+    print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""基准测试的注册、计时统计、结果输出和与基线的比较"""
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import time
+import traceback
+
+BENCHMARKS = []  # 按注册顺序执行的 (名称, 函数)
+
+
+def benchmark(name):
+    """注册一个基准测试：函数接收 Context，通过 ctx.record 记录一项或多项结果"""
+    def register(function):
+        BENCHMARKS.append((name, function))
+        return function
+    return register
+
+
+class Skip(Exception):
+    """当前环境缺少依赖（显示器、Pillow 等）时跳过整个基准测试"""
+
+
+def summarize(seconds):
+    """把一组耗时（秒）汇总为毫秒统计"""
+    ordered = sorted(seconds)
+    count = len(ordered)
+    return {
+        "runs": count,
+        "min_ms": round(ordered[0] * 1000, 4),
+        "median_ms": round(statistics.median(ordered) * 1000, 4),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+        "p95_ms": round(ordered[min(count - 1, int(count * 0.95))] * 1000, 4),
+        "max_ms": round(ordered[-1] * 1000, 4),
+    }
+
+
+def time_calls(function, args_list):
+    """依次调用 function(*args)，返回每次调用的耗时（秒）"""
+    seconds = []
+    for args in args_list:
+        start = time.perf_counter()
+        function(*args)
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+class Context:
+    """一次运行的共享状态：工作目录、曲库规模、结果，以及按需创建的 Tk 根窗口"""
+
+    def __init__(self, workdir, sizes):
+        self.workdir = workdir
+        self.sizes = sizes
+        self.results = {}
+        self.root = None
+        self.display_error = None
+        os.makedirs(workdir, exist_ok=True)
+
+    def path(self, *parts):
+        return os.path.join(self.workdir, *parts)
+
+    def fresh_path(self, *parts):
+        """返回工作目录中的路径，并删除上次留下的同名文件或目录（含 SQLite 的 -wal/-shm）"""
+        path = self.path(*parts)
+        for candidate in (path, path + "-wal", path + "-shm"):
+            if os.path.isdir(candidate):
+                shutil.rmtree(candidate)
+            elif os.path.exists(candidate):
+                os.remove(candidate)
+        return path
+
+    def record(self, name, seconds, **extra):
+        self.results[name] = dict(summarize(seconds), **extra)
+        print(f"  {name:<48} median {self.results[name]['median_ms']:>10.3f} ms"
+              f"  p95 {self.results[name]['p95_ms']:>10.3f} ms  ({len(seconds)} runs)")
+
+    def require_pil(self):
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            raise Skip("Pillow is not installed")
+
+    def tk_root(self):
+        """返回共享的 Tk 根窗口；没有显示器时跳过需要界面的基准测试"""
+        if self.root is None and self.display_error is None:
+            import tkinter as tk
+            try:
+                self.root = tk.Tk()
+                self.root.geometry("1280x720")
+                self.root.update()
+            except tk.TclError as e:
+                self.display_error = f"no display ({e})"
+        if self.root is None:
+            raise Skip(self.display_error)
+        return self.root
+
+    def close(self):
+        if self.root is not None:
+            self.root.destroy()
+            self.root = None
+
+
+def run(context, only=()):
+    """执行注册的基准测试（only 为名称前缀过滤），返回 JSON 可序列化的结果"""
+    for name, function in BENCHMARKS:
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        print(f"[{name}]")
+        try:
+            function(context)
+        except Skip as e:
+            context.results[name] = {"skipped": str(e)}
+            print(f"  skipped: {e}")
+        except Exception as e:
+            context.results[name] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"[ERROR] Benchmark {name} failed. Exception: {e}")
+            traceback.print_exc()
+    return {"meta": environment(context), "results": context.results}
+
+
+def environment(context):
+    """记录运行环境，方便判断两次结果是否可比"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=10, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "sizes": context.sizes,
+    }
+
+
+def save(results, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(results, baseline, threshold=0.25, min_delta_ms=0.05):
+    """按中位数与基线比较，返回 (变慢的项, 变快的项)，每项为 (名称, 基线 ms, 本次 ms, 比值)
+
+    变化超过 threshold（相对）且绝对差超过 min_delta_ms 才算数，避免亚微秒级的抖动被误报。
+    """
+    regressions, improvements = [], []
+    for name, current in results["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or "median_ms" not in current or "median_ms" not in previous:
+            continue
+        old, new = previous["median_ms"], current["median_ms"]
+        if abs(new - old) < min_delta_ms:
+            continue
+        ratio = new / old if old > 0 else float("inf")
+        if ratio > 1 + threshold:
+            regressions.append((name, old, new, ratio))
+        elif ratio < 1 / (1 + threshold):
+            improvements.append((name, old, new, ratio))
+    return regressions, improvements
@@ -0,0 +1,74 @@
+"""生成基准测试用的合成曲库和图片；内容由参数完全确定，生成过的目录直接复用"""
+import math
+import os
+import struct
+import wave
+
+# 每个子文件夹放多少首歌（与常见的 艺术家/专辑 目录结构相近）
+TRACKS_PER_FOLDER = 100
+
+_MARKER = ".complete"
+
+
+def write_wav(path, seconds=0.05, sample_rate=8000, frequency=440.0):
+    """写入一个单声道 16 位正弦波 WAV 文件"""
+    count = int(seconds * sample_rate)
+    step = 2 * math.pi * frequency / sample_rate
+    frames = struct.pack(f"<{count}h", *(int(12000 * math.sin(i * step)) for i in range(count)))
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(frames)
+
+
+def make_library(root, count, seconds=0.05):
+    """在 root 下生成 count 首 WAV（artist_i/album_j/track_k.wav），已生成过时直接返回"""
+    marker = os.path.join(root, _MARKER)
+    if os.path.exists(marker):
+        return root
+    # 所有文件内容相同，只写一次再复制字节，生成十万个文件也只需几秒
+    template = os.path.join(root, "template.tmp")
+    os.makedirs(root, exist_ok=True)
+    write_wav(template, seconds)
+    with open(template, "rb") as f:
+        data = f.read()
+    os.remove(template)
+    for i in range(count):
+        folder = os.path.join(root, f"artist_{i // (TRACKS_PER_FOLDER * 10):03d}",
+                              f"album_{i // TRACKS_PER_FOLDER:04d}")
+        if i % TRACKS_PER_FOLDER == 0:
+            os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"track_{i:06d} synthetic song.wav"), "wb") as f:
+            f.write(data)
+    with open(marker, "w") as f:
+        f.write(str(count))
+    return root
+
+
+def library_paths(root):
+    """按文件名顺序返回合成曲库中的所有音频文件"""
+    paths = []
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names.sort()
+        paths.extend(os.path.join(dir_path, name) for name in sorted(file_names) if name.endswith(".wav"))
+    return paths
+
+
+def make_images(root, count, size, suffix=".jpg"):
+    """生成 count 张渐变图片（需要 Pillow），返回路径列表"""
+    from PIL import Image
+
+    os.makedirs(root, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(root, f"image_{size[0]}x{size[1]}_{i:03d}{suffix}")
+        if not os.path.exists(path):
+            gradient = Image.linear_gradient("L").resize(size)
+            image = Image.merge("RGB", (gradient, gradient.rotate(90 + i), Image.new("L", size, i * 37 % 256)))
+            if suffix == ".jpg":
+                image.save(path, quality=90)
+            else:
+                image.save(path)
+        paths.append(path)
+    return paths
@@ -1,8 +1,106 @@
+import argparse
 import tkinter as tk
 
-from player.gui import AudioPlayerGUI
+from player.audio_player import PLAYBACK_ENGINES
+from player.log import configure_logging
+from player.metrics import metrics
+from player.startup_profile import StartupProfiler
+from player.volume_backends import VOLUME_BACKENDS
+
+
+def precompute_peaks(folders, workers=None):
+    """不启动界面，为曲库（和新加入的文件夹）中所有歌曲预先计算波形包络"""
+    from player.library_index import LibraryIndex
+    from player.peaks import PeakCache
+
+    library = LibraryIndex()
+    for folder in folders:
+        library.add_root(folder)
+    library.rescan()
+    track_paths = (path for batch in library.iter_tracks() for _, path, _ in batch)
+
+    def progress(stats):
+        done = stats["computed"] + stats["failed"]
+        if done % 50 == 0:
+            print(f"  {done} computed, {stats['cached']} already cached")
+
+    print(f"Precomputing waveforms for {library.count()} tracks...")
+    stats = PeakCache().precompute(track_paths, workers=workers, progress=progress)
+    print(f"Done: {stats['computed']} computed, {stats['cached']} cached, {stats['failed']} failed "
+          f"in {stats['seconds']:.1f}s ({stats['tracks_per_second']:.1f} tracks/s)")
+
+
+def analyze_loudness(folders, workers=None):
+    """不启动界面，分析曲库中新增或修改过的歌曲的响度，用于播放时的音量归一化"""
+    from player.library_index import LibraryIndex
+    from player.loudness import analyze_library
+
+    library = LibraryIndex()
+    for folder in folders:
+        library.add_root(folder)
+    library.rescan()
+
+    def progress(stats):
+        done = stats["analyzed"] + stats["failed"]
+        if done % 50 == 0:
+            print(f"  {done} analyzed, {stats['skipped']} unchanged")
+
+    print(f"Analyzing loudness of {library.count()} tracks...")
+    stats = analyze_library(library, workers=workers, progress=progress)
+    print(f"Done: {stats['analyzed']} analyzed, {stats['skipped']} unchanged, {stats['failed']} failed "
+          f"in {stats['seconds']:.1f}s ({stats['tracks_per_second']:.1f} tracks/s)")
+
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = AudioPlayerGUI(root)
+    parser = argparse.ArgumentParser(description="Modern Music Player")
+    parser.add_argument("--startup-profile", action="store_true", help="打印启动各阶段耗时")
+    parser.add_argument("--log-level", default="INFO", help="日志级别（DEBUG/INFO/WARNING/ERROR）")
+    parser.add_argument("--metrics", nargs="?", const="-", metavar="FILE",
+                        help="退出时输出播放器计数器和延迟直方图（可指定 JSON 文件）")
+    parser.add_argument("--precompute-peaks", nargs="*", metavar="FOLDER",
+                        help="不启动界面，为曲库中所有歌曲计算波形（可同时加入新的文件夹）")
+    parser.add_argument("--analyze-loudness", nargs="*", metavar="FOLDER",
+                        help="不启动界面，分析曲库中新增或修改过的歌曲的响度（可同时加入新的文件夹）")
+    parser.add_argument("--volume-backend", choices=VOLUME_BACKENDS, default="auto",
+                        help="音量控制方式：libVLC 播放器音量、系统音量或不输出（默认按平台选择）")
+    parser.add_argument("--engine", choices=PLAYBACK_ENGINES, default="vlc",
+                        help="播放引擎：libVLC，或进程内混音（pygame 输出，支持曲目间淡入淡出）")
+    parser.add_argument("--crossfade", type=float, default=None, metavar="SECONDS",
+                        help="crossfade 引擎的淡入淡出时长（秒，默认 6）")
+    parser.add_argument("--headless", action="store_true",
+                        help="不启动界面，通过本地 Unix 套接字（按行 JSON）控制播放器")
+    parser.add_argument("--socket", default="cache/player.sock", help="无界面模式的控制套接字路径")
+    parser.add_argument("--library", action="append", default=[], metavar="FOLDER",
+                        help="无界面模式启动时加入曲库的文件夹（可重复）")
+    parser.add_argument("--zones", type=int, default=None, metavar="N",
+                        help="不启动界面，在同一个 libVLC 实例上同时播放 N 个区域并打印各区域的资源占用")
+    parser.add_argument("--workers", type=int, default=None, help="批量计算使用的进程数（默认全部 CPU 核心）")
+    args = parser.parse_args()
+
+    configure_logging(args.log_level)
+    if args.metrics:
+        metrics.dump_on_exit(None if args.metrics == "-" else args.metrics)
+
+    if args.precompute_peaks is not None:
+        precompute_peaks(args.precompute_peaks, args.workers)
+        raise SystemExit(0)
+    if args.headless:
+        from player.daemon import run_daemon
+        run_daemon(args.socket, args.library, engine=args.engine, crossfade=args.crossfade)
+        raise SystemExit(0)
+    if args.zones:
+        from player.zones import run_zones
+        run_zones(args.zones, args.library)
+        raise SystemExit(0)
+    if args.analyze_loudness is not None:
+        analyze_loudness(args.analyze_loudness, args.workers)
+        raise SystemExit(0)
+
+    profiler = StartupProfiler(enabled=args.startup_profile)
+    with profiler.phase("import gui"):
+        from player.gui import AudioPlayerGUI
+    with profiler.phase("tk root"):
+        root = tk.Tk()
+    app = AudioPlayerGUI(root, profiler, volume_backend=args.volume_backend,
+                         engine=args.engine, crossfade=args.crossfade)
     root.mainloop()
@@ -0,0 +1,214 @@
+import hashlib
+import io
+import os
+import struct
+import threading
+
+from PIL import Image
+
+from .content_hash import ContentHashIndex
+from .media_probe import iter_flac_blocks, scan_id3v2_frames
+from .metrics import metrics
+
+# ID3 APIC / FLAC PICTURE 中的图片类型：3 为封面（正面）
+FRONT_COVER = 3
+# 同目录下按顺序查找的封面文件名（不区分大小写）
+FOLDER_IMAGE_NAMES = ("cover", "folder", "front", "album", "albumart")
+FOLDER_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+# 嵌入图片超过这个大小（字节）时视为损坏，不读取
+MAX_PICTURE_BYTES = 32 * 1024 * 1024
+
+
+def _split_text(data, encoding):
+    """按文本编码找到结尾的 NUL，返回其后的剩余数据（UTF-16 的结束符为两个字节且按两字节对齐）"""
+    if encoding in (1, 2):
+        pos = 0
+        while True:
+            pos = data.find(b"\x00\x00", pos)
+            if pos < 0:
+                return b""
+            if pos % 2 == 0:
+                return data[pos + 2:]
+            pos += 1
+    pos = data.find(b"\x00")
+    return data[pos + 1:] if pos >= 0 else b""
+
+
+def _parse_apic(frame_id, data):
+    """解析 APIC（v2.2 为 PIC）帧，返回 (图片类型, 图片数据)"""
+    if len(data) < 4:
+        return None
+    encoding = data[0]
+    if frame_id == "PIC":
+        rest = data[4:]  # 3 个字符的图片格式
+    else:
+        mime_end = data.find(b"\x00", 1)
+        if mime_end < 0:
+            return None
+        rest = data[mime_end + 1:]
+    if not rest:
+        return None
+    return rest[0], _split_text(rest[1:], encoding)
+
+
+def id3_picture(f):
+    """ID3v2 标签中的嵌入图片，优先返回封面类型的那张"""
+    found = None
+    for frame_id, data in scan_id3v2_frames(f, ("APIC", "PIC")):
+        picture = _parse_apic(frame_id, data)
+        if picture is None or not picture[1]:
+            continue
+        if picture[0] == FRONT_COVER:
+            return picture[1]
+        found = found or picture[1]
+    return found
+
+
+def flac_picture(f):
+    """FLAC PICTURE 元数据块中的图片，优先返回封面类型的那张"""
+    found = None
+    for block_type, length in iter_flac_blocks(f):
+        if block_type != 6 or length > MAX_PICTURE_BYTES:
+            continue
+        block = f.read(length)
+        picture_type, mime_length = struct.unpack_from(">II", block)
+        pos = 8 + mime_length
+        description_length = struct.unpack_from(">I", block, pos)[0]
+        pos += 4 + description_length + 16  # 宽、高、色深、索引颜色数
+        data_length = struct.unpack_from(">I", block, pos)[0]
+        data = block[pos + 4:pos + 4 + data_length]
+        if picture_type == FRONT_COVER:
+            return data
+        found = found or data
+    return found
+
+
+def embedded_picture(track_path):
+    """读取歌曲文件中嵌入的封面图片数据，没有时返回 None"""
+    with open(track_path, "rb") as f:
+        return id3_picture(f) or flac_picture(f)
+
+
+class AlbumArtCache:
+    """在工作线程中取出歌曲封面（嵌入的 APIC/PICTURE 或同目录的 folder.jpg），缩小后按图片内容哈希缓存
+
+    cache/art/index.json 记录 歌曲路径 -> 嵌入封面的内容哈希（"" 表示没有嵌入封面），歌曲文件不变时
+    不再打开它；同目录的封面文件按它自己的路径记录，由封面文件的大小和修改时间验证，新增或替换
+    cover.jpg 后能被发现。缩略图为 cache/art/<哈希>_<宽>x<高>.jpg，同一专辑的歌曲共用一张。
+    load() 可直接作为 ImageDecoder 的 decode 函数。
+    """
+
+    def __init__(self, cache_dir="cache/art"):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hashes = ContentHashIndex(os.path.join(cache_dir, "index.json"))
+        self.lock = threading.Lock()
+        self.folder_images = {}  # 目录 -> (目录的修改时间, 封面图片路径或 None)
+
+    def thumbnail_path(self, digest, size):
+        width, height = size
+        return os.path.join(self.cache_dir, f"{digest}_{width}x{height}.jpg")
+
+    def folder_image(self, directory):
+        """同目录下的 cover.jpg / folder.jpg 等图片；目录的修改时间不变时不再重新列出"""
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+        with self.lock:
+            cached = self.folder_images.get(directory)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            names = {name.lower(): name for name in os.listdir(directory)}
+        except OSError:
+            names = {}
+        path = None
+        for stem in FOLDER_IMAGE_NAMES:
+            for ext in FOLDER_IMAGE_EXTENSIONS:
+                if stem + ext in names:
+                    path = os.path.join(directory, names[stem + ext])
+                    break
+            if path:
+                break
+        with self.lock:
+            self.folder_images[directory] = (mtime, path)
+        return path
+
+    def source(self, track_path):
+        """封面的 (内容哈希, 原始数据)：嵌入图片优先，其次是同目录的封面文件；没有封面时为 (None, None)
+
+        哈希已有有效记录时不读取图片，数据为 None（只有缩略图不存在时才需要读取）。
+        """
+        stat = os.stat(track_path)
+        with self.lock:
+            digest = self.hashes.lookup(track_path, stat)
+        data = None
+        if digest is None:
+            data = embedded_picture(track_path)
+            digest = hashlib.sha1(data).hexdigest() if data else ""
+            with self.lock:
+                self.hashes.record(track_path, digest, stat)
+        if digest:
+            return digest, data
+
+        path = self.folder_image(os.path.dirname(os.path.abspath(track_path)))
+        if path is None:
+            return None, None
+        image_stat = os.stat(path)
+        with self.lock:
+            digest = self.hashes.lookup(path, image_stat)
+        if digest is None:
+            with open(path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha1(data).hexdigest()
+            with self.lock:
+                self.hashes.record(path, digest, image_stat)
+        return digest, data
+
+    def source_data(self, track_path):
+        """封面图片的原始数据（嵌入图片或同目录的封面文件），没有时返回 None"""
+        data = embedded_picture(track_path)
+        if data:
+            return data
+        path = self.folder_image(os.path.dirname(os.path.abspath(track_path)))
+        if path:
+            with open(path, "rb") as f:
+                return f.read()
+        return None
+
+    def load(self, track_path, size):
+        """返回缩放到 size 以内的封面（PIL 图片），没有封面时返回 None；在工作线程中调用"""
+        digest, data = self.source(track_path)
+        if digest is None:
+            metrics.incr("art.none")
+            return None
+        thumbnail = self.thumbnail_path(digest, size)
+        if os.path.exists(thumbnail):
+            metrics.incr("art.thumbnail_hit")  # 包括同一专辑的其他歌曲已经生成过的
+            return self.open_thumbnail(thumbnail)
+        with metrics.timed("art.extract"):
+            if data is None:
+                data = self.source_data(track_path)  # 有哈希记录但缩略图被删掉了
+            if not data:
+                return None
+            return self.write_thumbnail(data, size, thumbnail)
+
+    def open_thumbnail(self, thumbnail):
+        with Image.open(thumbnail) as image:
+            image.load()
+            return image
+
+    def write_thumbnail(self, data, size, thumbnail):
+        """解码原图并缩小（JPEG 用 draft 在解码时直接按比例缩小），写入缩略图缓存"""
+        with Image.open(io.BytesIO(data)) as source:
+            source.draft("RGB", size)
+            image = source.convert("RGB")
+        image.thumbnail(size)
+        tmp_path = f"{thumbnail}.{threading.get_ident()}.tmp"
+        try:
+            image.save(tmp_path, "JPEG", quality=90)
+            os.replace(tmp_path, thumbnail)
+        except OSError as e:
+            print(f"[ERROR] Failed to write album art cache '{thumbnail}'. Exception: {e}")
+        return image
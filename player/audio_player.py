@@ -1,84 +1,275 @@
-import vlc
 import os
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .log import get_logger
+from .media_probe import MetadataCache
+from .metrics import metrics
+from .seek_table import SeekTableCache
+
+logger = get_logger(__name__)
+
+vlc = None  # 延迟导入：加载 libVLC 放到首帧之后（见 AudioPlayer.start）
+
+
+def import_vlc():
+    """首次调用时导入 python-vlc"""
+    global vlc
+    if vlc is None:
+        import vlc as vlc_module
+        vlc = vlc_module
+    return vlc
 
 
 class AudioPlayer:
-    def __init__(self):
-        self.instance = vlc.Instance()
-        self.player = self.instance.media_player_new()
+    def __init__(self, instance=None, media_cache=None, metadata_cache=None, audio_device=None, seek_tables=None):
+        """instance / media_cache / metadata_cache / seek_tables 可由多个播放器共享（见 zones.ZoneManager）"""
+        self.shared_instance = instance
+        self.instance = None  # libVLC 实例，在 start() 中创建或使用共享实例
+        self.player = None
+        self.next_player = None  # 用于预加载下一首的第二个播放器
+        self.start_lock = threading.Lock()
         self.current_track = None  # 当前正在播放的音轨
-        self.volume = 0.5  # 默认音量（0.0 到 1.0 之间）
+        self.preloaded_track = None  # 已在 next_player 上准备好的音轨
+        self.preloaded_length = 0
+        self.volume = 1.0  # 用户音量（0.0 到 1.0 之间），使用 libVLC 音量后端时由 VolumeControl 设置
+        self.gain_db = 0.0  # 当前曲目的响度归一化增益
+        self.preloaded_gain_db = 0.0
         self.total_length = 0  # 音频总时长
         self.paused_position = 0  # 记录暂停时的位置
-        print("AudioPlayer initialized.")
+        self.metadata_cache = metadata_cache or MetadataCache()  # 时长等元数据的磁盘缓存
+        self.seek_tables = seek_tables or SeekTableCache()  # VBR MP3 的逐帧跳转表
+        self.media_cache = media_cache  # 共享的 libVLC Media 缓存（可选）
+        self.audio_device = audio_device  # 输出设备 ID，None 表示默认设备
+        self.probe_executor = None  # 在后台读取曲目时长的线程，首次加载时创建
+        self.listeners = []  # 播放事件监听器
+        logger.debug("AudioPlayer initialized.")
+
+    def start(self):
+        """导入 libVLC 并创建实例和两个播放器；可以在后台线程提前调用，重复调用无副作用"""
+        with self.start_lock:
+            if self.instance is not None:
+                return
+            import_vlc()
+            instance = self.shared_instance
+            if instance is None:
+                with metrics.timed("player.start"):
+                    instance = vlc.Instance()
+            self.player = instance.media_player_new()
+            self.next_player = instance.media_player_new()
+            if self.audio_device:
+                self.player.audio_output_device_set(None, self.audio_device)
+                self.next_player.audio_output_device_set(None, self.audio_device)
+            self.attach_events(self.player)
+            self.attach_events(self.next_player)
+            self.instance = instance
+            logger.info("libVLC started.")
+
+    def add_listener(self, callback):
+        """注册播放事件监听器：callback(event, value) 在 libVLC 线程（"length" 也可能在读取时长的后台线程）中调用，
+        event 为 "end"、"time"（当前时间，秒）或 "length"（总时长，秒）"""
+        self.listeners.append(callback)
 
-    def load(self, track_path):
-        """加载指定路径的音频文件"""
+    def attach_events(self, media_player):
+        """订阅 libVLC 事件管理器中的结束、时间和时长变化事件"""
+        manager = media_player.event_manager()
+        manager.event_attach(vlc.EventType.MediaPlayerEndReached, self.on_vlc_event, media_player, "end")
+        manager.event_attach(vlc.EventType.MediaPlayerTimeChanged, self.on_vlc_event, media_player, "time")
+        manager.event_attach(vlc.EventType.MediaPlayerLengthChanged, self.on_vlc_event, media_player, "length")
+
+    def on_vlc_event(self, event, media_player, kind):
+        """libVLC 线程中的事件回调：不能在这里调用 libVLC，只转发给监听器"""
+        if media_player is not self.player:
+            return  # 忽略预加载播放器的事件
+        if kind == "time":
+            value = event.u.new_time / 1000
+        elif kind == "length":
+            value = event.u.new_length / 1000
+            if value > 0:
+                self.total_length = value
+        else:
+            value = None
+        for callback in self.listeners:
+            callback(kind, value)
+
+    def load(self, track_path, gain_db=0.0, media=None):
+        """加载指定路径的音频文件，gain_db 为该曲目的响度归一化增益；media 为调用方提前创建的 Media（可选）
+
+        不在调用线程里读取时长：total_length 先为 0，由后台线程读完文件头或 libVLC 的 "length" 事件填入，
+        两者都会通知监听器。
+        """
         if os.path.exists(track_path):
-            self.current_track = track_path
-            media = self.instance.media_new(track_path)
-            self.player.set_media(media)
-            self.player.play()
-            time.sleep(0.1)  # 给 VLC 一些时间来加载媒体
-            self.total_length = self.player.get_length() / 1000  # 获取音频总时长，单位为秒
-            self.player.stop()
-            print(f"Loaded track: {track_path}")
-            print(f"Total length of the track: {self.total_length} seconds")
+            self.start()
+            with metrics.timed("player.load"):
+                self.current_track = track_path
+                self.gain_db = gain_db
+                self.player.set_media(media or self.new_media(track_path))
+                self.total_length = 0
+            self.submit_probe(track_path)
+            self.seek_tables.request(track_path)
+            logger.info("Loaded track: %s", track_path)
         else:
-            print(f"File {track_path} not found.")
+            metrics.incr("player.load_missing")
+            logger.warning("File %s not found.", track_path)
+
+    def preload(self, track_path, gain_db=0.0):
+        """在第二个播放器上提前准备并解析下一首，供 play_preloaded 无缝切换"""
+        if not os.path.exists(track_path):
+            logger.warning("File %s not found.", track_path)
+            return
+        self.start()
+        with metrics.timed("player.preload"):
+            media = self.new_media(track_path)
+            media.parse_with_options(vlc.MediaParseFlag.local, 0)  # 异步解析，不阻塞当前播放
+            self.next_player.set_media(media)
+            self.preloaded_track = track_path
+            self.preloaded_gain_db = gain_db
+            self.apply_gain(self.next_player, gain_db)
+            self.preloaded_length = 0
+        self.submit_probe(track_path)
+        self.seek_tables.request(track_path)
+        logger.debug("Preloaded track: %s", track_path)
+
+    def submit_probe(self, track_path):
+        """在后台线程中读取曲目时长"""
+        if self.probe_executor is None:
+            self.probe_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DurationProbe")
+        self.probe_executor.submit(self.probe_duration, track_path)
+
+    def probe_duration(self, track_path):
+        """后台线程：从文件头或缓存读取时长（可能要扫描整个 VBR 文件，不能放在 Tk 主线程）"""
+        try:
+            info = self.metadata_cache.lookup(track_path)
+        except OSError as e:
+            logger.warning("Failed to probe track %s: %s", track_path, e)
+            return
+        if not info:
+            metrics.incr("player.probe_fallback")
+            return  # 头部解析不了的格式（m4a/aac/wma 等）由开始播放后 libVLC 的 "length" 事件给出时长
+        if self.preloaded_track == track_path:
+            self.preloaded_length = info["duration"]
+        if self.current_track == track_path and not self.total_length:
+            # 正在播放的曲目（刚加载，或读完之前已经切换过去了）
+            self.total_length = info["duration"]
+            for callback in self.listeners:
+                callback("length", self.total_length)
+
+    def play_preloaded(self):
+        """在当前曲目结束时切换到预加载的曲目，先启动新播放器再停止旧的，返回是否切换成功"""
+        if not self.preloaded_track:
+            return False
+        with metrics.timed("player.handover"):
+            # 先交换再播放：新播放器开始播放时发出的 "length" 事件不会被当作预加载播放器的事件忽略
+            self.player, self.next_player = self.next_player, self.player
+            self.player.play()
+            self.next_player.stop()
+        self.current_track = self.preloaded_track
+        self.gain_db = self.preloaded_gain_db
+        self.apply_gain(self.player, self.gain_db)
+        self.total_length = self.preloaded_length or max(self.player.get_media().get_duration() / 1000, 0)
+        self.paused_position = 0
+        self.preloaded_track = None
+        logger.info("Switched to preloaded track: %s", self.current_track)
+        return True
+
+    def new_media(self, track_path):
+        """创建 Media；有共享缓存时复用已创建（并已解析）的对象"""
+        if self.media_cache is not None:
+            return self.media_cache.media(track_path)
+        return self.instance.media_new(track_path)
+
+    def apply_gain(self, media_player, gain_db):
+        """把 用户音量 × 曲目增益 设置为 libVLC 播放器音量（100 为原始电平）"""
+        volume = int(round(100 * self.volume * 10 ** (gain_db / 20)))
+        if not 0 <= volume <= 200:
+            logger.info("Volume %d (gain %.1f dB) is outside libVLC's range, clamped", volume, gain_db)
+            volume = max(0, min(200, volume))
+        media_player.audio_set_volume(volume)
+
+    def set_volume(self, level):
+        """设置用户音量（0.0 到 1.0），立即作用于正在播放的曲目"""
+        self.volume = level
+        if self.player:
+            self.apply_gain(self.player, self.gain_db)
+        if self.next_player and self.preloaded_track:
+            self.apply_gain(self.next_player, self.preloaded_gain_db)
 
     def play(self):
         """播放音频文件"""
         if self.current_track:
-            self.player.play()
+            with metrics.timed("player.play"):
+                self.player.play()
+                self.apply_gain(self.player, self.gain_db)
+                if self.paused_position > 0:
+                    self.seek_player(self.paused_position)  # 从暂停位置继续播放
             if self.paused_position > 0:
-                self.player.set_time(int(self.paused_position * 1000))  # 从暂停位置继续播放
-                print(f"Playing from paused position: {self.paused_position} seconds")
+                logger.debug("Playing from paused position: %.3f seconds", self.paused_position)
             else:
-                print("Playing from the start")
+                logger.debug("Playing from the start")
             self.paused_position = 0  # 重置暂停位置
         else:
-            print("No track loaded. Use the load() method to load a track.")
+            logger.warning("No track loaded. Use the load() method to load a track.")
 
     def pause(self):
         """暂停音频播放"""
-        if self.player.is_playing():
-            self.paused_position = self.player.get_time() / 1000  # 获取当前播放时间（秒）
-            self.player.pause()
-            print(f"Paused at: {self.paused_position} seconds")
+        if self.player and self.player.is_playing():
+            with metrics.timed("player.pause"):
+                self.paused_position = self.player.get_time() / 1000  # 获取当前播放时间（秒）
+                self.player.pause()
+            logger.debug("Paused at: %.3f seconds", self.paused_position)
 
     def resume(self, position=None):
         """从指定的暂停位置继续播放"""
         if self.current_track:
             if position is not None:
                 self.paused_position = position
-            print(f"Resuming from position: {self.paused_position} seconds")
+            logger.debug("Resuming from position: %.3f seconds", self.paused_position)
             self.play()  # 从 paused_position 播放
         else:
-            print("No track loaded. Use the load() method to load a track.")
+            logger.warning("No track loaded. Use the load() method to load a track.")
 
     def set_position(self, new_pos):
         """设置播放位置（秒）"""
         self.paused_position = new_pos
-        self.player.set_time(int(new_pos * 1000))  # 设置播放时间，单位为毫秒
-        print(f"Set position to: {new_pos} seconds")
+        if self.player:
+            with metrics.timed("player.seek"):
+                self.seek_player(new_pos)
+        logger.debug("Set position to: %.3f seconds", new_pos)
+
+    def seek_player(self, seconds):
+        """VBR MP3 有跳转表时按目标帧的字节位置跳转（落点误差不超过一帧），否则按时间跳转"""
+        table = self.seek_tables.get(self.current_track) if self.current_track else None
+        if table is not None and table.vbr:
+            self.player.set_position(table.fraction_at(seconds))
+            metrics.incr("player.seek_by_table")
+        else:
+            self.player.set_time(int(seconds * 1000))  # 设置播放时间，单位为毫秒
 
     def stop(self):
         """停止音频播放"""
-        self.player.stop()
+        if self.player:
+            with metrics.timed("player.stop"):
+                self.player.stop()
         self.paused_position = 0
-        print("Playback stopped")
+        logger.debug("Playback stopped")
 
     def get_current_time(self):
         """获取当前播放时间（秒）"""
-        current_time = self.player.get_time() / 1000  # 返回当前播放时间，单位为秒
-        print(f"Current playback time: {current_time} seconds")
-        return current_time
+        metrics.incr("player.get_current_time")  # 热路径：只计数，不输出日志
+        return self.player.get_time() / 1000 if self.player else 0  # 返回当前播放时间，单位为秒
 
     def get_total_length(self):
         """获取音频文件的总时长（秒）"""
-        print(f"Total length of the track: {self.total_length} seconds")
+        metrics.incr("player.get_total_length")  # 热路径：只计数，不输出日志
         return self.total_length
 
 
+PLAYBACK_ENGINES = ("vlc", "crossfade")
+
+
+def create_player(engine="vlc", crossfade=None):
+    """按名称创建播放引擎：vlc 为 libVLC 播放器，crossfade 为进程内 NumPy 混音引擎（支持淡入淡出）"""
+    if engine == "crossfade":
+        from .crossfade_engine import DEFAULT_CROSSFADE, CrossfadeEngine
+        return CrossfadeEngine(DEFAULT_CROSSFADE if crossfade is None else crossfade)
+    return AudioPlayer()
@@ -0,0 +1,44 @@
+import hashlib
+import os
+
+from .settings_store import SettingsStore
+
+
+def hash_file(path, block_size=1024 * 1024):
+    """计算文件内容的 SHA-1（十六进制）"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ContentHashIndex:
+    """记录 源路径 -> 内容哈希，文件大小和修改时间不变时不再重新读取文件"""
+
+    def __init__(self, index_path):
+        # 源路径 -> {"size", "mtime", "hash"}
+        self.index = SettingsStore(index_path, indent=None)
+
+    def lookup(self, path, stat=None):
+        """返回已记录且仍然有效的哈希，没有时返回 None（不读取文件内容）"""
+        entry = self.index.get(path)
+        if not entry:
+            return None
+        stat = stat or os.stat(path)
+        if entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime_ns:
+            return None
+        return entry["hash"]
+
+    def record(self, path, digest, stat=None):
+        stat = stat or os.stat(path)
+        self.index.set(path, {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": digest})
+
+    def content_hash(self, path):
+        """返回文件内容的哈希，文件未变化时直接使用记录的结果"""
+        stat = os.stat(path)
+        digest = self.lookup(path, stat)
+        if digest is None:
+            digest = hash_file(path)
+            self.record(path, digest, stat)
+        return digest
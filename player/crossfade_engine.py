@@ -0,0 +1,598 @@
+import os
+import subprocess
+import threading
+import time
+
+from .log import get_logger
+from .media_probe import MetadataCache
+from .metrics import metrics
+from .seek_table import SeekTableCache
+
+logger = get_logger(__name__)
+
+np = None  # 延迟导入：只有选用该引擎时才加载 NumPy（见 CrossfadeEngine.start）
+
+OUTPUT_RATE = 44100
+CHANNELS = 2
+# 每次混音的块长（帧），约 46 ms；输出端最多排队两块
+MIX_BLOCK_FRAMES = 2048
+# 默认淡入淡出时长（秒）
+DEFAULT_CROSSFADE = 6.0
+# 每个解码环形缓冲在淡入淡出长度之外额外保留的预读量（秒）
+PREBUFFER_SECONDS = 1.0
+# 解码线程每次从 ffmpeg 读取的帧数
+DECODE_CHUNK_FRAMES = 4096
+# 发出 "time" 事件的间隔（秒），与 libVLC 的 TimeChanged 频率相近
+TIME_EVENT_INTERVAL = 0.25
+# 按跳转表跳转时从目标帧之前多少帧开始解码（MP3 的比特池会引用前面的帧）
+SEEK_REWIND_FRAMES = 2
+
+
+def import_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def find_decoder():
+    """解码使用 pydub 配置的 ffmpeg（AudioSegment.converter），与波形、响度分析使用同一个程序"""
+    from pydub import AudioSegment
+    return AudioSegment.converter
+
+
+class RingBuffer:
+    """定长 int16 环形缓冲（帧 × 声道）：解码线程写入，写满时阻塞；混音线程读取"""
+
+    def __init__(self, capacity, channels=CHANNELS):
+        self.data = np.zeros((capacity, channels), dtype=np.int16)
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+        self.eof = False  # 解码已结束，不会再有新数据
+        self.closed = False  # 缓冲已废弃（跳转或换歌），写入方应退出
+        self.cond = threading.Condition()
+
+    def write(self, frames):
+        """写入一段帧，空间不足时等待；缓冲被关闭时返回 False"""
+        offset = 0
+        while offset < len(frames):
+            with self.cond:
+                while self.size == self.capacity and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return False
+                count = min(self.capacity - self.size, len(frames) - offset)
+                end = (self.start + self.size) % self.capacity
+                first = min(count, self.capacity - end)
+                self.data[end:end + first] = frames[offset:offset + first]
+                self.data[:count - first] = frames[offset + first:offset + count]
+                self.size += count
+                offset += count
+                self.cond.notify_all()
+        return True
+
+    def read(self, count):
+        """读取最多 count 帧，不等待"""
+        with self.cond:
+            count = min(count, self.size)
+            first = min(count, self.capacity - self.start)
+            out = np.empty((count, self.data.shape[1]), dtype=np.int16)
+            out[:first] = self.data[self.start:self.start + first]
+            out[first:] = self.data[:count - first]
+            self.start = (self.start + count) % self.capacity
+            self.size -= count
+            self.cond.notify_all()
+            return out
+
+    def finish(self):
+        with self.cond:
+            self.eof = True
+            self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+def _decode_into(process, ring):
+    """解码线程：把 ffmpeg 输出的 s16le PCM 按帧写入环形缓冲，直到文件结束或缓冲被关闭"""
+    frame_bytes = 2 * CHANNELS
+    pending = b""
+    try:
+        while True:
+            chunk = process.stdout.read(DECODE_CHUNK_FRAMES * frame_bytes)
+            if not chunk:
+                break
+            if pending:
+                chunk = pending + chunk
+            usable = len(chunk) - len(chunk) % frame_bytes
+            pending = chunk[usable:]
+            if usable and not ring.write(np.frombuffer(chunk[:usable], dtype=np.int16).reshape(-1, CHANNELS)):
+                break
+    except (OSError, ValueError) as e:
+        logger.warning("Decoder stopped: %s", e)
+    finally:
+        ring.finish()
+        process.kill()
+        process.stdout.close()
+        process.wait()
+
+
+class Deck:
+    """一首歌的解码流：ffmpeg 子进程解码为 PCM，由解码线程写入环形缓冲，混音线程从中读取"""
+
+    def __init__(self, track_path, gain_db, duration, rate, capacity, converter):
+        self.track_path = track_path
+        self.gain_db = gain_db
+        self.gain = 10 ** (gain_db / 20)
+        self.rate = rate
+        self.capacity = capacity
+        self.converter = converter
+        self.total_frames = int(duration * rate)  # 0 表示时长未知（此时不做淡入淡出）
+        self.position = 0  # 已交给混音器的帧数（从曲目开头算起）
+        self.ring = None
+        self.process = None
+
+    def start(self, offset_frames=0, seek_table=None):
+        """从 offset_frames 处开始解码（跳转时重新启动 ffmpeg）
+
+        有 MP3 跳转表时从目标帧稍前的字节位置直接开始读，再由 ffmpeg 解码并丢弃到精确的
+        目标时间；否则交给 ffmpeg 按时间跳转（VBR 文件可能不准）。
+        """
+        self.close()
+        self.position = offset_frames
+        seconds = offset_frames / self.rate
+        if seek_table is not None and offset_frames > 0:
+            frame = max(0, seek_table.frame_at(seconds) - SEEK_REWIND_FRAMES)
+            source = ["-skip_initial_bytes", str(seek_table.offsets[frame]), "-f", "mp3", "-i", self.track_path,
+                      "-ss", f"{seconds - seek_table.time_of(frame):.6f}"]
+        else:
+            source = ["-ss", f"{seconds:.3f}", "-i", self.track_path]
+        command = [self.converter, "-v", "quiet", "-nostdin", *source, "-f", "s16le", "-acodec", "pcm_s16le",
+                   "-ac", str(CHANNELS), "-ar", str(self.rate), "-"]
+        self.ring = RingBuffer(self.capacity)
+        self.process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL)
+        threading.Thread(target=_decode_into, args=(self.process, self.ring),
+                         name="CrossfadeDecoder", daemon=True).start()
+
+    def remaining(self):
+        """距曲目结束的帧数，时长未知时返回 None"""
+        return self.total_frames - self.position if self.total_frames else None
+
+    def buffered(self):
+        return self.ring.size if self.ring else 0
+
+    def finished(self):
+        return self.ring is None or (self.ring.eof and self.ring.size == 0)
+
+    def primed(self, frames):
+        """已解码出至少 frames 帧（或已解码完毕），可以开始输出"""
+        return self.ring is None or self.ring.size >= frames or self.ring.eof
+
+    def read(self, count):
+        data = self.ring.read(count)
+        self.position += len(data)
+        return data
+
+    def close(self):
+        if self.ring is not None:
+            self.ring.close()  # 解码线程随之退出并结束 ffmpeg
+            self.ring = None
+
+
+class PygameOutput:
+    """通过 pygame.mixer 的一个声道连续排队播放混好的块（正在播放一块、排队一块）"""
+
+    def __init__(self):
+        self.pygame = None
+        self.channel = None
+        self.block_frames = MIX_BLOCK_FRAMES
+
+    def start(self, rate, channels, block_frames):
+        """初始化混音器，返回实际的输出采样率"""
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        import pygame
+
+        pygame.mixer.init(frequency=rate, size=-16, channels=channels, buffer=1024)
+        actual_rate, _, actual_channels = pygame.mixer.get_init()
+        if actual_channels != channels:
+            raise RuntimeError(f"pygame mixer opened with {actual_channels} channels, expected {channels}")
+        self.pygame = pygame
+        self.channel = pygame.mixer.Channel(0)
+        self.block_frames = block_frames
+        return actual_rate
+
+    def ready(self):
+        """是否可以再排队一块"""
+        return self.channel.get_queue() is None
+
+    def idle(self):
+        """声道已经没有可播放的数据"""
+        return not self.channel.get_busy()
+
+    def write(self, block):
+        sound = self.pygame.mixer.Sound(buffer=block.tobytes())
+        if self.channel.get_busy():
+            self.channel.queue(sound)
+        else:
+            self.channel.play(sound)
+
+    def buffered_frames(self):
+        """已交给声卡但尚未播放的帧数（估算：正在播放的块按一半计）"""
+        if not self.channel.get_busy():
+            return 0
+        return self.block_frames // 2 + (self.block_frames if self.channel.get_queue() is not None else 0)
+
+    def pause(self):
+        self.channel.pause()
+
+    def resume(self):
+        self.channel.unpause()
+
+    def stop(self):
+        self.channel.stop()
+
+
+class CrossfadeEngine:
+    """进程内混音播放引擎：与 AudioPlayer 接口相同，曲目之间等功率淡入淡出
+
+    每首歌由一个 ffmpeg 子进程解码到自己的环形缓冲，混音线程按固定块长读取当前曲目
+    （淡入淡出期间还有上一首），用 NumPy 向量化的增益曲线混合后交给 pygame 输出。
+    当前曲目剩余时长进入淡入淡出窗口、且预加载的下一首已经解码了整个窗口时开始淡入淡出，
+    同时发出 "end" 事件；界面随后调用 play_preloaded() 确认切换。
+
+    环形缓冲的容量 = 淡入淡出长度 + PREBUFFER_SECONDS，所以淡入淡出开始时两首歌在窗口内
+    要用的数据都已解码完毕，混音不依赖解码速度；每块的混音耗时记入 crossfade.mix_block。
+    """
+
+    def __init__(self, crossfade=DEFAULT_CROSSFADE, output=None, metadata_cache=None, block_frames=MIX_BLOCK_FRAMES):
+        self.crossfade = crossfade
+        self.output = output  # 默认在 start() 中创建 PygameOutput
+        self.metadata_cache = metadata_cache or MetadataCache()
+        self.seek_tables = SeekTableCache()  # VBR MP3 的逐帧跳转表
+        self.block_frames = block_frames
+        self.rate = OUTPUT_RATE
+        self.converter = None
+        self.start_lock = threading.Lock()
+        self.lock = threading.RLock()  # 保护下面的曲目状态，混音线程每块持有一次
+        self.thread = None
+        self.start_error = None  # 启动失败的异常，之后不再重试
+        self.closed = False
+        self.listeners = []
+
+        self.deck = None  # 当前曲目（淡入淡出期间为淡入的一首）
+        self.fading = None  # 正在淡出的上一首
+        self.next_deck = None  # 预加载的下一首
+        self.fade_frames = 0
+        self.fade_pos = 0
+        self.handed_over = False  # 已自动开始淡入下一首，等待 play_preloaded() 确认
+        self.playing = False
+        self.streaming = False  # 输出端正在连续播放（用于判断欠载）
+        self.applied_volume = 1.0
+        self.last_time_event = 0.0
+
+        self.current_track = None
+        self.preloaded_track = None
+        self.volume = 1.0  # 用户音量（0.0 到 1.0 之间）
+        self.gain_db = 0.0
+        self.total_length = 0
+        self.paused_position = 0
+        self.paused_at = None  # pause() 记录的位置；paused_position 被改动过说明暂停期间拖动了进度
+
+    def start(self):
+        """加载 NumPy、pygame 和 ffmpeg 并启动混音线程；可以在后台线程提前调用，重复调用无副作用
+
+        启动失败时记录异常并抛出，之后的调用直接抛出同一个异常，不再重试。
+        """
+        with self.start_lock:
+            if self.thread is not None:
+                return
+            if self.start_error is not None:
+                raise self.start_error
+            try:
+                import_numpy()
+                self.converter = find_decoder()
+                if self.output is None:
+                    self.output = PygameOutput()
+                with metrics.timed("crossfade.start"):
+                    self.rate = self.output.start(OUTPUT_RATE, CHANNELS, self.block_frames)
+            except Exception as e:
+                self.start_error = e
+                raise
+            self.ramp_index = np.arange(self.block_frames, dtype=np.float32)
+            self.thread = threading.Thread(target=self._run, name="CrossfadeMixer", daemon=True)
+            self.thread.start()
+            logger.info("Crossfade engine started (%d Hz, %.1f s crossfade).", self.rate, self.crossfade)
+
+    def add_listener(self, callback):
+        """注册播放事件监听器，参数与 AudioPlayer 相同：callback(event, value) 在混音线程中调用"""
+        self.listeners.append(callback)
+
+    def emit(self, kind, value=None):
+        for callback in self.listeners:
+            callback(kind, value)
+
+    @property
+    def crossfade_frames(self):
+        return int(self.crossfade * self.rate)
+
+    def set_crossfade(self, seconds):
+        """修改淡入淡出时长，从下一首预加载开始生效（缓冲容量随之变化）"""
+        self.crossfade = max(0.0, seconds)
+
+    def new_deck(self, track_path, gain_db):
+        info = self.metadata_cache.lookup(track_path)
+        duration = info["duration"] if info else 0
+        capacity = self.crossfade_frames + int(PREBUFFER_SECONDS * self.rate) + self.block_frames
+        deck = Deck(track_path, gain_db, duration, self.rate, capacity, self.converter)
+        deck.start()
+        self.seek_tables.request(track_path)
+        return deck
+
+    def ensure_started(self):
+        """load/preload 前确认引擎可用；启动失败时只记录日志，不在 Tk 回调中重试初始化或抛出异常"""
+        try:
+            self.start()
+        except Exception as e:
+            logger.error("Crossfade engine is unavailable: %s", e)
+            return False
+        return True
+
+    def load(self, track_path, gain_db=0.0):
+        """加载指定路径的音频文件并开始解码（不会开始播放）"""
+        if not os.path.exists(track_path):
+            metrics.incr("crossfade.load_missing")
+            logger.warning("File %s not found.", track_path)
+            return
+        if not self.ensure_started():
+            return
+        with metrics.timed("crossfade.load"):
+            deck = self.new_deck(track_path, gain_db)
+            with self.lock:
+                self.close_decks(keep_next=True)
+                self.deck = deck
+                self.playing = False
+                self.current_track = track_path
+                self.gain_db = gain_db
+                self.total_length = deck.total_frames / self.rate
+                self.paused_position = 0
+                self.paused_at = None
+            self.output.stop()
+        logger.info("Loaded track: %s (%.3f seconds)", track_path, self.total_length)
+
+    def preload(self, track_path, gain_db=0.0):
+        """提前开始解码下一首，供淡入淡出或 play_preloaded 使用"""
+        if not os.path.exists(track_path):
+            logger.warning("File %s not found.", track_path)
+            return
+        if not self.ensure_started():
+            return
+        with metrics.timed("crossfade.preload"):
+            deck = self.new_deck(track_path, gain_db)
+            with self.lock:
+                if self.next_deck is not None:
+                    self.next_deck.close()
+                self.next_deck = deck
+                self.preloaded_track = track_path
+        logger.debug("Preloaded track: %s", track_path)
+
+    def play_preloaded(self):
+        """切换到预加载的曲目，返回是否切换成功；已经自动开始淡入时只更新当前曲目信息"""
+        with self.lock:
+            if self.handed_over:
+                self.handed_over = False
+            elif self.next_deck is not None:
+                if self.deck is not None:
+                    self.deck.close()
+                self.deck, self.next_deck = self.next_deck, None
+                self.playing = True
+            else:
+                return False
+            self.current_track = self.deck.track_path
+            self.gain_db = self.deck.gain_db
+            self.total_length = self.deck.total_frames / self.rate
+            self.paused_position = 0
+            self.preloaded_track = None
+        logger.info("Switched to preloaded track: %s", self.current_track)
+        return True
+
+    def play(self):
+        """播放当前曲目；有暂停位置且与当前位置不同时先跳转"""
+        if not self.current_track:
+            logger.warning("No track loaded. Use the load() method to load a track.")
+            return
+        with self.lock:
+            if self.deck is None:  # 已经播放结束，从头重新解码
+                self.deck = self.new_deck(self.current_track, self.gain_db)
+            seek = self.paused_position > 0 and self.paused_position != self.paused_at
+            if seek:
+                self.seek_deck(self.paused_position)
+            self.playing = True
+            self.paused_position = 0
+            self.paused_at = None
+        if seek:
+            self.output.stop()  # 丢弃暂停前排队的数据
+        else:
+            self.output.resume()
+        self.emit("length", self.total_length)
+
+    def pause(self):
+        """暂停播放，输出端已排队的数据保留到继续播放时"""
+        if self.playing:
+            self.paused_position = self.paused_at = self.get_current_time()
+            self.playing = False
+            self.output.pause()
+            logger.debug("Paused at: %.3f seconds", self.paused_position)
+
+    def resume(self, position=None):
+        """从指定的暂停位置继续播放"""
+        if position is not None:
+            self.paused_position = position
+        self.play()
+
+    def set_position(self, new_pos):
+        """跳转到 new_pos 秒：重新从该位置解码，丢弃输出端已排队的数据"""
+        self.paused_position = self.paused_at = new_pos  # 已经跳转，继续播放时不必再跳
+        with metrics.timed("crossfade.seek"):
+            with self.lock:
+                if self.deck is not None:
+                    self.seek_deck(new_pos)
+            self.output.stop()
+        logger.debug("Set position to: %.3f seconds", new_pos)
+
+    def seek_deck(self, position):
+        """在锁内调用：当前曲目从 position 秒开始重新解码，取消进行中的淡入淡出"""
+        if self.fading is not None:
+            self.fading.close()
+            self.fading = None
+        self.deck.start(int(position * self.rate), self.seek_tables.get(self.deck.track_path))
+        self.streaming = False
+
+    def stop(self):
+        """停止播放并结束所有解码进程"""
+        with self.lock:
+            self.playing = False
+            self.close_decks()
+        if self.output is not None:
+            self.output.stop()
+        self.paused_position = 0
+        logger.debug("Playback stopped")
+
+    def close_decks(self, keep_next=False):
+        for deck in (self.deck, self.fading) + (() if keep_next else (self.next_deck,)):
+            if deck is not None:
+                deck.close()
+        self.deck = self.fading = None
+        if not keep_next:
+            self.next_deck = None
+            self.preloaded_track = None
+        self.handed_over = False
+        self.streaming = False
+
+    def close(self):
+        self.closed = True
+        self.stop()
+
+    def set_volume(self, level):
+        """设置用户音量（0.0 到 1.0），混音线程在下一块内平滑过渡"""
+        self.volume = level
+
+    def get_current_time(self):
+        """获取当前播放时间（秒），扣除输出端尚未播放的部分"""
+        deck = self.deck
+        if deck is None:
+            return 0
+        if not self.playing and self.paused_position:
+            return self.paused_position
+        return max(0, deck.position - self.output.buffered_frames()) / self.rate
+
+    def get_total_length(self):
+        return self.total_length
+
+    def stats(self):
+        """混音耗时分布和每块的时间预算（毫秒），以及欠载次数"""
+        return {
+            "block_ms": self.block_frames / self.rate * 1000,
+            "mix": metrics.histogram("crossfade.mix_block").snapshot(),
+            "underruns": metrics.counters.get("crossfade.underruns", 0),
+            "decoder_starved": metrics.counters.get("crossfade.decoder_starved", 0),
+            "fades": metrics.counters.get("crossfade.fades", 0),
+        }
+
+    # ---- 混音线程 ----
+
+    def _run(self):
+        interval = self.block_frames / self.rate / 4
+        while not self.closed:
+            deck = self.deck
+            if not self.playing or not self.output.ready() or (deck is not None and not deck.primed(self.block_frames)):
+                if not self.playing or deck is not None and not deck.primed(self.block_frames):
+                    self.streaming = False  # 暂停、播放结束或刚加载/跳转：输出端空闲不算欠载
+                time.sleep(interval)
+                continue
+            block, events = self.mix_block()
+            if self.streaming and self.output.idle():
+                metrics.incr("crossfade.underruns")
+            self.output.write(block)
+            self.streaming = True
+            now = time.monotonic()
+            if self.playing and now - self.last_time_event >= TIME_EVENT_INTERVAL:
+                self.last_time_event = now
+                events.append(("time", self.get_current_time()))
+            for kind, value in events:
+                self.emit(kind, value)
+
+    def mix_block(self):
+        """混合一块输出，返回 (int16 块, 需要发出的事件)"""
+        started = time.perf_counter()
+        frames = self.block_frames
+        mix = np.zeros((frames, CHANNELS), dtype=np.float32)
+        events = []
+        with self.lock:
+            if self.deck is not None and self.fading is None:
+                self.maybe_start_fade(events)
+            if self.fading is not None:
+                t = (self.fade_pos + self.ramp_index) / self.fade_frames
+                np.clip(t, 0.0, 1.0, out=t)
+                t *= np.pi / 2
+                self.add_deck(mix, self.fading, np.cos(t))
+                self.add_deck(mix, self.deck, np.sin(t))
+                self.fade_pos += frames
+                if self.fade_pos >= self.fade_frames or self.fading.finished():
+                    self.fading.close()
+                    self.fading = None
+            elif self.deck is not None:
+                self.add_deck(mix, self.deck)
+            if self.deck is not None and self.fading is None and self.deck.finished():
+                self.deck.close()
+                self.deck = None
+                self.playing = False
+                events.append(("end", None))
+
+            if self.applied_volume == self.volume:
+                mix *= self.volume
+            else:  # 音量变化在一块内线性过渡，避免爆音
+                mix *= np.linspace(self.applied_volume, self.volume, frames, dtype=np.float32)[:, None]
+                self.applied_volume = self.volume
+        np.clip(mix, -32768, 32767, out=mix)
+        block = mix.astype(np.int16)
+        metrics.observe("crossfade.mix_block", time.perf_counter() - started)
+        return block, events
+
+    def maybe_start_fade(self, events):
+        """当前曲目进入淡入淡出窗口、且下一首已解码了整个窗口时开始淡入淡出"""
+        deck, incoming = self.deck, self.next_deck
+        remaining = deck.remaining()
+        if incoming is None or remaining is None or remaining > self.crossfade_frames:
+            return
+        fade = min(self.crossfade_frames, remaining)
+        if incoming.total_frames:
+            fade = min(fade, incoming.total_frames // 2)
+        if fade < 2 * self.block_frames:
+            return  # 窗口太短，按普通切换处理
+        if incoming.buffered() < min(fade, incoming.capacity - self.block_frames) and not incoming.finished():
+            return  # 下一首还没解码到足够长，等下一块再检查（窗口随之缩短）
+        self.fading, self.deck, self.next_deck = deck, incoming, None
+        self.fade_frames = fade
+        self.fade_pos = 0
+        self.handed_over = True
+        metrics.incr("crossfade.fades")
+        events.append(("end", None))
+        events.append(("length", incoming.total_frames / self.rate))
+
+    def add_deck(self, mix, deck, ramp=None):
+        """把一首歌的下一块（乘以曲目增益和淡入淡出曲线）叠加到 mix 上"""
+        data = deck.read(len(mix))
+        count = len(data)
+        if count < len(mix) and not deck.finished():
+            metrics.incr("crossfade.decoder_starved")
+        if not count:
+            return
+        if ramp is None:
+            mix[:count] += data * np.float32(deck.gain)
+        else:
+            mix[:count] += data * (ramp[:count] * deck.gain)[:, None]
@@ -0,0 +1,443 @@
+import asyncio
+import json
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .audio_player import create_player
+from .library_index import LibraryIndex
+from .log import get_logger
+from .loudness import track_gain_db
+from .metrics import metrics
+from .play_queue import PlayQueue
+from .track_list import TrackModel
+
+logger = get_logger(__name__)
+
+DEFAULT_SOCKET = "cache/player.sock"
+
+# 订阅者的发送缓冲超过这个字节数时丢弃事件（客户端读得太慢），而不是让服务端排队等待
+SUBSCRIBER_BUFFER_LIMIT = 64 * 1024
+
+
+class _Client:
+    """一个控制连接：按顺序处理命令；订阅后还会收到广播事件"""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.dropped = 0  # 因客户端读取太慢而丢弃的事件数
+
+    def send(self, data):
+        self.writer.write(data)
+
+    def send_event(self, data):
+        """广播事件：发送缓冲已满时直接丢弃，不阻塞事件循环"""
+        if self.writer.is_closing():
+            return
+        if self.writer.transport.get_write_buffer_size() > SUBSCRIBER_BUFFER_LIMIT:
+            self.dropped += 1
+            metrics.incr("daemon.events_dropped")
+            return
+        self.writer.write(data)
+
+
+class PlayerDaemon:
+    """无界面模式：在 Unix 套接字上用按行分隔的 JSON 控制 AudioPlayer 和播放队列
+
+    每行一个请求，例如 {"id": 1, "cmd": "load", "index": 0}，回复 {"id": 1, "ok": true, ...}。
+    命令：load（index / track_id / path，加载并播放）、play、pause、seek（position 秒）、
+    next、previous、mode（0 循环 / 1 单曲 / 2 随机）、status、subscribe、metrics。
+    订阅后连接会收到 {"event": "time" / "length" / "track" / "state" / "library", ...} 事件。
+
+    事件循环只做内存操作；libVLC 和曲库（SQLite）的调用都在一个工作线程中串行执行，
+    所以任何命令都不会阻塞其他连接，libVLC 回调也只是把事件交给事件循环。
+    启动时先监听套接字再扫描曲库：扫描在单独的线程中用另一条数据库连接进行，期间 status 的 scanning 为真。
+    修改播放队列或播放状态的命令在 await 工作线程时会让出事件循环，用一把 asyncio.Lock 串行执行。
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, library_db="cache/library.db", roots=(), engine="vlc", crossfade=None):
+        self.socket_path = socket_path
+        self.library_db = library_db
+        self.roots = list(roots)
+        self.player = create_player(engine, crossfade)
+        self.tracks = TrackModel()
+        self.queue = PlayQueue(self.tracks)
+        self.library = None  # 在工作线程中创建（SQLite 连接只能在创建它的线程中使用）
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="PlayerWorker")
+        self.loop = None
+        self.queue_lock = None  # asyncio.Lock，在 run() 中创建
+        self.scanning = False  # 曲库是否还在加载或扫描
+        self.clients = set()
+        self.subscribers = set()
+        self.state = "stopped"  # stopped / playing / paused
+        self.position = 0.0  # 最近一次 libVLC 报告的播放时间（秒）
+        self.length = 0.0
+        self.current_path = None
+        self.next_track_id = None  # 已预加载的下一首的曲目 ID
+        self.commands = {
+            "load": self.cmd_load,
+            "play": self.cmd_play,
+            "pause": self.cmd_pause,
+            "seek": self.cmd_seek,
+            "next": self.cmd_next,
+            "previous": self.cmd_previous,
+            "mode": self.cmd_mode,
+            "status": self.cmd_status,
+            "subscribe": self.cmd_subscribe,
+            "metrics": self.cmd_metrics,
+        }
+        # 需要持有 queue_lock 执行的命令
+        self.serialized_commands = {"load", "play", "pause", "seek", "next", "previous", "mode"}
+
+    async def run(self):
+        """启动服务，直到收到 SIGINT/SIGTERM"""
+        self.loop = asyncio.get_running_loop()
+        self.queue_lock = asyncio.Lock()
+        self.player.add_listener(self.on_vlc_event)
+
+        directory = os.path.dirname(self.socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # 上次异常退出留下的套接字文件
+        old_umask = os.umask(0o077)  # 套接字只允许当前用户连接
+        try:
+            server = await asyncio.start_unix_server(self.handle_client, path=self.socket_path)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.socket_path, 0o600)
+        logger.info("Headless player listening on %s", self.socket_path)
+        self.scanning = True
+        scan = self.loop.create_task(self.load_library())
+
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(sig, stop.set)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            scan.cancel()
+            for client in list(self.clients):
+                client.writer.close()
+            await self.call(self.player.stop)
+            self.worker.shutdown(wait=False)
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            logger.info("Headless player stopped.")
+
+    async def call(self, function, *args):
+        """在工作线程中执行 libVLC / 曲库调用"""
+        return await self.loop.run_in_executor(self.worker, function, *args)
+
+    async def load_library(self):
+        """先交出已索引的曲目，再在扫描线程中增量扫描根目录，最后补上新发现的曲目"""
+        try:
+            await self.call(self.open_library)
+            done = self.loop.create_future()
+            threading.Thread(target=self.scan_library, args=(done,), name="LibraryScan", daemon=True).start()
+            stats = await done
+            async with self.queue_lock:
+                known = set(self.tracks.ids)
+                self.tracks.extend(await self.call(self.new_tracks, known))
+            logger.info("Library scan finished: %d tracks (%d added, %d removed)",
+                        len(self.tracks), stats["added"], stats["removed"])
+        except Exception as e:
+            logger.error("Failed to scan library: %s", e)
+        finally:
+            self.scanning = False
+            self.publish({"event": "library", "scanning": False, "tracks": len(self.tracks)})
+
+    async def remove_tracks(self, track_ids):
+        """扫描发现文件已删除：从播放列表和播放队列中去掉这些曲目"""
+        async with self.queue_lock:
+            self.queue.rows_removed(self.tracks.remove_ids(track_ids))
+
+    # ---- 工作线程 ----
+
+    def open_library(self):
+        """打开曲库，把已索引的曲目分批交给事件循环；随后加载 libVLC"""
+        self.library = LibraryIndex(self.library_db)
+        for root_path in self.roots:
+            self.library.add_root(root_path)
+        for batch in self.library.iter_tracks():
+            rows = [(track_id, name) for track_id, _, name in batch]
+            self.loop.call_soon_threadsafe(self.tracks.extend, rows)
+        try:
+            self.player.start()
+        except Exception as e:
+            logger.error("Failed to start playback engine: %s", e)
+
+    def new_tracks(self, known_ids):
+        """扫描后曲库中有、播放列表中还没有的曲目 (track_id, name)"""
+        return [(track_id, name) for batch in self.library.iter_tracks()
+                for track_id, _, name in batch if track_id not in known_ids]
+
+    def track_source(self, track_id):
+        """返回 (路径, 响度增益)"""
+        path = self.library.get_path(track_id)
+        loudness = self.library.get_loudness(track_id)
+        return path, track_gain_db(*loudness) if loudness else 0.0
+
+    def start_track(self, track_id):
+        path, gain_db = self.track_source(track_id)
+        if path is None:
+            raise ValueError(f"unknown track id {track_id}")
+        self.player.load(path, gain_db)
+        self.player.play()
+        return path
+
+    def preload_track(self, track_id):
+        path, gain_db = self.track_source(track_id)
+        if path is not None:
+            self.player.preload(path, gain_db)
+
+    def add_path(self, path):
+        track_id = self.library.add_track(path)
+        return track_id, os.path.basename(path)
+
+    # ---- 扫描线程 ----
+
+    def scan_library(self, done):
+        """用单独的数据库连接增量扫描根目录（SQLite 连接不能跨线程），结果交给事件循环中的 done"""
+        library = LibraryIndex(self.library_db)
+        try:
+            result, error = library.rescan(on_removed=self.on_tracks_removed), None
+        except Exception as e:
+            result, error = None, e
+        finally:
+            library.close()
+        try:
+            self.loop.call_soon_threadsafe(_settle, done, result, error)
+        except RuntimeError:
+            pass  # 事件循环已经关闭
+
+    def on_tracks_removed(self, track_ids):
+        asyncio.run_coroutine_threadsafe(self.remove_tracks(track_ids), self.loop)
+
+    # ---- libVLC 事件 ----
+
+    def on_vlc_event(self, kind, value):
+        """libVLC 线程：只把事件交给事件循环"""
+        self.loop.call_soon_threadsafe(self.on_player_event, kind, value)
+
+    def on_player_event(self, kind, value):
+        if kind == "time":
+            self.position = value
+            self.publish({"event": "time", "position": value})
+        elif kind == "length":
+            self.length = value
+            self.publish({"event": "length", "length": value})
+        elif kind == "end" and self.state == "playing":
+            self.loop.create_task(self.auto_advance())
+
+    def publish(self, event):
+        """把事件广播给所有订阅者（只编码一次）"""
+        if not self.subscribers:
+            return
+        data = (json.dumps(event) + "\n").encode("utf-8")
+        for client in self.subscribers:
+            client.send_event(data)
+
+    # ---- 播放控制（事件循环） ----
+
+    async def play_index(self, index):
+        self.queue.play(index)
+        self.current_path = await self.call(self.start_track, self.tracks.track_id(index))
+        self.track_started()
+        await self.preload_next()
+
+    def track_started(self):
+        self.state = "playing"
+        self.position = 0.0
+        self.length = self.player.get_total_length()
+        self.publish(dict(self.status(), event="track"))
+
+    async def preload_next(self):
+        next_index = self.queue.peek_next(auto=True)
+        self.next_track_id = None if next_index is None else self.tracks.track_id(next_index)
+        if self.next_track_id is not None:
+            await self.call(self.preload_track, self.next_track_id)
+
+    async def auto_advance(self):
+        """曲目自然结束：和命令一样在 queue_lock 下前进"""
+        async with self.queue_lock:
+            if self.state == "playing":
+                await self.advance(auto=True)
+
+    async def advance(self, auto=False):
+        """前进到下一首；自然结束且预加载的正是下一首时直接切换"""
+        next_index = self.queue.peek_next(auto)
+        if next_index is None:
+            return
+        # 比较曲目 ID 而不是行号：删除曲目后同一行可能已经是另一首
+        if (auto and self.tracks.track_id(next_index) == self.next_track_id
+                and await self.call(self.player.play_preloaded)):
+            self.queue.next(auto)
+            self.current_path = self.player.current_track
+            self.track_started()
+            await self.preload_next()
+            return
+        self.queue.next(auto)
+        await self.play_index(next_index)
+
+    def set_state(self, state):
+        self.state = state
+        self.publish({"event": "state", "state": state, "position": self.position})
+
+    def status(self):
+        index = self.queue.current
+        return {
+            "state": self.state,
+            "index": index,
+            "track_id": self.tracks.track_id(index) if index is not None and index < len(self.tracks) else None,
+            "path": self.current_path,
+            "position": self.position,
+            "length": self.length,
+            "mode": self.queue.mode,
+            "tracks": len(self.tracks),
+            "scanning": self.scanning,
+        }
+
+    # ---- 命令 ----
+
+    async def cmd_load(self, request, client):
+        if "index" in request:
+            index = int(request["index"])
+            if not 0 <= index < len(self.tracks):
+                raise IndexError(f"index {index} out of range")
+        elif "track_id" in request:
+            index = self.tracks.index_of(int(request["track_id"]))
+            if index is None:
+                raise ValueError(f"unknown track id {request['track_id']}")
+        else:
+            path = os.path.abspath(request["path"])
+            track_id, name = await self.call(self.add_path, path)
+            index = self.tracks.index_of(track_id)
+            if index is None:
+                self.tracks.append(track_id, name)
+                index = len(self.tracks) - 1
+        await self.play_index(index)
+        return self.status()
+
+    async def cmd_play(self, request, client):
+        if self.state == "paused":
+            await self.call(self.player.resume)
+            self.set_state("playing")
+        elif self.state == "stopped":
+            if self.queue.current is not None:
+                await self.play_index(self.queue.current)
+            else:
+                await self.advance()
+        return self.status()
+
+    async def cmd_pause(self, request, client):
+        if self.state == "playing":
+            await self.call(self.player.pause)
+            self.set_state("paused")
+        return self.status()
+
+    async def cmd_seek(self, request, client):
+        position = max(0.0, float(request["position"]))
+        await self.call(self.player.set_position, position)
+        self.position = position
+        return self.status()
+
+    async def cmd_next(self, request, client):
+        await self.advance()
+        return self.status()
+
+    async def cmd_previous(self, request, client):
+        index = self.queue.previous()
+        if index is not None:
+            await self.play_index(index)
+        return self.status()
+
+    async def cmd_mode(self, request, client):
+        mode = int(request["mode"])
+        if mode not in (0, 1, 2):
+            raise ValueError(f"invalid mode {mode}")
+        self.queue.set_mode(mode)
+        if self.state != "stopped":
+            await self.preload_next()
+        return self.status()
+
+    async def cmd_status(self, request, client):
+        return self.status()
+
+    async def cmd_subscribe(self, request, client):
+        self.subscribers.add(client)
+        return self.status()
+
+    async def cmd_metrics(self, request, client):
+        return {"metrics": metrics.snapshot()}
+
+    async def dispatch(self, line, client):
+        """解析并执行一行请求，返回回复（dict）"""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            return {"ok": False, "error": f"invalid request: {e}"}
+        name = request.get("cmd")
+        handler = self.commands.get(name) if isinstance(name, str) else None  # 列表等不可哈希的值不能做键
+        if handler is None:
+            response = {"ok": False, "error": f"unknown command {name!r}"}
+        else:
+            start = time.perf_counter()
+            try:
+                if name in self.serialized_commands:
+                    async with self.queue_lock:
+                        result = await handler(request, client)
+                else:
+                    result = await handler(request, client)
+                response = dict(result, ok=True)
+            except (KeyError, ValueError, TypeError, IndexError, OSError) as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            except Exception as e:
+                logger.exception("Command %s failed", name)
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            metrics.observe(f"daemon.cmd.{name}", time.perf_counter() - start)
+        if "id" in request:
+            response["id"] = request["id"]
+        return response
+
+    async def handle_client(self, reader, writer):
+        """按顺序处理一个连接上的请求，直到对方关闭连接"""
+        client = _Client(writer)
+        self.clients.add(client)
+        metrics.incr("daemon.connections")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                response = await self.dispatch(line, client)
+                client.send((json.dumps(response) + "\n").encode("utf-8"))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # 连接断开，或单行请求超过读取缓冲上限
+        finally:
+            self.clients.discard(client)
+            self.subscribers.discard(client)
+            writer.close()
+
+
+def _settle(future, result, error):
+    """在事件循环中完成扫描线程的 future（等待方已取消时忽略）"""
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def run_daemon(socket_path=DEFAULT_SOCKET, roots=(), library_db="cache/library.db", engine="vlc", crossfade=None):
+    """无界面模式入口"""
+    asyncio.run(PlayerDaemon(socket_path, library_db, roots, engine, crossfade).run())
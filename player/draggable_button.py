@@ -1,45 +1,78 @@
 import tkinter as tk
 from tkinter import filedialog
-from PIL import Image, ImageTk
-import json
 import os
 
+from .icon_cache import IconCache
+from .settings_store import SettingsStore
+
 class DraggableButtonManager:
     def __init__(self, root, config_file="D:/C++Projrct/Music_player/button_config.json"):
         self.root = root
         self.buttons = {}  # 存储按钮
-        self.icons = {}    # 缓存图标
+        self.icons = {}    # 缓存图标（尚未解码的位置为 None）
+        self.icon_paths = {}  # 每个按钮的图标路径列表
+        self.icon_cache = IconCache()  # 50x50 缩略图的磁盘缓存
         self.config_file = config_file  # 配置文件路径
+        self.store = None  # 延迟写盘的配置存储
         self.config = self.load_button_config()  # 加载配置文件
-        self.load_all_icons()  # 预加载所有图标
+        self.load_all_icons()  # 登记所有图标路径（按需解码）
+
+    def load_icon(self, path):
+        """通过缩略图缓存加载单个图标，失败时返回 None"""
+        try:
+            return self.icon_cache.photo(path)
+        except Exception as e:
+            print(f"[ERROR] Failed to load icon '{path}'. Exception: {e}")
+            return None
 
     def load_icons(self, icon_paths):
         """加载多个图标并缓存"""
         icon_list = []
         for path in icon_paths:
             if os.path.exists(path):
-                try:
-                    icon = ImageTk.PhotoImage(Image.open(path).resize((50, 50)))
+                icon = self.load_icon(path)
+                if icon:
                     icon_list.append(icon)
-                except Exception as e:
-                    print(f"[ERROR] Failed to load icon '{path}'. Exception: {e}")
             else:
                 print(f"[ERROR] Icon file '{path}' does not exist.")
         return icon_list
 
+    def register_icons(self, name, icon_paths):
+        """登记按钮的图标路径（只保留存在的文件），icons 和 icon_paths 按同一个列表一一对应"""
+        existing = []
+        for path in icon_paths:
+            if path and os.path.exists(path):
+                existing.append(path)
+            else:
+                print(f"[ERROR] Icon file '{path}' does not exist.")
+        self.icon_paths[name] = existing
+        self.icons[name] = [None] * len(existing)
+
     def load_all_icons(self):
-        """加载配置文件中的所有图标"""
+        """登记配置文件中的所有图标路径，不立即解码，首次显示时才加载"""
         for name, config in self.config.items():
-            icon_paths = config.get("icons", [config.get("icon")])  # 支持单一图标或多图标
-            self.icons[name] = self.load_icons(icon_paths)  # 缓存每个按钮的多图标
+            self.register_icons(name, config.get("icons", [config.get("icon")]))  # 支持单一图标或多图标
+
+    def get_button_icon(self, name, index):
+        """返回按钮第 index 个图标，第一次请求时才解码"""
+        icon_list = self.icons[name]
+        if icon_list[index] is None:
+            icon_list[index] = self.load_icon(self.icon_paths[name][index])
+        return icon_list[index]
 
     def create_button(self, name, default_image_path, command, default_x, default_y, initial_icon_index=0):
         """创建可拖动的按钮，支持初始图标索引，并执行特定的点击操作"""
         config = self.config.get(name, {})
-        icon_list = self.icons.get(name) or [ImageTk.PhotoImage(Image.open(default_image_path).resize((50, 50)))]
-        
+        icon_list = self.icons.get(name)
+
         # 限制初始图标索引范围
-        initial_icon_index = min(initial_icon_index, len(icon_list) - 1)
+        initial_icon_index = min(initial_icon_index, len(icon_list) - 1) if icon_list else 0
+        if not icon_list or self.get_button_icon(name, initial_icon_index) is None:
+            # 没有可用的配置图标时使用默认图标
+            icon_list = [self.load_icon(default_image_path)]
+            self.icons[name] = icon_list
+            self.icon_paths[name] = [default_image_path]
+            initial_icon_index = 0
         
         x = config.get("x", default_x)
         y = config.get("y", default_y)
@@ -73,24 +106,30 @@ class DraggableButtonManager:
         if not button or icon_index >= len(button.image_list):
             print(f"[ERROR] Invalid icon index {icon_index} for button '{button_name}'.")
             return
-        
+        icon = self.get_button_icon(button_name, icon_index)  # 备用图标在这里才第一次解码
+        if icon is None:
+            return
+
         # 更新图标索引并配置按钮图标
         button.image_index = icon_index
-        button.config(image=button.image_list[icon_index])
-        button.image = button.image_list[icon_index]  # 更新图标引用
+        button.config(image=icon)
+        button.image = icon  # 更新图标引用
     def switch_icon(self, button, name):
         """右键点击更新按钮当前状态的图标路径"""
         new_icon_path = filedialog.askopenfilename(filetypes=[("Image Files", "*.png *.jpg *.jpeg")])
         if new_icon_path:
             # 加载并设置新图标
-            new_icon = ImageTk.PhotoImage(Image.open(new_icon_path).resize((50, 50)))
+            new_icon = self.icon_cache.photo(new_icon_path)
+            old_icon_path = self.icon_paths[name][button.image_index]
             button.image_list[button.image_index] = new_icon
+            self.icon_paths[name][button.image_index] = new_icon_path
             button.config(image=new_icon)
             button.image = new_icon  # 保存新图标引用
 
-            # 更新配置文件中的图标路径
-            if "icons" in self.config[name]:
-                self.config[name]["icons"][button.image_index] = new_icon_path
+            # 更新配置文件中的图标路径（配置里可能还有不存在的图标，按路径而不是按下标找到对应项）
+            config_icons = self.config.get(name, {}).get("icons")
+            if config_icons and old_icon_path in config_icons:
+                config_icons[config_icons.index(old_icon_path)] = new_icon_path
                 self.write_config()  # 将新路径写入配置文件
 
     def start_drag(self, event):
@@ -149,22 +188,19 @@ class DraggableButtonManager:
 
     def load_button_config(self):
         """加载配置文件"""
-        if os.path.exists(self.config_file):
-            with open(self.config_file, "r") as f:
-                return json.load(f)
-        print(f"[ERROR] Config file '{self.config_file}' not found.")
-        return {}
+        if not os.path.exists(self.config_file):
+            print(f"[ERROR] Config file '{self.config_file}' not found.")
+        self.store = SettingsStore(self.config_file, root=self.root)
+        return self.store.data
 
     def write_config(self):
-        """将配置写入文件"""
-        with open(self.config_file, "w") as f:
-            json.dump(self.config, f, indent=4)
+        """标记配置已修改；拖动过程中的多次修改会合并成一次原子写盘"""
+        self.store.mark_dirty()
 
     def get_icon(self, icon_name):
         """返回已缓存的图标，如果未缓存则尝试加载"""
-        icon_list = self.icons.get(icon_name)
-        if not icon_list:
-            icon_paths = self.config.get(icon_name, {}).get("icons", [])
-            icon_list = self.load_icons(icon_paths)
-            self.icons[icon_name] = icon_list
-        return icon_list[0] if icon_list else None  # 返回第一个图标作为默认图标
+        if not self.icons.get(icon_name):
+            self.register_icons(icon_name, self.config.get(icon_name, {}).get("icons", []))
+        if not self.icons[icon_name]:
+            return None
+        return self.get_button_icon(icon_name, 0)  # 返回第一个图标作为默认图标
@@ -1,36 +1,73 @@
 import tkinter as tk
 from tkinter import filedialog, Listbox
-from .audio_player import AudioPlayer
+import threading
+from .album_art import AlbumArtCache
+from .audio_player import create_player
 from .draggable_button import DraggableButtonManager
-from PIL import Image, ImageTk
+from .image_cache import ImageDecoder
 from .wallpaper_manager import WallpaperManager
 import os
 from .slide import VolumeControl
+from .volume_backends import create_volume_backend
 from .playlist_manager import PlaylistManager
+from .metrics import metrics
+from .startup_profile import StartupProfiler
+from .tk_dispatcher import TkDispatcher
+from .peaks import PeakCache
+from .playback_clock import PlaybackClock
+from .playlist_files import PLAYLIST_FILETYPES
+from .seek_scheduler import SeekScheduler
+from .waveform_bar import WaveformSeekBar
 
 test_music_folder = "./resource/music"
+# 进度条动画的刷新间隔（毫秒），约 60 帧/秒；位置由播放时钟插值，不查询 libVLC
+FRAME_INTERVAL_MS = 16
+# 封面显示尺寸，以及内存中封面 PhotoImage 的总大小上限（字节）
+COVER_SIZE = (160, 160)
+COVER_CACHE_BYTES = 16 * 1024 * 1024
 
 class AudioPlayerGUI:
-    def __init__(self, root):
+    def __init__(self, root, profiler=None, volume_backend="auto", engine="vlc", crossfade=None):
         self.root = root
-        self.root.title("Modern Music Player")
-        self.root.geometry("1100x700")
-        self.root.configure(bg="#2C3E50")  # 设置主窗口背景颜色
+        self.volume_backend = volume_backend  # 音量后端名称（auto/vlc/system/null）
+        self.engine = engine  # 播放引擎（vlc/crossfade）
+        self.crossfade = crossfade  # crossfade 引擎的淡入淡出时长（秒），None 为默认值
+        self.profiler = profiler or StartupProfiler()
+        with self.profiler.phase("window"):
+            self.root.title("Modern Music Player")
+            self.root.geometry("1100x700")
+            self.root.configure(bg="#2C3E50")  # 设置主窗口背景颜色
 
-        # 初始化音频播放器
-        self.player = AudioPlayer()
+        # 首帧只创建控件；libVLC、系统音量、壁纸和曲库在首帧之后加载（见 finish_startup）
+        with self.profiler.phase("first frame controls"):
+            self.create_controls()
+        self.map_binding = self.root.bind("<Map>", self.on_first_map, add="+")
+        self.startup_steps = 2  # 主线程阶段和 libVLC 初始化都完成后才打印启动耗时
+        self.root.bind("<F12>", lambda event: metrics.dump())  # 运行时查看播放器指标
+        self.root.bind("<Control-o>", lambda event: self.import_playlist())
+        self.root.bind("<Control-s>", lambda event: self.export_playlist())
+
+    def create_controls(self):
+        """创建首帧需要的播放器对象和控件（都不涉及 libVLC 或磁盘扫描）"""
+        root = self.root
+
+        # 初始化音频播放器（libVLC 在 start() 中才加载），libVLC 事件经调度器转交到主线程
+        self.player = create_player(self.engine, self.crossfade)
+        self.player_events = TkDispatcher(self.root, self.on_player_event)
+        self.player.add_listener(self.player_events.post)
 
         # 初始化状态变量
         self.is_playing = False  # 用于跟踪播放状态
         self.play_mode = 0  # 0: 循环播放, 1: 单曲循环, 2: 随机播放
-        self.after_id = None  # 用于存储 after 调用的 ID
+        self.after_id = None  # 进度条动画的 after 调用 ID
+        self.clock = PlaybackClock()  # 以播放器报告的时间为锚点插值，供进度条按帧刷新
         self.paused_position = 0  # 记录暂停位置
+        self.next_track_id = None  # 已预加载的下一首的曲目 ID（删除曲目后行号会变，不能用行号判断）
         self.wallpaper_manager = WallpaperManager(self.root,"wallpaper_config.json")
-        self.volume_control = VolumeControl(root, initial_volume=50)
+        self.volume_control = VolumeControl(root, initial_volume=50,
+                                            backend=create_volume_backend(self.volume_backend, self.player))
         self.button_manager = DraggableButtonManager(self.root, "button_config.json")
         self.playlist = PlaylistManager(self.root)
-          # Adjust this path to your test music folder
-        self.playlist.load_default_playlist(test_music_folder)
 
         # 使用按钮管理器创建按钮，不再手动写路径
         self.toggle_button = self.button_manager.create_button("toggle_button", "resource/image/list.png", self.playlist.toggle_playlist, 50, 50)
@@ -47,58 +84,121 @@ class AudioPlayerGUI:
         control_frame = tk.Frame(root, bg="#2C3E50")
         control_frame.pack(pady=10)
 
-        # 进度条
-        self.progress_var = tk.DoubleVar()
-        self.progress_bar = tk.Scale(
-            root,
-            variable=self.progress_var,
-            from_=0,
-            to=100,
-            orient="horizontal",
-            length=300,
-            showvalue=0,
-            command=self.set_progress,
-            bg="#2C3E50",
-            fg="white",
-            troughcolor="gray",
-            sliderlength=15
-        )
+        # 波形进度条：包络在后台进程中计算并按文件内容哈希缓存
+        self.peak_cache = PeakCache()
+        self.peak_events = TkDispatcher(self.root, self.on_peaks_ready, sequence="<<PeaksReady>>")
+        self.waveform_path = None  # 波形进度条当前对应的歌曲
+        self.seeker = SeekScheduler(self.player.set_position)  # 拖动时的跳转合并为最多一个执行中 + 一个等待中
+        self.progress_bar = WaveformSeekBar(root, on_seek=self.seek_to, on_scrub=self.seek_to, width=500, height=60)
         self.progress_bar.place(relx=0.5, rely=0.9, anchor="center")
 
-        # 绑定拖动开始和停止事件
-        self.progress_bar.bind("<ButtonPress-1>", self.pause_during_drag)
-        self.progress_bar.bind("<ButtonRelease-1>", self.resume_after_drag)
+        # 封面：在工作线程池中取出并缩小（磁盘缩略图缓存），主线程只创建 PhotoImage
+        self.album_art = ImageDecoder(root, max_bytes=COVER_CACHE_BYTES, workers=2, decode=AlbumArtCache().load)
+        self.cover_label = tk.Label(root, bg="#2C3E50", bd=0)
+        self.cover_path = None  # 封面区域当前对应的歌曲
+        self.cover_photo = None  # 保持显示中的 PhotoImage 的引用，被 LRU 淘汰后也不会消失
+
+    def on_first_map(self, event):
+        """主窗口第一次映射后，等待已排队的重绘完成再加载其余部分"""
+        if event.widget is not self.root:
+            return
+        self.remove_map_binding()
+        self.root.after_idle(self.finish_startup)
+
+    def remove_map_binding(self):
+        """只删除自己添加的 <Map> 绑定（Python 3.13 之前 unbind(sequence, funcid) 会清掉该事件的所有绑定）"""
+        script = self.root.bind("<Map>")
+        self.root.bind("<Map>", "\n".join(line for line in script.split("\n") if self.map_binding not in line))
+        self.root.deletecommand(self.map_binding)
+
+    def finish_startup(self):
+        """首帧之后的启动阶段：后台初始化 libVLC，随后加载音量、壁纸和曲库"""
+        self.profiler.mark("first frame")
+        threading.Thread(target=self.start_player_backend, name="PlayerStartup", daemon=True).start()
+
+        with self.profiler.phase("volume backend"):
+            try:
+                self.volume_control.start()
+            except Exception as e:
+                print(f"[ERROR] Failed to initialise volume backend '{self.volume_backend}', volume control disabled. Exception: {e}")
+        with self.profiler.phase("wallpaper request"):
+            self.wallpaper_manager.show_current()
+        with self.profiler.phase("library scan start"):
+            # Adjust this path to your test music folder
+            self.playlist.start_library_scan([test_music_folder])
+        self.startup_step_done()
+
+    def startup_step_done(self):
+        """主线程：一侧的启动阶段完成，两侧都完成后在空闲时打印启动耗时"""
+        self.startup_steps -= 1
+        if self.startup_steps == 0:
+            self.root.after_idle(self.profiler.report)
+
+    def start_player_backend(self):
+        """后台线程：加载 libVLC 并创建播放器，完成后通知主线程"""
+        with self.profiler.phase("libVLC init"):
+            try:
+                self.player.start()
+            except Exception as e:
+                print(f"[ERROR] Failed to start playback engine '{self.engine}'. Exception: {e}")
+        self.player_events.post("started", None)
 
     def play_selected_track(self):
         """播放 PlaylistManager 中选中的歌曲"""
         selected_song = self.playlist.get_selected_track()
         print(selected_song)
         if selected_song:
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            song_path = os.path.join(base_dir, "..", "resource", "music", selected_song)
-            self.player.load(song_path)
+            song_path = self.playlist.get_selected_track_path()
+            self.seeker.cancel()  # 上一首的跳转不能落到新歌上：返回后没有跳转在执行，旧目标都会被丢弃
+            self.playlist.play_index(self.playlist.selected_index)
+            self.player.load(song_path, self.playlist.get_track_gain(self.playlist.selected_index))
             self.player.play()
+            self.clock.reset(0, running=True)
+            self.show_waveform(song_path)
+            self.show_cover(song_path)
             print(f"Playing {selected_song}")
+            self.preload_next()
         else:
             print("No track selected.")
 
+    def import_playlist(self):
+        """选择播放列表文件并导入（替换当前播放列表）"""
+        playlist_path = filedialog.askopenfilename(title="导入播放列表", filetypes=PLAYLIST_FILETYPES)
+        if playlist_path:
+            self.playlist.import_playlist(playlist_path)
+
+    def export_playlist(self):
+        """把当前播放列表保存为 M3U8/PLS/原生格式文件"""
+        playlist_path = filedialog.asksaveasfilename(title="导出播放列表", defaultextension=".m3u8",
+                                                     filetypes=PLAYLIST_FILETYPES)
+        if not playlist_path:
+            return
+        try:
+            count = self.playlist.export_playlist(playlist_path)
+        except OSError as e:
+            print(f"[ERROR] Failed to export playlist '{playlist_path}'. Exception: {e}")
+            return
+        print(f"Exported {count} tracks to {playlist_path}")
+
+    def preload_next(self):
+        """从播放队列取出下一首（不前进），并在第二个播放器上提前准备好"""
+        next_index = self.playlist.peek_next_index()
+        self.next_track_id = None
+        if next_index is not None:
+            next_path = self.playlist.get_track_path(next_index)
+            self.next_track_id = self.playlist.tracks.track_id(next_index)
+            self.player.preload(next_path, self.playlist.get_track_gain(next_index))
+            self.album_art.prefetch(next_path, COVER_SIZE)  # 切换时封面已在内存中
+
     def play_previous(self):
-        """播放上一首歌曲"""
-        self.update_progress_bar
-        self.playlist.select_previous_track()
-        self.play_selected_track()
-
-    def play_next(self):
-        """播放下一首歌曲"""
-        self.update_progress_bar
-        self.playlist.select_next_track()
-        self.play_selected_track()
-
-    def play_random_track(self):
-        """随机播放一首歌曲"""
-        self.update_progress_bar
-        self.playlist.select_random_track()
-        self.play_selected_track()
+        """播放上一首歌曲（按播放历史）"""
+        if self.playlist.select_previous_track():
+            self.play_selected_track()
+
+    def play_next(self, auto=False):
+        """按播放模式播放下一首歌曲；auto 表示当前歌曲自然播放结束"""
+        if self.playlist.select_next_track(auto):
+            self.play_selected_track()
 
     def toggle_play_pause(self):
         """播放和暂停的切换功能"""
@@ -107,6 +207,7 @@ class AudioPlayerGUI:
             # 当前正在播放，点击后暂停
             self.is_playing = False
             self.player.pause()
+            self.clock.reset(self.player.paused_position, running=False)
             self.button_manager.update_button_icon("play_pause_button", 0)  # 切换到播放图标
             if self.after_id:
                 self.root.after_cancel(self.after_id)  # 停止进度条更新
@@ -115,6 +216,7 @@ class AudioPlayerGUI:
             # 当前暂停，点击后开始播放
             print(self.player.paused_position)
             if self.player.paused_position:  # 如果有暂停位置，继续播放
+                self.clock.reset(self.player.paused_position, running=True)
                 self.player.resume(self.player.paused_position)
             else:
                 self.play_selected_track()  # 播放当前选中的歌曲
@@ -128,6 +230,7 @@ class AudioPlayerGUI:
         """切换播放模式并更新图标"""
         # 循环切换播放模式
         self.play_mode = (self.play_mode + 1) % 3
+        self.playlist.queue.set_mode(self.play_mode)
         
         # 根据播放模式选择图标并更新显示
         if self.play_mode == 0:
@@ -142,81 +245,103 @@ class AudioPlayerGUI:
             print("播放模式: 随机播放")
             self.button_manager.update_button_icon("play_mode_button", 2)
             # 在这里添加随机播放的逻辑
+
+        # 播放模式变化后下一首也随之变化，重新预加载
+        if self.player.current_track:
+            self.preload_next()
      
-    def pause_during_drag(self, event):
-        """拖动进度条开始时暂停播放，并禁止进度条自动更新"""
+    def seek_to(self, position_ms):
+        """点击或拖动波形时跳转到指定位置（毫秒）；暂停时记下位置，继续播放时从这里开始"""
         if self.is_playing:
-            self.player.pause()  # 暂停播放
-            self.was_playing = True
-            self.is_playing = False  # 设置为 False，停止进度条自动更新
-
-            # 取消自动更新进度条的定时任务
-            if self.after_id:
-                self.root.after_cancel(self.after_id)
-                self.after_id = None
+            self.seeker.request(position_ms / 1000)
         else:
-            self.was_playing = False
-
-    def resume_after_drag(self, event):
-        """拖动停止时恢复播放，并允许进度条自动更新"""
-        # 更新暂停位置为停止拖动时的进度条位置
-        self.paused_position = (self.progress_var.get() / 100) * self.player.get_total_length()
-        print(f"Updated paused_position to: {self.paused_position} seconds")  # 输出当前位置以便调试
-        print(self.was_playing)
-
-        # 只在之前正在播放的情况下恢复播放
-        if self.was_playing:
-            # print(self.was_playing)
-            # print(self.paused_position)
-            # position=self.paused_position
-            self.player.resume(self.player.paused_position)  # 从新的暂停位置恢复播放
-            self.is_playing = True  # 设置为 True，允许进度条自动更新
-            self.update_progress_bar()  # 恢复进度条更新
-            self.was_playing = False
-
-    def set_progress(self, value):
-        """根据用户拖动进度条设置播放进度"""
-        if self.player.get_total_length() > 0:
-            # 将拖动的位置转换为实际播放时间
-            new_pos = (float(value) / 100) * self.player.get_total_length()
-            self.player.set_position(new_pos)  # 设置新的播放位置
-    
+            self.player.paused_position = position_ms / 1000
+        self.clock.reset(position_ms / 1000)  # 进度条从目标位置继续走，不等 libVLC 报告
+
+    def show_waveform(self, track_path):
+        """显示歌曲的波形，没有缓存时提交到进程池计算，算完后再显示"""
+        self.waveform_path = track_path
+        peaks = self.peak_cache.get(track_path)
+        self.progress_bar.set_peaks(peaks)
+        if peaks is None and track_path:
+            future = self.peak_cache.submit(track_path)
+            future.add_done_callback(lambda f: self.peak_events.post(track_path, f))
+
+    def show_cover(self, track_path):
+        """显示歌曲封面；已预取时立即显示，否则先隐藏，后台取出后再显示"""
+        self.cover_path = track_path
+        if self.album_art.request(track_path, COVER_SIZE, self.on_cover_ready) is None:
+            self.cover_label.place_forget()
+            self.cover_photo = None
+
+    def on_cover_ready(self, key, photo):
+        """主线程：封面仍属于当前歌曲时显示出来"""
+        if key[0] != self.cover_path:
+            return
+        self.cover_photo = photo
+        self.cover_label.configure(image=photo)
+        self.cover_label.place(relx=0.5, rely=0.74, anchor="center")
+
+    def on_peaks_ready(self, track_path, future):
+        """主线程：保存进程池算好的包络，仍是当前歌曲时显示出来"""
+        try:
+            digest, data = future.result()
+            peaks = self.peak_cache.store(track_path, digest, data)
+        except Exception as e:
+            print(f"[ERROR] Failed to compute waveform for '{track_path}'. Exception: {e}")
+            return
+        if track_path == self.waveform_path:
+            self.progress_bar.set_peaks(peaks)
+
     def update_progress_bar(self):
-        """更新进度条，显示当前歌曲进度"""
-        # 检查播放状态
+        """向播放器取一次当前时间作为时钟锚点，并启动进度条动画（之后的校正由 libVLC 时间事件驱动）"""
         if not self.is_playing:
             return  # 如果暂停或停止，不更新进度条
-        
-        # 获取当前播放时间和总时长
-        current_pos = self.player.get_current_time()
-        total_length = self.player.get_total_length()
+        self.progress_bar.set_duration(self.player.get_total_length() * 1000)
+        if not self.seeker.busy():
+            self.clock.sample(self.player.get_current_time())
+        if self.after_id is None:
+            self.animate_progress()
 
-        if total_length > 0:
-            # 更新进度条位置
-            self.progress_var.set((current_pos / total_length) * 100)
-            
-            # 检测是否接近歌曲结束（误差范围：0.5 秒内）
-            if abs(total_length - current_pos) < 0.5:
-                # 如果歌曲即将结束，根据播放模式进行处理
-                self.on_song_end()
-                return  # 停止进一步的进度条更新
+    def animate_progress(self):
+        """每帧按播放时钟的插值位置刷新进度条和时间标签"""
+        if not self.is_playing:
+            self.after_id = None
+            return
+        self.progress_bar.set_position(self.clock.position() * 1000)
+        self.after_id = self.root.after(FRAME_INTERVAL_MS, self.animate_progress)
 
-        # 设置定时任务以继续更新进度条
-        self.after_id = self.root.after(500, self.update_progress_bar)
+    def on_player_event(self, kind, value):
+        """在主线程中处理 libVLC 事件"""
+        if kind == "end":
+            if self.is_playing:
+                self.on_song_end()
+        elif kind == "time":
+            if self.is_playing and not self.seeker.busy():  # 跳转完成前的旧时间会让进度条来回跳
+                self.clock.sample(value)
+        elif kind == "length":
+            self.progress_bar.set_duration(value * 1000)
+        elif kind == "started":
+            self.startup_step_done()
 
     def on_song_end(self):
         """处理歌曲结束后的操作"""
         # 重置进度条到 0
-        self.progress_var.set(0)
+        self.progress_bar.set_position(0)
+        self.seeker.cancel()
+        self.clock.reset(0)
         print(self.is_playing)
-        if self.play_mode == 0:  # 循环播放模式
-            self.play_next()
-            self.update_progress_bar()
-        elif self.play_mode == 1:  # 单曲循环模式
-            self.play_selected_track()  # 重新播放当前歌曲
-            self.update_progress_bar()
-        elif self.play_mode == 2:  # 随机播放模式
-            self.play_random_track()
-            self.update_progress_bar()
+        next_index = self.playlist.peek_next_index()
+        if (next_index is not None and self.playlist.tracks.track_id(next_index) == self.next_track_id
+                and self.player.play_preloaded()):
+            # 预加载的就是队列的下一首（期间没有插入“接下来播放”），直接切换，不再重新加载
+            self.playlist.select_next_track(auto=True)
+            self.show_waveform(self.player.current_track)
+            self.show_cover(self.player.current_track)
+            self.preload_next()
+        else:
+            # 按播放模式由播放队列决定下一首（单曲循环时即当前歌曲）
+            self.play_next(auto=True)
+        self.update_progress_bar()
 
 
@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import filedialog, Listbox
 from .audio_player import AudioPlayer
 from .draggable_button import DraggableButtonManager
+from .library_index import LibraryIndex
 from PIL import Image, ImageTk
 import os
 
@@ -115,16 +116,20 @@ class AudioPlayerGUI:
     
 
     def load_default_playlist(self):
-        """自动加载 resource/music 文件夹下的所有 MP3 文件到播放列表"""
+        """从曲库索引加载 resource/music 文件夹下的所有音频文件到播放列表"""
         base_dir = os.path.dirname(os.path.abspath(__file__))
         songs_folder = os.path.join(base_dir, "..", "resource", "music")
-        
+
+        self.library = LibraryIndex()
+        self.track_ids = []  # 与列表中每一行对应的曲目 ID
         if os.path.exists(songs_folder):
-            for file_name in os.listdir(songs_folder):
-                if file_name.endswith(".mp3"):
-                    self.playlist.insert(tk.END, file_name)
+            self.library.add_root(songs_folder)
         else:
             print(f"Folder {songs_folder} not found.")
+        self.library.rescan()
+        for batch in self.library.iter_tracks():
+            self.playlist.insert(tk.END, *[name for _, _, name in batch])
+            self.track_ids.extend(track_id for track_id, _, _ in batch)
 
     def load_track(self):
         """打开文件选择器，加载音频文件"""
@@ -132,6 +137,7 @@ class AudioPlayerGUI:
         if track_path:
             self.player.load(track_path)
             print(f"Loaded {track_path}")
+            self.track_ids.append(self.library.add_track(track_path))
             self.playlist.insert(tk.END, os.path.basename(track_path))
 
     def play_selected_track(self):
@@ -139,8 +145,7 @@ class AudioPlayerGUI:
         try:
             selected_index = self.playlist.curselection()[0]
             selected_song = self.playlist.get(selected_index)
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            song_path = os.path.join(base_dir, "..", "resource", "music", selected_song)
+            song_path = self.library.get_path(self.track_ids[selected_index])
             self.player.load(song_path)
             self.player.play()
             print(f"Playing {selected_song}")
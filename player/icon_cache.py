@@ -0,0 +1,47 @@
+import os
+
+from PIL import Image, ImageTk
+
+from .content_hash import ContentHashIndex
+
+
+class IconCache:
+    """按源文件内容哈希缓存缩放后的图标 PNG，之后只需打开很小的缩略图"""
+
+    def __init__(self, cache_dir="cache/icons", size=(50, 50)):
+        self.cache_dir = cache_dir
+        self.size = size
+        os.makedirs(cache_dir, exist_ok=True)
+        # 记录源文件的内容哈希，避免每次启动都重新读取源文件
+        self.hashes = ContentHashIndex(os.path.join(cache_dir, "index.json"))
+
+    def content_hash(self, path):
+        """返回源文件内容的 SHA-1，文件未变化时直接使用记录的结果"""
+        return self.hashes.content_hash(path)
+
+    def thumbnail_path(self, path):
+        width, height = self.size
+        return os.path.join(self.cache_dir, f"{self.content_hash(path)}_{width}x{height}.png")
+
+    def load_image(self, path):
+        """返回缩放后的 PIL 图片；缓存未命中时解码源文件并写入缓存"""
+        thumbnail = self.thumbnail_path(path)
+        if os.path.exists(thumbnail):
+            return Image.open(thumbnail)
+        with Image.open(path) as source:
+            source.draft("RGBA", self.size)
+            image = source.resize(self.size)
+        # 先写临时文件再替换，写到一半崩溃不会留下被当作有效缓存的残缺文件
+        tmp_path = f"{thumbnail}.{os.getpid()}.tmp"
+        try:
+            image.save(tmp_path, "PNG")
+            os.replace(tmp_path, thumbnail)
+        except OSError as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            print(f"[ERROR] Failed to write icon cache '{thumbnail}'. Exception: {e}")
+        return image
+
+    def photo(self, path):
+        """返回可直接用于按钮的 PhotoImage"""
+        return ImageTk.PhotoImage(self.load_image(path))
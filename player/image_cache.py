@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageTk
+
+from .lru_cache import LRUCache
+from .tk_dispatcher import TkDispatcher
+
+
+def photo_image_cost(photo):
+    """PhotoImage 占用内存的估算（每像素 4 字节）"""
+    return photo.width() * photo.height() * 4
+
+
+def decode_scaled(path, size):
+    """解码图片并缩放到 size；JPEG 通过 draft 模式在解码阶段直接按 1/2~1/8 缩小"""
+    with Image.open(path) as image:
+        image.draft("RGB", size)
+        return image.convert("RGB").resize(size)
+
+
+class ImageDecoder:
+    """在工作线程中解码图片，解码结果在 Tk 主线程中转换为 PhotoImage 并写入 LRU 缓存"""
+
+    def __init__(self, root, max_bytes=64 * 1024 * 1024, workers=1, decode=decode_scaled):
+        self.cache = LRUCache(max_bytes, cost=photo_image_cost)
+        self.decode = decode
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ImageDecoder")
+        self.dispatcher = TkDispatcher(root, self.on_decoded, sequence="<<ImageDecoded>>")
+        self.pending = {}  # (path, size) -> 解码完成后的回调列表
+
+    def get(self, path, size):
+        """返回已缓存的 PhotoImage，没有时返回 None"""
+        return self.cache.get((path, size))
+
+    def request(self, path, size, callback=None):
+        """请求 path 按 size 缩放后的图片；命中缓存时立即回调，否则在后台解码后回调"""
+        key = (path, size)
+        photo = self.cache.get(key)
+        if photo is not None:
+            if callback:
+                callback(key, photo)
+            return photo
+        callbacks = self.pending.get(key)
+        if callbacks is None:
+            self.pending[key] = callbacks = []
+            self.executor.submit(self._decode, key)
+        if callback:
+            callbacks.append(callback)
+        return None
+
+    def prefetch(self, path, size):
+        """预先在后台解码，不需要回调"""
+        self.request(path, size)
+
+    def _decode(self, key):
+        try:
+            image = self.decode(*key)
+        except Exception as e:
+            print(f"[ERROR] Failed to decode image '{key[0]}'. Exception: {e}")
+            image = None
+        self.dispatcher.post(key, image)
+
+    def on_decoded(self, key, image):
+        """主线程：创建 PhotoImage、写入缓存并通知等待者"""
+        callbacks = self.pending.pop(key, [])
+        if image is None:
+            return
+        photo = ImageTk.PhotoImage(image)
+        self.cache.put(key, photo)
+        for callback in callbacks:
+            callback(key, photo)
@@ -0,0 +1,345 @@
+import os
+import sqlite3
+
+from .tags import TagReader, read_tags
+from .track import Track
+
+# 曲库扫描时识别的音频扩展名
+AUDIO_EXTENSIONS = (".mp3", ".flac", ".wav", ".ogg", ".oga", ".opus", ".m4a", ".aac", ".wma", ".ape")
+
+# 扫描多少个目录提交一次事务，避免长事务阻塞其他连接读取
+_COMMIT_EVERY_DIRS = 200
+# 按路径或 ID 批量查询时每条 SQL 携带的参数个数（旧版 SQLite 上限为 999）
+_QUERY_CHUNK = 500
+# tracks 表中后来增加的列（旧数据库打开时补上）
+_TAG_COLUMNS = (("title", "TEXT"), ("artist", "TEXT"), ("album", "TEXT"), ("track_no", "INTEGER"),
+                ("tag_mtime", "INTEGER"))
+
+
+def is_audio_file(file_name):
+    """按扩展名判断是否为音频文件"""
+    return file_name.lower().endswith(AUDIO_EXTENSIONS)
+
+
+class LibraryIndex:
+    def __init__(self, db_path="cache/library.db"):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.tag_reader = TagReader()  # 新文件的标签在扫描时并行读取
+        self.create_tables()
+
+    def create_tables(self):
+        """创建曲库表结构：根目录、已扫描目录（含 mtime）、曲目（含标签）和响度分析结果
+
+        tag_mtime 为读取标签时文件的 mtime，与 mtime 不同说明标签需要重新读取。
+        """
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+            CREATE TABLE IF NOT EXISTS tracks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT NOT NULL UNIQUE,
+                dir TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER,
+                mtime INTEGER,
+                title TEXT,
+                artist TEXT,
+                album TEXT,
+                track_no INTEGER,
+                tag_mtime INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS tracks_dir ON tracks(dir);
+            CREATE TABLE IF NOT EXISTS loudness (
+                track_id INTEGER PRIMARY KEY,
+                size INTEGER,
+                mtime INTEGER,
+                lufs REAL,
+                peak REAL
+            );
+        """)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(tracks)")}
+        for column, column_type in _TAG_COLUMNS:
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE tracks ADD COLUMN {column} {column_type}")
+        self.conn.commit()
+
+    def close(self):
+        self.tag_reader.close()
+        self.conn.close()
+
+    def add_root(self, root_path):
+        """添加一个曲库根目录（保存为绝对路径）"""
+        root_path = os.path.abspath(root_path)
+        self.conn.execute("INSERT OR IGNORE INTO roots (path) VALUES (?)", (root_path,))
+        self.conn.commit()
+        return root_path
+
+    def remove_root(self, root_path):
+        """移除根目录以及其下所有已索引的目录和曲目"""
+        root_path = os.path.abspath(root_path)
+        self.conn.execute("DELETE FROM roots WHERE path = ?", (root_path,))
+        self._forget_dir(root_path)
+        self.conn.commit()
+
+    def get_roots(self):
+        return [row[0] for row in self.conn.execute("SELECT path FROM roots ORDER BY path")]
+
+    def add_track(self, track_path):
+        """把单个文件加入索引（不要求位于根目录下），返回稳定的曲目 ID"""
+        track_path = os.path.abspath(track_path)
+        stat = os.stat(track_path)
+        track_id = self._upsert_track(track_path, os.path.dirname(track_path), stat.st_size, stat.st_mtime_ns,
+                                      read_tags(track_path))
+        self.conn.commit()
+        return track_id
+
+    def get_track(self, track_id):
+        """根据曲目 ID 返回 Track（含标签），不存在时返回 None"""
+        row = self.conn.execute(
+            "SELECT id, path, name, title, artist, album, track_no FROM tracks WHERE id = ?", (track_id,)).fetchone()
+        return Track(*row) if row else None
+
+    def add_tracks(self, track_paths):
+        """批量把文件加入索引（并行读取标签，一次提交），按顺序返回 Track"""
+        tracks = []
+        paths = [os.path.abspath(path) for path in track_paths]
+        for path, tags in zip(paths, self.tag_reader.read_many(paths)):
+            stat = os.stat(path)
+            track_id = self._upsert_track(path, os.path.dirname(path), stat.st_size, stat.st_mtime_ns, tags)
+            tracks.append(Track(track_id, path, os.path.basename(path), *tags))
+        self.conn.commit()
+        return tracks
+
+    def tracks_by_path(self, track_paths):
+        """批量按绝对路径查询：返回 路径 -> Track（只含已索引的路径）"""
+        return self._select_tracks("path", list(track_paths))
+
+    def tracks_by_id(self, track_ids):
+        """批量按曲目 ID 查询：返回 ID -> Track（只含仍存在的曲目）"""
+        return self._select_tracks("id", list(track_ids))
+
+    def _select_tracks(self, column, keys):
+        found = {}
+        for start in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[start:start + _QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            for row in self.conn.execute(
+                    f"SELECT id, path, name, title, artist, album, track_no FROM tracks "
+                    f"WHERE {column} IN ({placeholders})", chunk):
+                track = Track(*row)
+                found[track.path if column == "path" else track.id] = track
+        return found
+
+    def get_path(self, track_id):
+        """根据曲目 ID 返回绝对路径"""
+        row = self.conn.execute("SELECT path FROM tracks WHERE id = ?", (track_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_id(self, track_path):
+        """根据路径返回曲目 ID，未索引时返回 None"""
+        row = self.conn.execute("SELECT id FROM tracks WHERE path = ?", (os.path.abspath(track_path),)).fetchone()
+        return row[0] if row else None
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    def iter_tracks(self, batch_size=1000, tags=False):
+        """按路径顺序分批产出 (id, path, name)；tags 为 True 时产出含标签的 Track"""
+        if tags:
+            cursor = self.conn.execute(
+                "SELECT id, path, name, title, artist, album, track_no FROM tracks ORDER BY path")
+        else:
+            cursor = self.conn.execute("SELECT id, path, name FROM tracks ORDER BY path")
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                return
+            yield [Track(*row) for row in batch] if tags else batch
+
+    def refresh_tags(self, on_tagged=None, batch_size=500):
+        """为还没有读取过标签或文件已变化的曲目（重新）读取标签，返回处理的曲目数
+
+        旧数据库升级后第一次扫描，以及文件内容被修改（mtime 变化）时使用；
+        on_tagged(tracks) 在每批写入后调用。读取失败的文件也会记下 tag_mtime，不会反复重试。
+        """
+        total = 0
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, path, name, mtime FROM tracks WHERE tag_mtime IS NOT mtime LIMIT ?",
+                (batch_size,)).fetchall()
+            if not rows:
+                return total
+            tags = self.tag_reader.read_many([path for _, path, _, _ in rows])
+            self.conn.executemany(
+                "UPDATE tracks SET title = ?, artist = ?, album = ?, track_no = ?, tag_mtime = ? WHERE id = ?",
+                [(*tag, mtime, track_id) for (track_id, _, _, mtime), tag in zip(rows, tags)])
+            self.conn.commit()
+            total += len(rows)
+            if on_tagged:
+                on_tagged([Track(track_id, path, name, *tag) for (track_id, path, name, _), tag in zip(rows, tags)])
+
+    def get_loudness(self, track_id):
+        """返回 (综合响度 LUFS, 峰值 dBFS)，没有分析过时返回 None；静音曲目的 LUFS 为 None"""
+        row = self.conn.execute("SELECT lufs, peak FROM loudness WHERE track_id = ?", (track_id,)).fetchone()
+        return tuple(row) if row else None
+
+    def loudness_map(self):
+        """一次读出所有分析结果：track_id -> (lufs, peak)"""
+        return {track_id: (lufs, peak) for track_id, lufs, peak in
+                self.conn.execute("SELECT track_id, lufs, peak FROM loudness")}
+
+    def save_loudness(self, rows):
+        """批量保存分析结果，rows 为 (track_id, size, mtime, lufs, peak)"""
+        self.conn.executemany(
+            "INSERT INTO loudness (track_id, size, mtime, lufs, peak) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(track_id) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, "
+            "lufs = excluded.lufs, peak = excluded.peak", rows)
+        self.conn.commit()
+
+    def iter_loudness_state(self, batch_size=1000):
+        """分批产出 (id, path, 分析时的 size, 分析时的 mtime)，没有分析过的曲目 size/mtime 为 None"""
+        # 顺便清理已从曲库删除的曲目的分析结果
+        self.conn.execute("DELETE FROM loudness WHERE track_id NOT IN (SELECT id FROM tracks)")
+        self.conn.commit()
+        cursor = self.conn.execute(
+            "SELECT t.id, t.path, l.size, l.mtime FROM tracks t "
+            "LEFT JOIN loudness l ON l.track_id = t.id ORDER BY t.path")
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                return
+            yield batch
+
+    def rescan(self, on_added=None, on_removed=None, on_tagged=None):
+        """增量重新扫描所有根目录：只列出 mtime 变化过的目录，返回扫描统计
+
+        新文件的标签在扫描目录时一起读取，on_added 收到的是含标签的 Track；
+        内容变化的文件在最后由 refresh_tags 重新读取标签并通过 on_tagged 通知。
+        """
+        stats = {"dirs_checked": 0, "dirs_scanned": 0, "added": 0, "removed": 0, "tagged": 0}
+        known_dirs = {}
+        children = {}
+        for path, parent, mtime in self.conn.execute("SELECT path, parent, mtime FROM dirs"):
+            known_dirs[path] = mtime
+            children.setdefault(parent, []).append(path)
+
+        for root_path in self.get_roots():
+            stack = [root_path]
+            while stack:
+                dir_path = stack.pop()
+                stats["dirs_checked"] += 1
+                try:
+                    mtime = os.stat(dir_path).st_mtime_ns
+                except OSError:
+                    stats["removed"] += self._forget_dir(dir_path, on_removed)
+                    continue
+
+                if known_dirs.get(dir_path) == mtime:
+                    # 目录项没有变化，直接沿用记录的子目录
+                    stack.extend(children.get(dir_path, ()))
+                    continue
+
+                subdirs = self._scan_dir(dir_path, mtime, stats, on_added, on_removed)
+                for old_child in children.get(dir_path, ()):
+                    if old_child not in subdirs:
+                        stats["removed"] += self._forget_dir(old_child, on_removed)
+                stack.extend(subdirs)
+
+                stats["dirs_scanned"] += 1
+                if stats["dirs_scanned"] % _COMMIT_EVERY_DIRS == 0:
+                    self.conn.commit()
+        self.conn.commit()
+        stats["tagged"] = self.refresh_tags(on_tagged)
+        return stats
+
+    def _scan_dir(self, dir_path, mtime, stats, on_added, on_removed):
+        """列出单个目录，同步其中的曲目记录，返回子目录集合"""
+        subdirs = set()
+        files = {}
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.add(entry.path)
+                        elif is_audio_file(entry.name) and entry.is_file():
+                            stat = entry.stat()
+                            files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"[ERROR] Failed to scan '{dir_path}'. Exception: {e}")
+            return subdirs
+
+        existing = {
+            path: (track_id, size, file_mtime)
+            for track_id, path, size, file_mtime in self.conn.execute(
+                "SELECT id, path, size, mtime FROM tracks WHERE dir = ?", (dir_path,))
+        }
+        removed = [row[0] for path, row in existing.items() if path not in files]
+        if removed:
+            self.conn.executemany("DELETE FROM tracks WHERE id = ?", [(track_id,) for track_id in removed])
+            stats["removed"] += len(removed)
+            if on_removed:
+                on_removed(removed)
+
+        added = []
+        new_paths = [path for path in sorted(files) if path not in existing]
+        for path, tags in zip(new_paths, self.tag_reader.read_many(new_paths)):
+            size, file_mtime = files[path]
+            track_id = self._upsert_track(path, dir_path, size, file_mtime, tags)
+            added.append(Track(track_id, path, os.path.basename(path), *tags))
+        for path, (size, file_mtime) in files.items():
+            old = existing.get(path)
+            if old is not None and old[1:] != (size, file_mtime):
+                self._upsert_track(path, dir_path, size, file_mtime)
+        if added:
+            stats["added"] += len(added)
+            if on_added:
+                on_added(added)
+
+        self.conn.execute(
+            "INSERT INTO dirs (path, parent, mtime) VALUES (?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET mtime = excluded.mtime",
+            (dir_path, os.path.dirname(dir_path), mtime))
+        return subdirs
+
+    def _upsert_track(self, track_path, dir_path, size, mtime, tags=None):
+        """插入或更新曲目，已存在的路径保留原有 ID；tags 为 None 时保留原有标签（之后由 refresh_tags 更新）"""
+        if tags is None:
+            self.conn.execute(
+                "INSERT INTO tracks (path, dir, name, size, mtime) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime",
+                (track_path, dir_path, os.path.basename(track_path), size, mtime))
+        else:
+            self.conn.execute(
+                "INSERT INTO tracks (path, dir, name, size, mtime, title, artist, album, track_no, tag_mtime) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, "
+                "title = excluded.title, artist = excluded.artist, album = excluded.album, "
+                "track_no = excluded.track_no, tag_mtime = excluded.tag_mtime",
+                (track_path, dir_path, os.path.basename(track_path), size, mtime, *tags, mtime))
+        return self.conn.execute("SELECT id FROM tracks WHERE path = ?", (track_path,)).fetchone()[0]
+
+    def _forget_dir(self, dir_path, on_removed=None):
+        """删除目录及其所有子目录的记录，返回删除的曲目数"""
+        prefix = dir_path.rstrip(os.sep) + os.sep
+        condition = "(dir = ? OR substr(dir, 1, ?) = ?)"
+        args = (dir_path, len(prefix), prefix)
+        removed = [row[0] for row in self.conn.execute(f"SELECT id FROM tracks WHERE {condition}", args)]
+        self.conn.execute(f"DELETE FROM tracks WHERE {condition}", args)
+        self.conn.execute("DELETE FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?", args)
+        if removed and on_removed:
+            on_removed(removed)
+        return len(removed)
@@ -0,0 +1,212 @@
+import os
+import queue
+import threading
+import time
+from itertools import islice
+
+from .library_index import LibraryIndex, is_audio_file
+from .playlist_files import (candidate_paths, is_native_playlist, iter_native, iter_playlist_locations,
+                             primary_path)
+
+
+class LibraryScanner:
+    """在后台线程中读取曲库索引并增量扫描磁盘，把结果分批放入有界队列
+
+    队列中的条目为 ("added", [Track])、("tagged", [Track])（已有曲目的标签有更新）、
+    ("removed", [track_id]) 和最后的 ("done", 统计)。
+    """
+
+    activity = "正在扫描"  # 进度提示中的动作名称
+
+    def __init__(self, db_path, roots=(), batch_size=500, max_pending_batches=8, flush_interval=0.05):
+        self.db_path = db_path
+        self.roots = list(roots)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # 批次未满时最长等待时间（秒），保证首批结果尽快出现
+        self.queue = queue.Queue(maxsize=max_pending_batches)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="LibraryScanner", daemon=True)
+
+        # 进度统计（由工作线程写入，界面线程只读）
+        self.tracks_found = 0
+        self.started_at = None
+        self.finished = False
+
+        self._pending = []
+        self._last_flush = 0
+
+    def summary(self, count, stats):
+        """完成后的状态提示"""
+        return f"曲库共 {count} 首"
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._last_flush = self.started_at
+        self.thread.start()
+
+    def stop(self):
+        """请求工作线程尽快退出"""
+        self.stop_event.set()
+
+    def throughput(self):
+        """返回扫描吞吐量（首/秒）"""
+        if not self.started_at:
+            return 0
+        elapsed = time.monotonic() - self.started_at
+        return self.tracks_found / elapsed if elapsed > 0 else 0
+
+    def _run(self):
+        library = LibraryIndex(self.db_path)
+        try:
+            for root_path in self.roots:
+                library.add_root(root_path)
+
+            # 先把已有索引推给界面，再增量扫描磁盘
+            for batch in library.iter_tracks(self.batch_size, tags=True):
+                self._put(("added", batch))
+                self.tracks_found += len(batch)
+
+            stats = library.rescan(on_added=self._on_added, on_removed=self._on_removed, on_tagged=self._on_tagged)
+            self._flush()
+            self._put(("done", stats))
+        except _ScanCancelled:
+            pass
+        except Exception as e:
+            print(f"[ERROR] Library scan failed. Exception: {e}")
+            try:
+                self._put(("done", None))
+            except _ScanCancelled:
+                pass
+        finally:
+            library.close()
+            self.finished = True
+
+    def _on_added(self, rows):
+        self._pending.extend(rows)
+        self.tracks_found += len(rows)
+        if len(self._pending) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self._flush()
+
+    def _on_tagged(self, tracks):
+        self._flush()
+        self._put(("tagged", tracks))
+
+    def _on_removed(self, track_ids):
+        self._flush()
+        self._put(("removed", track_ids))
+
+    def _flush(self):
+        """把积累的新曲目按批次大小切分后放入队列"""
+        while self._pending:
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            self._put(("added", batch))
+        self._last_flush = time.monotonic()
+
+    def _put(self, item):
+        """放入队列；队列满时阻塞等待界面消费，收到停止请求则放弃"""
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise _ScanCancelled()
+
+
+class PlaylistImporter(LibraryScanner):
+    """在后台线程中流式解析播放列表文件，按批把条目解析为曲库中的曲目放入有界队列
+
+    文件逐行（原生格式逐块）读取，每批条目用一次批量查询对应到曲库：相对路径先相对播放列表
+    所在目录、再相对曲库各根目录解析；存在但尚未索引的音频文件加入曲库，找不到的条目计入 missing，
+    网络流 URL 计入 skipped。队列有界，界面来不及显示时解析会暂停，内存不随文件大小增长。
+    """
+
+    activity = "正在导入"
+
+    def __init__(self, db_path, playlist_path, batch_size=500, max_pending_batches=8):
+        super().__init__(db_path, (), batch_size, max_pending_batches)
+        self.playlist_path = playlist_path
+        self.thread.name = "PlaylistImporter"
+
+    def summary(self, count, stats):
+        text = f"播放列表共 {count} 首"
+        if stats and stats["missing"]:
+            text += f"，{stats['missing']} 个条目未找到"
+        return text
+
+    def _run(self):
+        library = LibraryIndex(self.db_path)
+        stats = {"entries": 0, "added": 0, "missing": 0, "skipped": 0}
+        try:
+            if is_native_playlist(self.playlist_path):
+                for ids in iter_native(self.playlist_path, self.batch_size):
+                    found = library.tracks_by_id(ids)
+                    stats["entries"] += len(ids)
+                    stats["missing"] += sum(1 for track_id in ids if track_id not in found)
+                    self._emit([found[track_id] for track_id in ids if track_id in found])
+            else:
+                base_dir = os.path.dirname(os.path.abspath(self.playlist_path))
+                roots = library.get_roots()
+                locations = iter_playlist_locations(self.playlist_path)
+                while True:
+                    chunk = list(islice(locations, self.batch_size))
+                    if not chunk:
+                        break
+                    stats["entries"] += len(chunk)
+                    self._emit(self._resolve(library, chunk, base_dir, roots, stats))
+            self._put(("done", stats))
+        except _ScanCancelled:
+            pass
+        except Exception as e:
+            print(f"[ERROR] Failed to import playlist '{self.playlist_path}'. Exception: {e}")
+            try:
+                self._put(("done", stats))
+            except _ScanCancelled:
+                pass
+        finally:
+            library.close()
+            self.finished = True
+
+    def _resolve(self, library, locations, base_dir, roots, stats):
+        """把一批条目位置解析为 Track（保持顺序）
+
+        先用一次批量查询匹配最可能的路径；只有没匹配上的条目才计算其余候选路径（曲库根目录、
+        反斜杠路径）并再查询一次，最后把存在但尚未索引的文件加入曲库。
+        """
+        primary = [primary_path(location, base_dir) for location in locations]
+        found = library.tracks_by_path({path for path in primary if path})
+        resolved = [found.get(path) for path in primary]  # Track、待加入曲库的路径或 None
+
+        misses = [index for index, track in enumerate(resolved) if track is None]
+        if misses:
+            candidates = {index: candidate_paths(locations[index], base_dir, roots) for index in misses}
+            found.update(library.tracks_by_path({path for paths in candidates.values() for path in paths}))
+            new_paths = {}  # 有序去重
+            for index in misses:
+                paths = candidates[index]
+                if not paths:
+                    stats["skipped"] += 1
+                    continue
+                track = next((found[path] for path in paths if path in found), None)
+                if track is None:
+                    track = next((path for path in paths if is_audio_file(path) and os.path.isfile(path)), None)
+                    if track is None:
+                        stats["missing"] += 1
+                        continue
+                    new_paths[track] = None
+                resolved[index] = track
+            if new_paths:
+                added = {track.path: track for track in library.add_tracks(list(new_paths))}
+                stats["added"] += len(added)
+                resolved = [added.get(item) if isinstance(item, str) else item for item in resolved]
+        return [track for track in resolved if track is not None]
+
+    def _emit(self, tracks):
+        if tracks:
+            self.tracks_found += len(tracks)
+            self._put(("added", tracks))
+
+
+class _ScanCancelled(Exception):
+    pass
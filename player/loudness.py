@@ -0,0 +1,159 @@
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# 播放时把每首歌的综合响度调整到这个目标值（LUFS）
+TARGET_LUFS = -14.0
+# 调整后峰值不超过的电平（dBFS），以及最大提升量（dB）：libVLC 音量最大为 200（约 +6 dB），
+# 用户音量为 100% 时再多的提升播放器也给不出来
+PEAK_CEILING_DB = -1.0
+MAX_BOOST_DB = 6.0
+
+# BS.1770 K 加权的两级滤波器参数：高搁架（增益 dB, Q, 中心频率）和高通（Q, 截止频率）
+_SHELF = (3.999843853973347, 0.7071752369554196, 1681.974450955533)
+_HIGHPASS = (0.5003270373238773, 38.13547087602444)
+
+# 子块长度（秒）：400 ms 的测量块由 4 个相邻子块组成（75% 重叠）
+_SUB_BLOCK_SECONDS = 0.1
+_BLOCK_SUB_BLOCKS = 4
+# 一次做 FFT 的子块数，限制工作进程的内存占用
+_FFT_CHUNK = 256
+
+
+def k_weighting_power(sample_rate, n):
+    """长度为 n 的实数 FFT 各频点上 K 加权滤波器的功率响应 |H(f)|²"""
+    import numpy as np
+
+    # 与 BS.1770 给出的 48 kHz 系数一致的双线性变换形式，可用于任意采样率
+    gain_db, q, fc = _SHELF
+    k = math.tan(math.pi * fc / sample_rate)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    shelf_b = (vh + vb * k / q + k * k, 2 * (k * k - vh), vh - vb * k / q + k * k)
+    shelf_a = (1 + k / q + k * k, 2 * (k * k - 1), 1 - k / q + k * k)
+
+    q, fc = _HIGHPASS
+    k = math.tan(math.pi * fc / sample_rate)
+    a0 = 1 + k / q + k * k
+    highpass_b = (a0, -2 * a0, a0)  # 分子不随 a0 归一化（即 1, -2, 1）
+    highpass_a = (a0, 2 * (k * k - 1), 1 - k / q + k * k)
+
+    z = np.exp(-2j * np.pi * np.fft.rfftfreq(n))  # z⁻¹
+
+    def response(b, a):
+        return (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+
+    return np.abs(response(shelf_b, shelf_a) * response(highpass_b, highpass_a)) ** 2
+
+
+def measure_loudness(track_path):
+    """解码整首歌，返回 (综合响度 LUFS, 采样峰值 dBFS)；静音时响度为 None
+
+    按 BS.1770 计算：K 加权在频域完成（每个 100 ms 子块做一次 FFT，按 Parseval 定理
+    直接由频谱得到滤波后的均方值），400 ms 测量块由相邻子块组合，再做绝对门限
+    （-70 LUFS）和相对门限（-10 LU）。在工作进程中运行，pydub/NumPy 只在这里导入。
+    """
+    import numpy as np
+    from pydub import AudioSegment
+
+    segment = AudioSegment.from_file(track_path)
+    raw = segment.get_array_of_samples()
+    full_scale = float(1 << (8 * segment.sample_width - 1))
+    samples = np.frombuffer(raw, dtype=raw.typecode).reshape(-1, segment.channels)
+    if not len(samples):
+        return None, None
+    peak = float(np.abs(samples).max()) / full_scale
+    peak_db = 20 * math.log10(peak) if peak > 0 else None
+
+    sub_length = int(segment.frame_rate * _SUB_BLOCK_SECONDS)
+    sub_count = len(samples) // sub_length
+    if sub_count < _BLOCK_SUB_BLOCKS:
+        return None, peak_db
+
+    # 实数 FFT 的能量权重：除直流和奈奎斯特频点外每个频点代表正负两个频率
+    weights = k_weighting_power(segment.frame_rate, sub_length) * 2
+    weights[0] /= 2
+    if sub_length % 2 == 0:
+        weights[-1] /= 2
+    weights /= sub_length * sub_length * full_scale * full_scale
+
+    # 每个子块在所有声道上的 K 加权均方值之和
+    sub_power = np.empty(sub_count)
+    frames = samples[:sub_count * sub_length].reshape(sub_count, sub_length, segment.channels)
+    for start in range(0, sub_count, _FFT_CHUNK):
+        chunk = frames[start:start + _FFT_CHUNK].astype(np.float32)
+        spectrum = np.fft.rfft(chunk, axis=1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        sub_power[start:start + len(chunk)] = np.einsum("bkc,k->b", power, weights)
+
+    block_power = np.convolve(sub_power, np.full(_BLOCK_SUB_BLOCKS, 1 / _BLOCK_SUB_BLOCKS), mode="valid")
+    gated = block_power[block_power > 10 ** ((-70 + 0.691) / 10)]
+    if not len(gated):
+        return None, peak_db
+    relative_gate = gated.mean() * 10 ** (-10 / 10)
+    gated = gated[gated > relative_gate]
+    return -0.691 + 10 * math.log10(gated.mean()), peak_db
+
+
+def track_gain_db(lufs, peak_db, target=TARGET_LUFS):
+    """把曲目调整到目标响度所需的增益（dB），提升量受峰值和 MAX_BOOST_DB 限制"""
+    if lufs is None:
+        return 0.0
+    gain = target - lufs
+    if peak_db is not None:
+        gain = min(gain, PEAK_CEILING_DB - peak_db)
+    return max(-30.0, min(MAX_BOOST_DB, gain))
+
+
+def analyze_library(library, workers=None, progress=None):
+    """在进程池中分析曲库里新增或修改过的曲目的响度，结果写入曲库数据库，返回统计信息
+
+    文件大小和修改时间与上次分析时相同的曲目直接跳过。
+    """
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    stats = {"tracks": 0, "skipped": 0, "analyzed": 0, "failed": 0}
+    results = []
+
+    def collect(done):
+        for future in done:
+            track_id, track_path, stat = running.pop(future)
+            try:
+                lufs, peak_db = future.result()
+                results.append((track_id, stat.st_size, stat.st_mtime_ns, lufs, peak_db))
+                stats["analyzed"] += 1
+            except Exception as e:
+                print(f"[ERROR] Failed to analyze loudness of '{track_path}'. Exception: {e}")
+                stats["failed"] += 1
+            if progress:
+                progress(stats)
+        if len(results) >= 100:
+            library.save_loudness(results)
+            results.clear()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        running = {}  # Future -> (track_id, 路径, stat)
+        for batch in library.iter_loudness_state():
+            for track_id, track_path, size, mtime in batch:
+                stats["tracks"] += 1
+                try:
+                    stat = os.stat(track_path)
+                except OSError:
+                    stats["failed"] += 1
+                    continue
+                if (size, mtime) == (stat.st_size, stat.st_mtime_ns):
+                    stats["skipped"] += 1
+                    continue
+                running[executor.submit(measure_loudness, track_path)] = (track_id, track_path, stat)
+                if len(running) >= workers * 4:
+                    collect(wait(running, return_when=FIRST_COMPLETED)[0])
+        while running:
+            collect(wait(running, return_when=FIRST_COMPLETED)[0])
+    if results:
+        library.save_loudness(results)
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["tracks_per_second"] = round(stats["analyzed"] / elapsed, 1) if elapsed > 0 else 0.0
+    return stats
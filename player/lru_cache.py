@@ -0,0 +1,39 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """按总成本（例如字节数）限制大小的 LRU 缓存"""
+
+    def __init__(self, max_cost, cost=lambda value: 1):
+        self.max_cost = max_cost
+        self.cost = cost
+        self.items = OrderedDict()
+        self.total_cost = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key):
+        value = self.items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.items.move_to_end(key)
+        self.hits += 1
+        return value[0]
+
+    def put(self, key, value):
+        """写入缓存，超出上限时淘汰最久未使用的条目"""
+        if key in self.items:
+            self.total_cost -= self.items.pop(key)[1]
+        item_cost = self.cost(value)
+        self.items[key] = (value, item_cost)
+        self.total_cost += item_cost
+        while self.total_cost > self.max_cost and len(self.items) > 1:
+            _, (_, evicted_cost) = self.items.popitem(last=False)
+            self.total_cost -= evicted_cost
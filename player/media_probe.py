@@ -0,0 +1,460 @@
+import os
+import struct
+
+from .settings_store import SettingsStore
+
+# MPEG 音频帧头查表（单位 kbps），按 (版本, 层) 索引
+_MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {
+    1: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    25: (11025, 12000, 8000),
+}
+# 帧头中的版本位 -> 版本号（25 表示 MPEG 2.5）
+_MP3_VERSIONS = {0: 25, 2: 2, 3: 1}
+
+# 判断 CBR 时检查的帧数，超过后若码率不一致则整文件扫描
+_MP3_CBR_CHECK_FRAMES = 32
+
+
+def parse_mp3_frame_header(header):
+    """解析 4 字节 MPEG 音频帧头，返回 (帧长, 采样数, 采样率, 码率kbps, 版本, 是否单声道)，无效时返回 None"""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = _MP3_VERSIONS.get((header[1] >> 3) & 0x03)
+    layer = 4 - ((header[1] >> 1) & 0x03)
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    if version is None or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    bitrate = _MP3_BITRATES[(min(version, 2), layer)][bitrate_index]
+    sample_rate = _MP3_SAMPLE_RATES[version][sample_rate_index]
+    padding = (header[2] >> 1) & 0x01
+    mono = (header[3] >> 6) == 3
+
+    if layer == 1:
+        samples = 384
+        frame_length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    else:
+        samples = 1152 if layer == 2 or version == 1 else 576
+        frame_length = samples // 8 * bitrate * 1000 // sample_rate + padding
+    return frame_length, samples, sample_rate, bitrate, version, mono
+
+
+def _id3v2_size(head):
+    """返回文件开头 ID3v2 标签的总长度（没有标签时为 0）"""
+    if len(head) < 10 or head[:3] != b"ID3":
+        return 0
+    size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+    footer = 10 if head[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _synchsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _remove_unsync(data):
+    """撤销 ID3v2 的反同步处理（0xFF 0x00 -> 0xFF）"""
+    return data.replace(b"\xff\x00", b"\xff")
+
+
+def read_id3v2_tag(f):
+    """读取文件开头的 ID3v2 标签，返回 (主版本号, 帧数据) ，没有标签时返回 None
+
+    帧数据已去掉标签头和扩展头；v2.2/v2.3 的整标签反同步也已撤销。
+    """
+    f.seek(0)
+    head = f.read(10)
+    if len(head) < 10 or head[:3] != b"ID3" or head[3] not in (2, 3, 4):
+        return None
+    version, flags = head[3], head[5]
+    body = f.read(_synchsafe(head[6:10]))
+    if version < 4 and flags & 0x80:
+        body = _remove_unsync(body)
+    if flags & 0x40 and version == 3 and len(body) >= 4:
+        body = body[4 + struct.unpack(">I", body[:4])[0]:]
+    elif flags & 0x40 and version == 4 and len(body) >= 4:
+        body = body[_synchsafe(body[:4]):]
+    return version, body
+
+
+def _parse_id3v2_frame_header(version, header):
+    """解析帧头，返回 (帧 ID, 帧长度, v2.4 格式标志)；到达填充区或标签损坏时帧 ID 为 None"""
+    id_size = 3 if version == 2 else 4
+    frame_id = header[:id_size]
+    if not frame_id.strip(b"\x00") or not frame_id.isalnum():
+        return None, 0, 0
+    if version == 2:
+        return frame_id.decode("latin-1"), int.from_bytes(header[3:6], "big"), 0
+    if version == 3:
+        return frame_id.decode("latin-1"), struct.unpack(">I", header[4:8])[0], 0
+    return frame_id.decode("latin-1"), _synchsafe(header[4:8]), header[9]
+
+
+def _id3v2_frame_data(data, format_flags):
+    """撤销 v2.4 帧级反同步并去掉数据长度指示"""
+    if format_flags & 0x02:
+        data = _remove_unsync(data)
+    if format_flags & 0x01:
+        data = data[4:]
+    return data
+
+
+def iter_id3v2_frames(version, body):
+    """遍历 ID3v2 标签中的帧，产出 (帧 ID, 帧内容)；v2.2 的帧 ID 为 3 个字符"""
+    header_size = 6 if version == 2 else 10
+    pos = 0
+    while pos + header_size <= len(body):
+        frame_id, size, format_flags = _parse_id3v2_frame_header(version, body[pos:pos + header_size])
+        if frame_id is None:
+            return
+        yield frame_id, _id3v2_frame_data(body[pos + header_size:pos + header_size + size], format_flags)
+        pos += header_size + size
+
+
+def scan_id3v2_frames(f, wanted):
+    """只读取 wanted 中列出的 ID3v2 帧，产出 (帧 ID, 帧内容)
+
+    其余帧只读帧头后直接跳过，标签里很大的封面图片不会被读入内存。
+    """
+    f.seek(0)
+    head = f.read(10)
+    if len(head) < 10 or head[:3] != b"ID3" or head[3] not in (2, 3, 4):
+        return
+    version, flags = head[3], head[5]
+    if version < 4 and flags & 0x80:
+        # 整个标签做过反同步时帧在文件中的位置也随之改变，只能整体读取
+        for frame_id, data in iter_id3v2_frames(*read_id3v2_tag(f)):
+            if frame_id in wanted:
+                yield frame_id, data
+        return
+    end = 10 + _synchsafe(head[6:10])
+    pos = 10
+    if flags & 0x40:
+        extended = f.read(4)
+        if len(extended) < 4:
+            return
+        pos += 4 + struct.unpack(">I", extended)[0] if version == 3 else _synchsafe(extended)
+    header_size = 6 if version == 2 else 10
+    while pos + header_size <= end:
+        f.seek(pos)
+        header = f.read(header_size)
+        if len(header) < header_size:
+            return  # 文件比标签头声明的短
+        frame_id, size, format_flags = _parse_id3v2_frame_header(version, header)
+        if frame_id is None:
+            return
+        if frame_id in wanted:
+            yield frame_id, _id3v2_frame_data(f.read(min(size, end - pos - header_size)), format_flags)
+        pos += header_size + size
+
+
+def iter_flac_blocks(f):
+    """遍历 FLAC 元数据块，产出 (块类型, 长度)；产出时文件位于块数据开头，调用方可直接读取"""
+    f.seek(0)
+    offset = _id3v2_size(f.read(10))
+    f.seek(offset)
+    if f.read(4) != b"fLaC":
+        return
+    offset += 4
+    while True:
+        f.seek(offset)
+        header = f.read(4)
+        if len(header) < 4:
+            return
+        length = int.from_bytes(header[1:4], "big")
+        yield header[0] & 0x7F, length
+        if header[0] & 0x80:
+            return  # 最后一个元数据块
+        offset += 4 + length
+
+
+def find_mp3_audio_start(f):
+    """跳过 ID3v2 标签，返回第一个有效 MPEG 帧的偏移量（连续两帧同步才算有效）"""
+    f.seek(0)
+    offset = _id3v2_size(f.read(10))
+    f.seek(offset)
+    data = f.read(64 * 1024)
+    pos = 0
+    while True:
+        pos = data.find(b"\xff", pos)
+        if pos < 0 or pos + 4 > len(data):
+            return None
+        frame = parse_mp3_frame_header(data[pos:pos + 4])
+        if frame:
+            next_pos = pos + frame[0]
+            # 下一帧还在缓冲区外时只能信任当前帧
+            if next_pos + 4 > len(data) or parse_mp3_frame_header(data[next_pos:next_pos + 4]):
+                return offset + pos
+        pos += 1
+
+
+def _xing_offset(version, mono):
+    """Xing/Info 头在帧内的偏移量（位于侧信息之后）"""
+    if version == 1:
+        return 4 + (17 if mono else 32)
+    return 4 + (9 if mono else 17)
+
+
+def is_mp3_info_frame(first):
+    """判断第一帧是否为不含音频的 Xing/Info 或 VBRI 头帧（解码器会跳过它）"""
+    frame = parse_mp3_frame_header(first)
+    if not frame:
+        return False
+    xing_offset = _xing_offset(frame[4], frame[5])
+    return first[xing_offset:xing_offset + 4] in (b"Xing", b"Info") or first[36:40] == b"VBRI"
+
+
+def iter_mp3_frames(f, start, end=None):
+    """从 start 开始逐帧遍历 MP3，产出 (偏移量, 采样数, 采样率, 码率kbps)"""
+    if end is None:
+        end = os.fstat(f.fileno()).st_size
+    offset = start
+    f.seek(offset)
+    buffer = b""
+    buffer_start = offset
+    while offset + 4 <= end:
+        rel = offset - buffer_start
+        if rel + 4 > len(buffer):
+            f.seek(offset)
+            buffer = f.read(256 * 1024)
+            buffer_start = offset
+            rel = 0
+            if len(buffer) < 4:
+                return
+        frame = parse_mp3_frame_header(buffer[rel:rel + 4])
+        if not frame:
+            # 失去同步（例如遇到 ID3v1/APE 标签），停止扫描
+            return
+        yield offset, frame[1], frame[2], frame[3]
+        offset += frame[0]
+
+
+def _probe_mp3(f, file_size):
+    """读取 Xing/Info、VBRI 头或扫描帧获取 MP3 时长"""
+    start = find_mp3_audio_start(f)
+    if start is None:
+        return None
+    f.seek(start)
+    first = f.read(256)
+    frame_length, samples, sample_rate, bitrate, version, mono = parse_mp3_frame_header(first)
+
+    end = file_size
+    f.seek(max(0, file_size - 128))
+    if f.read(3) == b"TAG":
+        end -= 128
+
+    xing_offset = _xing_offset(version, mono)
+    tag = first[xing_offset:xing_offset + 4]
+    if tag in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", first[xing_offset + 4:xing_offset + 8])[0]
+        pos = xing_offset + 8
+        frames = stream_bytes = None
+        if flags & 0x01:
+            frames = struct.unpack(">I", first[pos:pos + 4])[0]
+            pos += 4
+        if flags & 0x02:
+            stream_bytes = struct.unpack(">I", first[pos:pos + 4])[0]
+        if frames:
+            duration = frames * samples / sample_rate
+            stream_bytes = stream_bytes or (end - start)
+            return _probe_result(duration, stream_bytes * 8 / duration / 1000, sample_rate)
+
+    # VBRI 头固定在帧头之后 32 字节处
+    if first[36:40] == b"VBRI":
+        stream_bytes, frames = struct.unpack(">II", first[46:54])
+        if frames:
+            duration = frames * samples / sample_rate
+            return _probe_result(duration, stream_bytes * 8 / duration / 1000, sample_rate)
+
+    # 没有 VBR 头：前若干帧码率一致视为 CBR，否则完整扫描帧
+    bitrates = set()
+    for count, (_, _, _, frame_bitrate) in enumerate(iter_mp3_frames(f, start, end)):
+        bitrates.add(frame_bitrate)
+        if count >= _MP3_CBR_CHECK_FRAMES or len(bitrates) > 1:
+            break
+    if len(bitrates) == 1:
+        duration = (end - start) * 8 / (bitrate * 1000)
+        return _probe_result(duration, bitrate, sample_rate)
+
+    total_samples = 0
+    for _, frame_samples, _, _ in iter_mp3_frames(f, start, end):
+        total_samples += frame_samples
+    if not total_samples:
+        return None
+    duration = total_samples / sample_rate
+    return _probe_result(duration, (end - start) * 8 / duration / 1000, sample_rate)
+
+
+def _probe_wav(f, file_size):
+    """读取 RIFF/WAVE 的 fmt 和 data 块"""
+    f.seek(0)
+    header = f.read(12)
+    if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+    sample_rate = byte_rate = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, chunk_size = struct.unpack("<4sI", chunk)
+        if chunk_id == b"fmt ":
+            fmt = f.read(chunk_size)
+            _, _, sample_rate, byte_rate = struct.unpack("<HHII", fmt[:12])
+            f.seek(chunk_size % 2, os.SEEK_CUR)
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            # 流式写入的 WAV 可能把 data 长度写成 0 或 0xFFFFFFFF
+            data_size = min(chunk_size, file_size - f.tell()) or file_size - f.tell()
+            return _probe_result(data_size / byte_rate, byte_rate * 8 / 1000, sample_rate)
+        else:
+            f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+
+def _probe_flac(f, file_size):
+    """读取 FLAC STREAMINFO 元数据块"""
+    f.seek(0)
+    offset = _id3v2_size(f.read(10))
+    f.seek(offset)
+    if f.read(4) != b"fLaC":
+        return None
+    block_header = f.read(4)
+    if len(block_header) < 4 or block_header[0] & 0x7F != 0:
+        return None
+    info = f.read(34)
+    if len(info) < 34:
+        return None
+    packed = int.from_bytes(info[10:18], "big")
+    sample_rate = packed >> 44
+    total_samples = packed & 0xFFFFFFFFF
+    if not sample_rate or not total_samples:
+        return None
+    duration = total_samples / sample_rate
+    return _probe_result(duration, file_size * 8 / duration / 1000, sample_rate)
+
+
+def _probe_ogg(f, file_size):
+    """读取 Ogg 第一页的 Vorbis/Opus 标识头和最后一页的 granule 位置"""
+    f.seek(0)
+    page = f.read(512)
+    if len(page) < 27 or page[:4] != b"OggS":
+        return None
+    serial = page[14:18]
+    segments = page[26]
+    packet = page[27 + segments:]
+    if packet[:7] == b"\x01vorbis":
+        sample_rate = struct.unpack("<I", packet[12:16])[0]
+        granule_rate, pre_skip = sample_rate, 0
+    elif packet[:8] == b"OpusHead":
+        pre_skip = struct.unpack("<H", packet[10:12])[0]
+        sample_rate = struct.unpack("<I", packet[12:16])[0] or 48000
+        granule_rate = 48000
+    else:
+        return None
+
+    # 从文件末尾向前查找同一逻辑流的最后一页
+    tail_size = min(file_size, 64 * 1024)
+    f.seek(file_size - tail_size)
+    tail = f.read(tail_size)
+    pos = len(tail)
+    while True:
+        pos = tail.rfind(b"OggS", 0, pos)
+        if pos < 0 or pos + 18 > len(tail):
+            return None
+        if tail[pos + 14:pos + 18] == serial:
+            granule = struct.unpack("<q", tail[pos + 6:pos + 14])[0]
+            if granule > 0:
+                break
+    duration = (granule - pre_skip) / granule_rate
+    if duration <= 0:
+        return None
+    return _probe_result(duration, file_size * 8 / duration / 1000, sample_rate)
+
+
+def _probe_result(duration, bitrate, sample_rate):
+    return {
+        "duration": round(duration, 3),
+        "bitrate": int(round(bitrate)),
+        "sample_rate": sample_rate,
+    }
+
+
+_PROBERS = {
+    ".mp3": _probe_mp3,
+    ".mp2": _probe_mp3,
+    ".wav": _probe_wav,
+    ".flac": _probe_flac,
+    ".ogg": _probe_ogg,
+    ".oga": _probe_ogg,
+    ".opus": _probe_ogg,
+}
+
+
+def probe_media(track_path):
+    """直接从容器头读取时长（秒）、码率（kbps）和采样率，无法识别时返回 None"""
+    ext = os.path.splitext(track_path)[1].lower()
+    first = _PROBERS.get(ext)
+    probers = [first] if first else []
+    probers += [p for p in (_probe_mp3, _probe_flac, _probe_wav, _probe_ogg) if p is not first]
+    try:
+        with open(track_path, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            # 扩展名不可信时按魔数依次尝试
+            for prober in probers:
+                result = prober(f, file_size)
+                if result:
+                    return result
+    except (OSError, struct.error, ValueError, IndexError, ZeroDivisionError) as e:
+        print(f"[ERROR] Failed to probe '{track_path}'. Exception: {e}")
+    return None
+
+
+class MetadataCache:
+    """时长等元数据的磁盘缓存：写入只更新内存，由 SettingsStore 合并后延迟写盘"""
+
+    def __init__(self, cache_file="cache/metadata.json"):
+        self.cache_file = cache_file
+        # 路径 -> {"size", "mtime", "duration", "bitrate", "sample_rate"}
+        self.store = SettingsStore(cache_file, indent=None)
+
+    def flush(self):
+        """立即写回尚未保存的修改"""
+        self.store.flush()
+
+    def get(self, track_path, stat=None):
+        """返回缓存的元数据；文件大小或修改时间变化时视为失效"""
+        entry = self.store.get(track_path)
+        if entry is None:
+            return None
+        stat = stat or os.stat(track_path)
+        if entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime_ns:
+            return None
+        return entry
+
+    def put(self, track_path, info, stat=None):
+        """写入一条元数据（稍后自动写盘）"""
+        stat = stat or os.stat(track_path)
+        entry = dict(info, size=stat.st_size, mtime=stat.st_mtime_ns)
+        self.store.set(track_path, entry)
+        return entry
+
+    def lookup(self, track_path):
+        """命中缓存直接返回，否则解析文件头并写入缓存"""
+        stat = os.stat(track_path)
+        entry = self.get(track_path, stat)
+        if entry is not None:
+            return entry
+        info = probe_media(track_path)
+        if info is None:
+            return None
+        return self.put(track_path, info, stat)
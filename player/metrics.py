@@ -0,0 +1,107 @@
+import atexit
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# 延迟直方图的桶上界（微秒），按 2 的幂递增，最后一个桶收集所有更大的值
+_BUCKET_BOUNDS_US = [2 ** i for i in range(4, 25)]
+
+
+class LatencyHistogram:
+    """固定桶的延迟直方图：记录一次只需一次二分查找和几次加法"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(_BUCKET_BOUNDS_US) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(_BUCKET_BOUNDS_US, seconds * 1e6)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, fraction):
+        """返回百分位数的估计值（秒，取所在桶的上界）"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= target:
+                if index < len(_BUCKET_BOUNDS_US):
+                    return min(_BUCKET_BOUNDS_US[index] / 1e6, self.max)
+                return self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "min_ms": (self.min or 0.0) * 1000,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": (self.max or 0.0) * 1000,
+        }
+
+
+class Metrics:
+    """进程内计数器和延迟直方图的注册表，可在运行时查询或退出时输出"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started_at = time.time()
+
+    def incr(self, name, amount=1):
+        # 计数器只在 GIL 下做字典加法，热路径上足够便宜
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+
+    @contextmanager
+    def timed(self, name):
+        """统计 with 块的调用次数和耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """返回当前所有指标（可 JSON 序列化）"""
+        return {
+            "uptime_s": round(time.time() - self.started_at, 3),
+            "counters": dict(self.counters),
+            "latency": {name: histogram.snapshot() for name, histogram in list(self.histograms.items())},
+        }
+
+    def dump(self, path=None):
+        """把指标输出到标准输出，或写入 JSON 文件"""
+        text = json.dumps(self.snapshot(), indent=2)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        else:
+            print(text)
+
+    def dump_on_exit(self, path=None):
+        atexit.register(self.dump, path)
+
+
+metrics = Metrics()  # 全局指标注册表
@@ -0,0 +1,174 @@
+import os
+import struct
+import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .content_hash import ContentHashIndex, hash_file
+
+# 每首歌保存的波形列数（绘制时再按控件宽度合并）
+PEAK_COLUMNS = 1024
+
+# 峰值文件格式：魔数、列数、时长（毫秒），随后是 int8 的最小值和最大值两段
+_PEAK_HEADER = struct.Struct("<4sII")
+_PEAK_MAGIC = b"WPK1"
+
+
+class Peaks:
+    """一首歌的最小/最大值包络：mins、maxs 为 -127~127 的 array('b')"""
+
+    def __init__(self, duration_ms, mins, maxs):
+        self.duration_ms = duration_ms
+        self.mins = mins
+        self.maxs = maxs
+
+    def __len__(self):
+        return len(self.mins)
+
+    def to_bytes(self):
+        return _PEAK_HEADER.pack(_PEAK_MAGIC, len(self.mins), self.duration_ms) + self.mins.tobytes() + self.maxs.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, columns, duration_ms = _PEAK_HEADER.unpack_from(data)
+        if magic != _PEAK_MAGIC or len(data) != _PEAK_HEADER.size + 2 * columns:
+            raise ValueError("not a peak file")
+        body = memoryview(data)[_PEAK_HEADER.size:]
+        mins, maxs = array("b"), array("b")
+        mins.frombytes(body[:columns])
+        maxs.frombytes(body[columns:])
+        return cls(duration_ms, mins, maxs)
+
+    def resample(self, width):
+        """把包络合并（或拉伸）到 width 列，用于按像素绘制"""
+        columns = len(self.mins)
+        if not columns or width <= 0:
+            return [], []
+        mins, maxs = [], []
+        for x in range(width):
+            start = x * columns // width
+            end = max(start + 1, (x + 1) * columns // width)
+            mins.append(min(self.mins[start:end]))
+            maxs.append(max(self.maxs[start:end]))
+        return mins, maxs
+
+
+def compute_peaks(track_path, columns=PEAK_COLUMNS):
+    """解码整首歌并计算包络（在工作进程中运行，pydub/NumPy 只在这里导入）"""
+    import numpy as np
+    from pydub import AudioSegment
+
+    segment = AudioSegment.from_file(track_path)
+    raw = segment.get_array_of_samples()
+    samples = np.frombuffer(raw, dtype=raw.typecode).reshape(-1, segment.channels)
+    if not len(samples):
+        empty = array("b", bytes(columns))
+        return Peaks(len(segment), empty, array("b", empty))
+
+    # 先在声道间取最小/最大值，再用 reduceat 一次性归约每一列
+    low = samples.min(axis=1)
+    high = samples.max(axis=1)
+    edges = np.linspace(0, len(low), columns, endpoint=False).astype(np.int64)
+    scale = 127.0 / (1 << (8 * segment.sample_width - 1))
+    mins = np.clip(np.round(np.minimum.reduceat(low, edges) * scale), -127, 127).astype(np.int8)
+    maxs = np.clip(np.round(np.maximum.reduceat(high, edges) * scale), -127, 127).astype(np.int8)
+    return Peaks(len(segment), array("b", mins.tobytes()), array("b", maxs.tobytes()))
+
+
+def _peak_job(track_path, columns):
+    """工作进程任务：计算内容哈希和包络，返回 (哈希, 峰值文件内容)"""
+    return hash_file(track_path), compute_peaks(track_path, columns).to_bytes()
+
+
+class PeakCache:
+    """按音频文件内容哈希保存包络（cache/peaks/<hash>_<列数>.peaks），解码在进程池中进行"""
+
+    def __init__(self, cache_dir="cache/peaks", columns=PEAK_COLUMNS, workers=1):
+        self.cache_dir = cache_dir
+        self.columns = columns
+        self.workers = workers
+        self.executor = None  # 第一次需要计算时才创建进程池
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hashes = ContentHashIndex(os.path.join(cache_dir, "index.json"))
+
+    def peak_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}_{self.columns}.peaks")
+
+    def get(self, track_path):
+        """返回已缓存的包络；文件变化过或还没有计算时返回 None（不解码、不计算哈希）"""
+        try:
+            digest = self.hashes.lookup(track_path)
+            if digest is None:
+                return None
+            with open(self.peak_path(digest), "rb") as f:
+                return Peaks.from_bytes(f.read())
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def store(self, track_path, digest, data, stat=None):
+        """把工作进程的结果写入缓存（先写临时文件再重命名）"""
+        path = self.peak_path(digest)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.hashes.record(track_path, digest, stat)
+        return Peaks.from_bytes(data)
+
+    def submit(self, track_path):
+        """在进程池中计算包络，返回 Future（结果为 (哈希, 峰值文件内容)）"""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self.executor.submit(_peak_job, track_path, self.columns)
+
+    def precompute(self, track_paths, workers=None, progress=None):
+        """批量计算曲库中尚未缓存的包络，默认使用全部 CPU 核心，返回统计信息
+
+        同时提交的任务数有上限，曲库再大也只占用固定的内存。
+        """
+        workers = workers or os.cpu_count() or 1
+        started = time.perf_counter()
+        stats = {"tracks": 0, "cached": 0, "computed": 0, "failed": 0}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            running = {}  # Future -> (路径, stat)
+            for track_path in track_paths:
+                stats["tracks"] += 1
+                if self.get(track_path) is not None:
+                    stats["cached"] += 1
+                    continue
+                try:
+                    stat = os.stat(track_path)
+                except OSError:
+                    stats["failed"] += 1
+                    continue
+                running[executor.submit(_peak_job, track_path, self.columns)] = (track_path, stat)
+                if len(running) >= workers * 4:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    self._collect(done, running, stats, progress)
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                self._collect(done, running, stats, progress)
+        self.hashes.index.flush()
+        elapsed = time.perf_counter() - started
+        stats["seconds"] = round(elapsed, 3)
+        stats["tracks_per_second"] = round(stats["computed"] / elapsed, 1) if elapsed > 0 else 0.0
+        return stats
+
+    def _collect(self, done, running, stats, progress):
+        for future in done:
+            track_path, stat = running.pop(future)
+            try:
+                digest, data = future.result()
+                self.store(track_path, digest, data, stat)
+                stats["computed"] += 1
+            except Exception as e:
+                print(f"[ERROR] Failed to compute peaks for '{track_path}'. Exception: {e}")
+                stats["failed"] += 1
+            if progress:
+                progress(stats)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.hashes.index.flush()
@@ -0,0 +1,161 @@
+import bisect
+import random
+from collections import deque
+
+# 播放模式（与界面上的 play_mode 一致）
+MODE_LOOP = 0  # 列表循环
+MODE_REPEAT_ONE = 1  # 单曲循环
+MODE_SHUFFLE = 2  # 随机播放
+
+# 后退/前进历史最多保留的条数
+HISTORY_LIMIT = 1000
+
+
+class PlayQueue:
+    """播放队列：按播放模式决定下一首，带后退/前进历史和“接下来播放”列表
+
+    队列中保存的都是播放列表模型中的行号，长度随模型变化（追加行无需通知）。
+    随机播放使用惰性的 Fisher–Yates 洗牌：只在稀疏字典里记录被交换过的位置，
+    每抽一首是 O(1)，一轮内不重复，内存只与本轮已抽取的数量有关。
+    """
+
+    def __init__(self, model, mode=MODE_LOOP, rng=None):
+        self.model = model  # 任何支持 len() 的播放列表模型
+        self.mode = mode
+        self.rng = rng or random.Random()
+        self.current = None  # 正在播放的行号
+        self.back = deque(maxlen=HISTORY_LIMIT)  # 之前播放过的行号
+        self.forward = deque(maxlen=HISTORY_LIMIT)  # 后退之后可以再前进的行号
+        self.up_next = deque()  # 用户插入的“接下来播放”
+        self.reset_shuffle()
+
+    def reset_shuffle(self):
+        """开始新一轮洗牌"""
+        self.perm = {}  # 排列位置 -> 行号（只记录被交换过的位置）
+        self.where = {}  # 行号 -> 排列位置（同上）
+        self.drawn = 0  # 排列中前 drawn 个位置本轮已经抽取
+        self.pending = None  # 已抽出但还没播放的下一首
+
+    def clear(self):
+        self.current = None
+        self.back.clear()
+        self.forward.clear()
+        self.up_next.clear()
+        self.reset_shuffle()
+
+    def set_mode(self, mode):
+        self.mode = mode
+
+    def play(self, row):
+        """用户直接选择播放某一行：记入历史，清空前进历史"""
+        if row == self.current:
+            return
+        if self.current is not None:
+            self.back.append(self.current)
+        self.forward.clear()
+        self.current = row
+        if row == self.pending:
+            self.pending = None
+        self._mark_drawn(row)
+
+    def enqueue(self, row):
+        """把某一行加入“接下来播放”"""
+        self.up_next.append(row)
+
+    def peek_next(self, auto=False):
+        """返回下一首的行号但不前进（用于预加载）；auto 表示歌曲自然播放结束"""
+        if self.forward:
+            return self.forward[-1]
+        if self.up_next:
+            return self.up_next[0]
+        size = len(self.model)
+        if not size:
+            return None
+        if self.mode == MODE_SHUFFLE:
+            return self._peek_shuffle(size)
+        if self.current is None:
+            return 0
+        if self.mode == MODE_REPEAT_ONE and auto:
+            return self.current
+        return (self.current + 1) % size
+
+    def next(self, auto=False):
+        """前进到下一首并返回其行号，没有可播放的曲目时返回 None"""
+        row = self.peek_next(auto)
+        if row is None:
+            return None
+        if self.forward:
+            self.forward.pop()
+        elif self.up_next:
+            self.up_next.popleft()
+        if row == self.pending:
+            # 随机抽出的那首轮到了；来自“接下来播放”或前进历史、恰好是已抽出的那首时也要清掉，否则会再放一遍
+            self.pending = None
+        if row != self.current and self.current is not None:
+            self.back.append(self.current)
+        self.current = row
+        self._mark_drawn(row)
+        return row
+
+    def previous(self):
+        """回到上一首：优先使用历史；没有历史时按列表顺序后退（随机模式下停在当前曲目）"""
+        if self.back:
+            if self.current is not None:
+                self.forward.append(self.current)
+            self.current = self.back.pop()
+            return self.current
+        size = len(self.model)
+        if not size or self.current is None:
+            return self.current
+        if self.mode != MODE_SHUFFLE:
+            self.current = (self.current - 1) % size
+        return self.current
+
+    def rows_removed(self, removed_rows):
+        """模型删除了若干行（删除前的行号，升序）之后，修正队列中的行号并重新洗牌"""
+        if not removed_rows:
+            return
+        removed = set(removed_rows)
+
+        def remap(row):
+            if row is None or row in removed:
+                return None
+            return row - bisect.bisect_left(removed_rows, row)
+
+        self.current = remap(self.current)
+        for rows in (self.back, self.forward, self.up_next):
+            kept = [remap(row) for row in rows]
+            rows.clear()
+            rows.extend(row for row in kept if row is not None)
+        self.reset_shuffle()
+
+    def _swap(self, i, j):
+        perm, where = self.perm, self.where
+        row_i, row_j = perm.get(i, i), perm.get(j, j)
+        perm[i], perm[j] = row_j, row_i
+        where[row_j], where[row_i] = i, j
+
+    def _mark_drawn(self, row):
+        """把 row 移到排列的已抽取区域，本轮不会再被随机抽到"""
+        if row is None or row >= len(self.model):
+            return
+        position = self.where.get(row, row)
+        if position >= self.drawn:
+            self._swap(position, self.drawn)
+            self.drawn += 1
+
+    def _peek_shuffle(self, size):
+        if self.pending is not None and self.pending < size:
+            return self.pending
+        if self.drawn >= size:
+            # 一轮结束，重新洗牌；当前曲目算作新一轮已播放，避免紧接着重复
+            self.reset_shuffle()
+            self._mark_drawn(self.current)
+            if self.drawn >= size:
+                self.pending = self.current
+                return self.pending
+        j = self.rng.randrange(self.drawn, size)
+        self._swap(self.drawn, j)
+        self.pending = self.perm[self.drawn]
+        self.drawn += 1
+        return self.pending
@@ -0,0 +1,72 @@
+import time
+
+from .metrics import metrics
+
+# 播放器报告的位置与插值位置相差超过这个值（秒）时直接跳到报告值（跳转、卡顿、换歌）
+SNAP_THRESHOLD = 1.0
+# 较小的偏差在这段时间（秒）内逐渐追平，进度条不会来回跳
+SLEW_SECONDS = 0.5
+
+
+class PlaybackClock:
+    """播放时钟：以播放器偶尔报告的位置为锚点，两次报告之间按 time.monotonic() 插值
+
+    进度条和时间标签可以按屏幕刷新率读取 position()，不需要额外调用 libVLC。
+    新的报告值与插值有偏差时，小偏差通过临时调整走速在 SLEW_SECONDS 内追平（时钟不会倒退），
+    大偏差直接重新锚定。
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.anchor_position = 0.0  # 锚点处的播放位置（秒）
+        self.anchor_time = clock()
+        self.rate = 1.0  # 播放速率
+        self.correction = 0.0  # 追平偏差时附加的走速（秒/秒），只在锚点后 SLEW_SECONDS 内有效
+        self.running = False
+
+    def position(self, now=None):
+        """当前插值位置（秒）"""
+        if not self.running:
+            return self.anchor_position
+        elapsed = (self.clock() if now is None else now) - self.anchor_time
+        if elapsed <= 0:
+            return self.anchor_position
+        return self.anchor_position + elapsed * self.rate + min(elapsed, SLEW_SECONDS) * self.correction
+
+    def reset(self, position=0.0, running=None):
+        """直接锚定到 position（换歌、跳转、暂停或继续播放），running 为 None 时保持原状态"""
+        self.anchor_position = max(0.0, position)
+        self.anchor_time = self.clock()
+        self.correction = 0.0
+        if running is not None:
+            self.running = running
+
+    def sample(self, position):
+        """播放器报告的权威位置（秒）：与插值比较并校正漂移"""
+        if not self.running:
+            self.reset(position)
+            return
+        now = self.clock()
+        predicted = self.position(now)
+        error = position - predicted
+        metrics.observe("clock.drift", abs(error))
+        if abs(error) > SNAP_THRESHOLD:
+            metrics.incr("clock.snap")
+            self.reset(position)
+            return
+        # 从当前插值位置出发，在 SLEW_SECONDS 内补上偏差；走速不低于 0，显示的位置不会倒退
+        self.anchor_position = predicted
+        self.anchor_time = now
+        self.correction = max(error / SLEW_SECONDS, -self.rate)
+
+    def pause(self):
+        """冻结在当前插值位置"""
+        self.reset(self.position(), running=False)
+
+    def resume(self):
+        self.reset(self.anchor_position, running=True)
+
+    def set_rate(self, rate):
+        """改变播放速率：先在旧速率下锚定当前位置"""
+        self.reset(self.position())
+        self.rate = rate
@@ -0,0 +1,176 @@
+import os
+import struct
+import sys
+from array import array
+from urllib.parse import unquote, urlsplit
+
+# 原生播放列表格式：魔数、条目数，随后是小端 int64 曲目 ID（只在同一个曲库中有效）
+NATIVE_EXTENSION = ".mpl"
+_NATIVE_HEADER = struct.Struct("<4sQ")
+_NATIVE_MAGIC = b"MPL1"
+
+PLAYLIST_EXTENSIONS = (".m3u", ".m3u8", ".pls", NATIVE_EXTENSION)
+# 文件对话框使用的类型列表
+PLAYLIST_FILETYPES = [("Playlists", "*.m3u *.m3u8 *.pls *.mpl"), ("M3U", "*.m3u *.m3u8"), ("PLS", "*.pls"),
+                      ("Native playlist", "*.mpl")]
+
+
+def is_native_playlist(playlist_path):
+    return playlist_path.lower().endswith(NATIVE_EXTENSION)
+
+
+def _open_text(playlist_path, mode):
+    # surrogateescape：非 UTF-8 的字节原样保留，和 os 对文件名的处理一致
+    return open(playlist_path, mode, encoding="utf-8-sig" if "r" in mode else "utf-8",
+                errors="surrogateescape", newline=None if "r" in mode else "\n")
+
+
+def iter_m3u(playlist_path):
+    """逐行读取 M3U/M3U8，产出条目位置（路径或 URL），跳过注释和 #EXT 指令"""
+    with _open_text(playlist_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+
+
+def iter_pls(playlist_path):
+    """逐行读取 PLS，按出现顺序产出 FileN= 的条目位置"""
+    with _open_text(playlist_path, "r") as f:
+        for line in f:
+            key, sep, value = line.strip().partition("=")
+            if sep and key[:4].lower() == "file" and key[4:].isdigit() and value.strip():
+                yield value.strip()
+
+
+def iter_playlist_locations(playlist_path):
+    """按扩展名选择文本格式的解析器（原生格式见 iter_native）"""
+    if playlist_path.lower().endswith(".pls"):
+        return iter_pls(playlist_path)
+    return iter_m3u(playlist_path)
+
+
+def iter_native(playlist_path, chunk_entries=4096):
+    """分块读取原生格式，每次产出一个 array('q') 曲目 ID"""
+    with open(playlist_path, "rb") as f:
+        header = f.read(_NATIVE_HEADER.size)
+        if len(header) < _NATIVE_HEADER.size:
+            raise ValueError("not a native playlist")
+        magic, count = _NATIVE_HEADER.unpack(header)
+        if magic != _NATIVE_MAGIC:
+            raise ValueError("not a native playlist")
+        remaining = count
+        while remaining:
+            ids = array("q")
+            data = f.read(min(remaining, chunk_entries) * ids.itemsize)
+            ids.frombytes(data[:len(data) - len(data) % ids.itemsize])
+            if not ids:
+                return  # 文件被截断
+            if sys.byteorder == "big":
+                ids.byteswap()
+            remaining -= len(ids)
+            yield ids
+
+
+def location_to_path(location):
+    """把条目位置转换成文件路径：file:// URI 解码，其他 URL（网络流）返回 None"""
+    if "://" in location:
+        parts = urlsplit(location)
+        if parts.scheme.lower() != "file":
+            return None
+        return unquote(parts.path)
+    return location
+
+
+def primary_path(location, base_dir):
+    """条目最可能对应的绝对路径：绝对路径原样，相对路径相对播放列表所在目录（base_dir 为绝对路径）；
+    网络流返回 None。这是导入时每个条目都要走的路径，只在含 . 或 .. 段时才调用 normpath"""
+    path = location_to_path(location)
+    if not path:
+        return None
+    if not os.path.isabs(path):
+        path = base_dir + os.sep + path
+    if os.sep != "/" or "/." in path or "//" in path:
+        path = os.path.normpath(path)
+    return path
+
+
+def candidate_paths(location, base_dir, roots=()):
+    """条目可能对应的绝对路径（按优先级）：相对路径先相对播放列表所在目录，再相对曲库各根目录
+
+    在非 Windows 系统上，含反斜杠的路径（Windows 上生成的播放列表）再按正斜杠尝试一次。
+    """
+    path = location_to_path(location)
+    if not path:
+        return []
+    variants = [path]
+    if os.sep == "/" and "\\" in path:
+        variants.append(path.replace("\\", "/"))
+    candidates = []
+    for variant in variants:
+        if os.path.isabs(variant):
+            candidates.append(os.path.normpath(variant))
+        else:
+            candidates.extend(os.path.normpath(os.path.join(directory, variant)) for directory in (base_dir, *roots))
+    return candidates
+
+
+def _relative_location(track_path, base_dir):
+    """播放列表目录下的文件写相对路径（整个目录可以移动），其余写绝对路径"""
+    try:
+        if os.path.commonpath([track_path, base_dir]) == base_dir:
+            return os.path.relpath(track_path, base_dir)
+    except ValueError:
+        pass  # 不在同一个驱动器上
+    return track_path
+
+
+def _atomic_open(playlist_path, binary=False):
+    """写到同目录的临时文件，调用方写完后用 os.replace 替换"""
+    tmp_path = f"{playlist_path}.{os.getpid()}.tmp"
+    return tmp_path, (open(tmp_path, "wb") if binary else _open_text(tmp_path, "w"))
+
+
+def write_playlist(playlist_path, entries):
+    """流式写出 M3U/M3U8 或 PLS（按扩展名），entries 为 (绝对路径, 标题) 的可迭代对象，返回条目数"""
+    playlist_path = os.path.abspath(playlist_path)
+    base_dir = os.path.dirname(playlist_path)
+    pls = playlist_path.lower().endswith(".pls")
+    tmp_path, f = _atomic_open(playlist_path)
+    count = 0
+    try:
+        with f:
+            f.write("[playlist]\n" if pls else "#EXTM3U\n")
+            for track_path, title in entries:
+                count += 1
+                location = _relative_location(track_path, base_dir)
+                if pls:
+                    f.write(f"File{count}={location}\nTitle{count}={title}\nLength{count}=-1\n")
+                else:
+                    f.write(f"#EXTINF:-1,{title}\n{location}\n")
+            if pls:
+                f.write(f"NumberOfEntries={count}\nVersion=2\n")
+        os.replace(tmp_path, playlist_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def write_native(playlist_path, track_ids):
+    """写出原生格式（track_ids 为 array('q')），返回条目数"""
+    ids = array("q", track_ids)
+    if sys.byteorder == "big":
+        ids.byteswap()
+    tmp_path, f = _atomic_open(playlist_path, binary=True)
+    try:
+        with f:
+            f.write(_NATIVE_HEADER.pack(_NATIVE_MAGIC, len(ids)))
+            ids.tofile(f)
+        os.replace(tmp_path, playlist_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(ids)
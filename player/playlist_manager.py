@@ -1,14 +1,57 @@
 # playlist_manager.py
 import tkinter as tk
 import os
-import random
+import queue
+import time
+from array import array
+from collections import deque
+
+from .library_index import LibraryIndex
+from .library_scanner import LibraryScanner, PlaylistImporter
+from .loudness import track_gain_db
+from .play_queue import PlayQueue
+from .playlist_files import is_native_playlist, write_native, write_playlist
+from .search_index import SearchIndex
+from .track_list import TrackModel, VirtualListView
+
+# 每次从扫描队列取数据时最多占用主线程的时间（秒）和两次之间的间隔（毫秒）
+SCAN_DRAIN_BUDGET = 0.008
+SCAN_DRAIN_INTERVAL_MS = 30
+# 导出播放列表时每次批量查询路径的曲目数
+EXPORT_CHUNK = 1000
+# 搜索过滤每个 after 周期最多占用的主线程时间（秒），剩余的行在后续周期继续扫描
+SEARCH_FILTER_BUDGET = 0.004
 
 class PlaylistManager:
-    def __init__(self, parent_frame):
+    def __init__(self, parent_frame, library_db="cache/library.db"):
         """初始化播放列表管理器"""
+        self.library_db = library_db
+        self.library = LibraryIndex(library_db)  # 持久化曲库索引
+        self.tracks = TrackModel()  # 播放列表数据（与界面分离）
+        self.selected_index = None  # 当前选中的行号
+        self.queue = PlayQueue(self.tracks)  # 播放顺序、历史和“接下来播放”
+        self.scanner = None  # 后台扫描器或播放列表导入器
+        self.scan_done = False  # 扫描器已发出 done
+        self.scan_stats = None  # done 附带的统计
+        self.search_index = SearchIndex()  # 标签、文件名、所在文件夹的倒排索引
+        self.index_queue = deque()  # 已进入播放列表但尚未建立搜索索引的 Track
+        self.reindex_queue = deque()  # 标签有更新、需要重新建立搜索索引的 Track
+        self.search_result = None  # 当前查询结果，None 表示不过滤
+        self.filter_rows = None  # 匹配查询的模型行号
+        self.filter_pos = 0  # 过滤已扫描到的模型行号
+        self.filter_after_id = None
         self.frame = tk.Frame(parent_frame, bg="#34495E", bd=2, relief=tk.GROOVE)
-        self.playlist = tk.Listbox(self.frame, selectmode=tk.SINGLE, bg="#34495E", fg="white", font=("Helvetica", 12))
-        self.playlist.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", self.on_search_changed)
+        self.search_entry = tk.Entry(self.frame, textvariable=self.search_var, bg="#2C3E50", fg="white",
+                                     insertbackground="white", relief=tk.FLAT, font=("Helvetica", 11))
+        self.search_entry.bind("<Escape>", lambda e: self.search_var.set(""))
+        self.search_entry.pack(fill=tk.X, padx=10, pady=(10, 0))
+        self.view = VirtualListView(self.frame, self.tracks, on_select=self.on_view_select,
+                                    on_context=self.enqueue)
+        self.view.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.scan_status = tk.Label(self.frame, text="", anchor="w", bg="#34495E", fg="#BDC3C7", font=("Helvetica", 9))
+        self.scan_status.pack(fill=tk.X, padx=10, pady=(0, 5))
         self.playlist_visible = False
 
     def toggle_playlist(self):
@@ -20,50 +63,256 @@ class PlaylistManager:
         self.playlist_visible = not self.playlist_visible
 
     def load_default_playlist(self, folder_path):
-        """加载文件夹中的所有 MP3 文件到播放列表"""
-        self.playlist.delete(0, tk.END)  # 清空当前播放列表
-        if os.path.exists(folder_path):
-            for file_name in os.listdir(folder_path):
-                if file_name.endswith(".mp3"):
-                    self.playlist.insert(tk.END, file_name)
+        """把文件夹加入曲库并加载曲库中的所有音频文件到播放列表"""
+        self.load_library([folder_path])
+
+    def load_library(self, roots=()):
+        """登记曲库根目录，增量重新扫描后从索引加载播放列表"""
+        for folder_path in roots:
+            if os.path.exists(folder_path):
+                self.library.add_root(folder_path)
+            else:
+                print(f"Folder {folder_path} not found.")
+        self.library.rescan()
+
+        self.clear()  # 清空当前播放列表
+        for batch in self.library.iter_tracks(tags=True):
+            self.tracks.extend_tracks(batch)
+            for track in batch:
+                self.index_track(track)
+        self.update_filter()
+        self.view.refresh()
+
+    def start_library_scan(self, roots=()):
+        """在后台线程扫描曲库，扫描结果分批流入播放列表，不阻塞界面"""
+        if self.scanner:
+            self.scanner.stop()
+        existing_roots = []
+        for folder_path in roots:
+            if os.path.exists(folder_path):
+                existing_roots.append(folder_path)
+            else:
+                print(f"Folder {folder_path} not found.")
+
+        self.start_loader(LibraryScanner(self.library_db, existing_roots))
+
+    def import_playlist(self, playlist_path):
+        """用播放列表文件（M3U/M3U8/PLS 或原生格式）替换当前播放列表：后台流式解析，分批显示"""
+        if self.scanner:
+            self.scanner.stop()
+        self.start_loader(PlaylistImporter(self.library_db, playlist_path))
+
+    def start_loader(self, loader):
+        """清空播放列表，启动后台扫描器或导入器，并开始在主线程消费它的结果"""
+        self.clear()  # 清空当前播放列表
+        self.scan_done = False
+        self.scan_stats = None
+        self.scanner = loader
+        self.scanner.start()
+        self.frame.after(0, self.drain_scan_queue, self.scanner)
+
+    def export_playlist(self, playlist_path):
+        """把当前播放列表的所有行按顺序写入播放列表文件（格式由扩展名决定），返回写入的条目数"""
+        if is_native_playlist(playlist_path):
+            return write_native(playlist_path, self.tracks.ids)
+        return write_playlist(playlist_path, self.iter_export_entries())
+
+    def iter_export_entries(self):
+        """按行产出 (绝对路径, 显示名称)，路径按块批量查询"""
+        ids = self.tracks.ids
+        for start in range(0, len(ids), EXPORT_CHUNK):
+            found = self.library.tracks_by_id(ids[start:start + EXPORT_CHUNK])
+            for index in range(start, min(start + EXPORT_CHUNK, len(ids))):
+                track = found.get(ids[index])
+                if track is not None:
+                    yield track.path, self.tracks.name(index)
+
+    def drain_scan_queue(self, scanner):
+        """在主线程中按时间预算消费扫描结果，并更新扫描进度"""
+        if scanner is not self.scanner:
+            return  # 已被新的扫描取代
+        deadline = time.monotonic() + SCAN_DRAIN_BUDGET
+        while not self.scan_done and time.monotonic() < deadline:
+            try:
+                kind, payload = scanner.queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "added":
+                self.tracks.extend_tracks(payload)
+                self.index_queue.extend(payload)
+            elif kind == "tagged":
+                self.tracks.update_tracks(payload)
+                self.reindex_queue.extend(payload)
+            elif kind == "removed":
+                self.remove_tracks(payload)
+            elif kind == "done":
+                self.scan_done = True
+                self.scan_stats = payload
+
+        # 用剩余的时间预算建立搜索索引，来不及的留到下一轮
+        while self.index_queue and time.monotonic() < deadline:
+            self.index_track(self.index_queue.popleft())
+        while self.reindex_queue and time.monotonic() < deadline:
+            self.index_track(self.reindex_queue.popleft())
+        self.update_filter()
+
+        self.view.refresh()
+        if self.scan_done and not self.index_queue and not self.reindex_queue:  # 扫描结束且索引已建完
+            self.scanner = None
+            self.scan_status.config(text=scanner.summary(len(self.tracks), self.scan_stats))
+            return
+        self.scan_status.config(
+            text=f"{scanner.activity}… 已载入 {len(self.tracks)} 首 · {scanner.throughput():.0f} 首/秒")
+        self.frame.after(SCAN_DRAIN_INTERVAL_MS, self.drain_scan_queue, scanner)
+
+    def index_track(self, track):
+        """把曲目加入搜索索引：标题、艺术家、专辑、文件名（不含扩展名）以及所在的两级文件夹名
+
+        没有标签的曲目，艺术家和专辑通常就是这两级文件夹的名字。
+        """
+        self.search_index.add(track.id, *track.search_fields())
+
+    def on_search_changed(self, *args):
+        """搜索框内容变化：重新查询，并从头开始流式过滤播放列表"""
+        if self.filter_after_id is not None:
+            self.frame.after_cancel(self.filter_after_id)
+            self.filter_after_id = None
+        self.search_result = self.search_index.search(self.search_var.get())
+        if self.search_result is None:
+            self.filter_rows = None
         else:
-            print(f"Folder {folder_path} not found.")
+            self.filter_rows = array("q")
+            self.filter_pos = 0
+        self.view.set_rows(self.filter_rows)
+        self.continue_filter()
+
+    def update_filter(self):
+        """播放列表或索引有新数据时，让正在进行的过滤覆盖新增的行"""
+        if self.search_result is not None and self.filter_after_id is None:
+            self.continue_filter()
 
-    def add_track(self, track_name):
-        """向播放列表添加新轨道"""
-        self.playlist.insert(tk.END, track_name)
+    def continue_filter(self):
+        """在时间预算内逐行检查是否匹配，匹配的行立即追加到视图，其余的留到下一个周期"""
+        self.filter_after_id = None
+        result = self.search_result
+        if result is None:
+            return
+        if result.version != self.search_index.version:
+            # 索引已变化（新扫描到的曲目），重新查询，已过滤出的行保持不变
+            result = self.search_result = self.search_index.search(self.search_var.get())
+        ids = self.tracks.ids
+        rows = self.filter_rows
+        end = len(ids) - len(self.index_queue)  # 尚未建立索引的行暂不检查
+        pos = self.filter_pos
+        deadline = time.perf_counter() + SEARCH_FILTER_BUDGET
+        while pos < end:
+            chunk_end = min(end, pos + 2000)
+            rows.extend(index for index in range(pos, chunk_end) if ids[index] in result)
+            pos = chunk_end
+            if time.perf_counter() > deadline:
+                break
+        self.filter_pos = pos
+        self.view.refresh()
+        if pos < end:
+            self.filter_after_id = self.frame.after(1, self.continue_filter)
+
+    def clear(self):
+        """清空播放列表"""
+        self.tracks.clear()
+        self.queue.clear()
+        self.search_index.clear()
+        self.index_queue.clear()
+        self.reindex_queue.clear()
+        if self.search_result is not None:
+            self.on_search_changed()
+        self.selected_index = None
+        self.view.set_selection(None)
+
+    def remove_tracks(self, track_ids):
+        """从播放列表中移除指定 ID 的曲目，并尽量保持原选中曲目"""
+        selected_id = self.get_selected_track_id()
+        removed = set(track_ids)
+        for track_id in removed:
+            self.search_index.remove(track_id)
+        if self.index_queue:
+            self.index_queue = deque(track for track in self.index_queue if track.id not in removed)
+        if self.reindex_queue:
+            self.reindex_queue = deque(track for track in self.reindex_queue if track.id not in removed)
+        self.queue.rows_removed(self.tracks.remove_ids(removed))
+        if self.search_result is not None:
+            self.on_search_changed()  # 行号已变化，重新过滤
+        self.select_index(self.tracks.index_of(selected_id) if selected_id is not None else None)
+
+    def add_track(self, track_path):
+        """把音频文件加入曲库并添加到播放列表"""
+        track = self.library.get_track(self.library.add_track(track_path))
+        self.tracks.extend_tracks([track])
+        self.index_track(track)
+        self.update_filter()
+        self.view.refresh()
+
+    def on_view_select(self, index):
+        """列表视图中点击选中某行"""
+        self.selected_index = index
+
+    def select_index(self, index):
+        """选中指定行并同步列表视图"""
+        self.selected_index = index
+        self.view.set_selection(index)
 
     def get_selected_track(self):
-        """获取选中的歌曲名称"""
-        try:
-            selected_index = self.playlist.curselection()[0]
-            return self.playlist.get(selected_index)
-        except IndexError:
+        """获取选中的歌曲显示名称（有标签时为 “艺术家 - 标题”）"""
+        if self.selected_index is None:
+            return None
+        return self.tracks.name(self.selected_index)
+
+    def get_selected_track_id(self):
+        """获取选中歌曲的曲目 ID"""
+        if self.selected_index is None:
             return None
+        return self.tracks.track_id(self.selected_index)
+
+    def get_selected_track_path(self):
+        """获取选中歌曲的绝对路径"""
+        track_id = self.get_selected_track_id()
+        return self.library.get_path(track_id) if track_id is not None else None
 
-    def select_next_track(self):
-        """选中下一首歌曲"""
-        current_index = self.playlist.curselection()
-        if current_index:
-            next_index = (current_index[0] + 1) % self.playlist.size()
-            self.playlist.selection_clear(0, tk.END)
-            self.playlist.selection_set(next_index)
-            return self.get_selected_track()
-        return None
+    def get_track_gain(self, index):
+        """指定行歌曲的响度归一化增益（dB），没有分析过时为 0"""
+        loudness = self.library.get_loudness(self.tracks.track_id(index))
+        return track_gain_db(*loudness) if loudness else 0.0
+
+    def get_track_path(self, index):
+        """获取指定行歌曲的绝对路径"""
+        return self.library.get_path(self.tracks.track_id(index))
+
+    def enqueue(self, index):
+        """把指定行加入“接下来播放”"""
+        self.queue.enqueue(index)
+        self.scan_status.config(text=f"接下来播放: {self.tracks.name(index)}")
+
+    def play_index(self, index):
+        """记录开始播放指定行（用户直接选择的曲目）"""
+        self.queue.play(index)
+
+    def peek_next_index(self):
+        """歌曲自然结束后将要播放的行号（用于预加载），不改变队列"""
+        return self.queue.peek_next(auto=True)
+
+    def select_next_track(self, auto=False):
+        """按播放模式前进到下一首并选中它；auto 表示歌曲自然播放结束"""
+        if self.queue.current is None and self.selected_index is not None:
+            self.queue.play(self.selected_index)  # 还没播放过时从选中行开始
+        index = self.queue.next(auto)
+        if index is None:
+            return None
+        self.select_index(index)
+        return self.get_selected_track()
 
     def select_previous_track(self):
-        """选中上一首歌曲"""
-        current_index = self.playlist.curselection()
-        if current_index:
-            prev_index = current_index[0] - 1 if current_index[0] > 0 else self.playlist.size() - 1
-            self.playlist.selection_clear(0, tk.END)
-            self.playlist.selection_set(prev_index)
-            return self.get_selected_track()
-        return None
-
-    def select_random_track(self):
-        """随机选中一首歌曲"""
-        random_index = random.randint(0, self.playlist.size() - 1)
-        self.playlist.selection_clear(0, tk.END)
-        self.playlist.selection_set(random_index)
+        """回到上一首（优先按播放历史）并选中它"""
+        index = self.queue.previous()
+        if index is None:
+            return None
+        self.select_index(index)
         return self.get_selected_track()
@@ -0,0 +1,156 @@
+import bisect
+import re
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# 新词先放在待合并列表中，积累到这个数量再并入有序词表
+_PENDING_MERGE_SIZE = 2000
+# 不超过该长度的前缀查询结果会被缓存（这类前缀对应的词最多，合并代价最大）
+_CACHED_PREFIX_LENGTH = 2
+
+
+def tokenize(text):
+    """把文本切分成小写词"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class SearchIndex:
+    """曲目的内存倒排索引：词 -> 曲目 ID 集合，支持按前缀匹配和多词交集，可增量增删
+
+    倒排表用集合而不是列表：文件夹名这类词几乎每首曲目都有，删除和重新索引必须是 O(1) 的。
+    """
+
+    def __init__(self):
+        self.version = 0  # 每次增删都会递增，用于判断已有查询结果是否过期
+        self.clear()
+
+    def clear(self):
+        self.version += 1
+        self.postings = {}  # 词 -> 包含该词的曲目 ID 集合
+        self.doc_tokens = {}  # 曲目 ID -> 该曲目的词（删除时使用）
+        self.sorted_tokens = []  # 有序词表，用于二分查找前缀范围
+        self.pending_tokens = []  # 尚未并入有序词表的新词
+        self.prefix_cache = {}  # 短前缀 -> 曲目 ID 集合
+        self.max_candidates = 20000  # 展开成集合的最大 ID 数，超过时改为逐行检查
+
+    def __len__(self):
+        return len(self.doc_tokens)
+
+    def add(self, track_id, *fields):
+        """索引一首曲目（标题、艺术家、专辑、文件名等任意字段），重复添加会先删除旧记录"""
+        if track_id in self.doc_tokens:
+            self.remove(track_id)
+        tokens = set()
+        for field in fields:
+            if field:
+                tokens.update(tokenize(field))
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                self.postings[token] = {track_id}
+                self.pending_tokens.append(token)
+            else:
+                ids.add(track_id)
+            self._invalidate_prefixes(token)
+        self.doc_tokens[track_id] = tuple(tokens)
+        self.version += 1
+        if len(self.pending_tokens) >= _PENDING_MERGE_SIZE:
+            self._merge_pending()
+
+    def remove(self, track_id):
+        tokens = self.doc_tokens.pop(track_id, ())
+        self.version += 1
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(track_id)  # 变空的词保留在词表中，查询时自然跳过，合并时再清理
+            self._invalidate_prefixes(token)
+
+    def search(self, query):
+        """返回匹配查询的 SearchResult（空查询返回 None，表示不过滤）
+
+        只把预计结果最少的那个词展开成 ID 集合（且不超过 max_candidates），
+        其余词在判断成员时对曲目自身的词做前缀检查，所以每次按键的开销与结果集大小无关。
+        """
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return None
+        estimates = [(self._estimate(term), term) for term in terms]
+        estimates.sort()
+        size, term = estimates[0]
+        if size == 0:
+            return SearchResult(self, set(), [])
+        if size <= self.max_candidates:
+            return SearchResult(self, self._prefix_ids(term), [t for _, t in estimates[1:]])
+        return SearchResult(self, None, terms)
+
+    def _token_range(self, prefix):
+        """有序词表中以 prefix 开头的词，加上待合并列表中匹配的词"""
+        start = bisect.bisect_left(self.sorted_tokens, prefix)
+        end = bisect.bisect_left(self.sorted_tokens, prefix + "\U0010ffff", start)
+        return self.sorted_tokens[start:end] + [t for t in self.pending_tokens if t.startswith(prefix)]
+
+    def _estimate(self, prefix):
+        """以 prefix 开头的所有词的 ID 集合大小之和（可能有重复，只用于比较选择性）"""
+        cached = self.prefix_cache.get(prefix)
+        if cached is not None:
+            return len(cached)
+        postings = self.postings
+        return sum(len(postings.get(token, ())) for token in self._token_range(prefix))
+
+    def _prefix_ids(self, prefix):
+        cached = self.prefix_cache.get(prefix)
+        if cached is not None:
+            return cached
+        ids = set()
+        for token in self._token_range(prefix):
+            ids.update(self.postings.get(token, ()))
+        if len(prefix) <= _CACHED_PREFIX_LENGTH:
+            self.prefix_cache[prefix] = ids
+        return ids
+
+    def matches(self, track_id, terms):
+        """判断曲目的词是否覆盖所有查询词前缀"""
+        tokens = self.doc_tokens.get(track_id)
+        if tokens is None:
+            return False
+        for term in terms:
+            for token in tokens:
+                if token.startswith(term):
+                    break
+            else:
+                return False
+        return True
+
+    def _invalidate_prefixes(self, token):
+        if self.prefix_cache:
+            for length in range(1, _CACHED_PREFIX_LENGTH + 1):
+                self.prefix_cache.pop(token[:length], None)
+
+    def _merge_pending(self):
+        """把新词并入有序词表（两段有序序列，Timsort 近似线性合并），顺便去掉已删除的词"""
+        tokens = self.sorted_tokens + sorted(self.pending_tokens)
+        tokens.sort()
+        self.sorted_tokens = []
+        for token in tokens:
+            if self.postings[token]:
+                self.sorted_tokens.append(token)
+            else:
+                del self.postings[token]
+        self.pending_tokens = []
+
+
+class SearchResult:
+    """一次查询的结果：candidates 为候选 ID 集合（None 表示不限），terms 为还需逐个检查的查询词"""
+
+    def __init__(self, index, candidates, terms):
+        self.index = index
+        self.version = index.version
+        self.candidates = candidates
+        self.terms = terms
+
+    def __contains__(self, track_id):
+        if self.candidates is not None and track_id not in self.candidates:
+            return False
+        return not self.terms or self.index.matches(track_id, self.terms)
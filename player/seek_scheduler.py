@@ -0,0 +1,91 @@
+import threading
+import time
+
+from .metrics import metrics
+
+# 两次跳转之间至少间隔多久（秒）：libVLC 的 set_time 立即返回，实际跳转在输入线程中进行，
+# 间隔太短时后一次会打断前一次，听起来就是断断续续的杂音
+MIN_SEEK_INTERVAL = 0.05
+
+
+class SeekScheduler:
+    """合并跳转请求：同一时间最多一个跳转在执行，等待中的只保留最新的目标
+
+    拖动进度条时每秒会产生几十个目标位置；request() 只记录目标并立即返回，
+    后台线程执行完当前跳转（并等满 MIN_SEEK_INTERVAL）后再执行最新的那个，中间的全部丢弃。
+
+    每个目标带有请求时的代号，换歌前调用 cancel() 使代号加一：后台线程在 seek_lock 下检查代号，
+    已经取出但属于上一首的跳转直接丢弃；cancel() 也要拿到 seek_lock 才返回，所以换歌时不会有跳转在执行。
+    """
+
+    def __init__(self, seek, min_interval=MIN_SEEK_INTERVAL):
+        self.seek = seek  # seek(position)，在后台线程中调用
+        self.min_interval = min_interval
+        self.cond = threading.Condition()
+        self.pending = None  # (目标位置, 请求时间, 代号)
+        self.generation = 0  # 每次换歌加一
+        self.seek_lock = threading.Lock()  # 执行跳转时持有，cancel() 借此等待正在执行的跳转结束
+        self.in_flight = False
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="SeekScheduler", daemon=True)
+        self.thread.start()
+
+    def request(self, position):
+        """请求跳转到 position；已有等待中的目标时直接替换"""
+        with self.cond:
+            if self.pending is not None:
+                metrics.incr("seek.coalesced")
+            self.pending = (position, time.perf_counter(), self.generation)
+            metrics.incr("seek.requested")
+            self.cond.notify()
+
+    def cancel(self):
+        """换歌前调用：丢弃还没执行的目标并使已取出的目标作废，返回时没有跳转在执行"""
+        with self.cond:
+            self.pending = None
+            self.generation += 1
+        with self.seek_lock:
+            pass  # 等正在执行的跳转结束；之后取出的旧目标会因代号过期被丢弃
+
+    def busy(self):
+        """是否还有跳转正在执行或等待执行"""
+        with self.cond:
+            return self.in_flight or self.pending is not None
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.pending = None
+            self.cond.notify()
+
+    def _run(self):
+        last_seek = 0.0
+        while True:
+            with self.cond:
+                while self.pending is None and not self.closed:
+                    self.in_flight = False
+                    self.cond.wait()
+                if self.closed:
+                    return
+                self.in_flight = True
+            # 等满最小间隔；等待期间到来的新目标会替换旧目标
+            delay = last_seek + self.min_interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            with self.cond:
+                if self.pending is None:
+                    continue
+                (position, requested_at, generation), self.pending = self.pending, None
+            with self.seek_lock:
+                if generation != self.generation:
+                    metrics.incr("seek.stale")  # 请求后已经换歌，不能落到新歌上
+                    continue
+                started = time.perf_counter()
+                metrics.observe("seek.queue_delay", started - requested_at)
+                try:
+                    self.seek(position)
+                except Exception as e:
+                    print(f"[ERROR] Seek to {position} failed. Exception: {e}")
+            last_seek = time.perf_counter()
+            metrics.observe("seek.execute", last_seek - started)
+            metrics.incr("seek.executed")
@@ -0,0 +1,174 @@
+import os
+import struct
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from .content_hash import ContentHashIndex, hash_file
+from .lru_cache import LRUCache
+from .media_probe import find_mp3_audio_start, is_mp3_info_frame, iter_mp3_frames
+from .metrics import metrics
+
+# 跳转表文件格式：魔数、采样率、每帧采样数、帧数、是否 VBR、音频数据起止偏移，随后是 uint64 帧偏移
+_TABLE_HEADER = struct.Struct("<4sIIIIQQ")
+_TABLE_MAGIC = b"SKT1"
+
+
+class SeekTable:
+    """MP3 的逐帧偏移表：第 i 个音频帧从 offsets[i] 字节开始，起始时间为 i × 每帧采样数 / 采样率
+
+    VBR 文件的码率逐帧变化，按平均码率（或 Xing 头里 100 个点的 TOC）换算的字节位置
+    可能差出好几秒；查表则总是落在目标时间所在的那一帧。
+    """
+
+    def __init__(self, sample_rate, frame_samples, offsets, stream_start, stream_end, vbr):
+        self.sample_rate = sample_rate
+        self.frame_samples = frame_samples
+        self.offsets = offsets  # array('Q')
+        self.stream_start = stream_start  # 第一个 MPEG 帧（含 Xing/Info 头帧）的偏移
+        self.stream_end = stream_end  # 文件结束处（播放器按比例跳转时的终点）
+        self.vbr = vbr
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def frame_seconds(self):
+        return self.frame_samples / self.sample_rate
+
+    @property
+    def duration(self):
+        return len(self.offsets) * self.frame_seconds
+
+    def frame_at(self, seconds):
+        """包含 seconds 时刻的帧序号"""
+        if not self.offsets:
+            return 0
+        return max(0, min(len(self.offsets) - 1, int(seconds / self.frame_seconds)))
+
+    def time_of(self, index):
+        return index * self.frame_seconds
+
+    def offset_at(self, seconds):
+        """包含 seconds 时刻的帧在文件中的字节偏移"""
+        return self.offsets[self.frame_at(seconds)] if self.offsets else self.stream_start
+
+    def fraction_at(self, seconds):
+        """按字节比例表示的位置（0~1），供只能按比例跳转的播放器使用"""
+        span = self.stream_end - self.stream_start
+        if span <= 0:
+            return 0.0
+        return (self.offset_at(seconds) - self.stream_start) / span
+
+    def to_bytes(self):
+        return _TABLE_HEADER.pack(_TABLE_MAGIC, self.sample_rate, self.frame_samples, len(self.offsets),
+                                  int(self.vbr), self.stream_start, self.stream_end) + self.offsets.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, sample_rate, frame_samples, count, vbr, start, end = _TABLE_HEADER.unpack_from(data)
+        offsets = array("Q")
+        if magic != _TABLE_MAGIC or len(data) != _TABLE_HEADER.size + count * offsets.itemsize:
+            raise ValueError("not a seek table")
+        offsets.frombytes(memoryview(data)[_TABLE_HEADER.size:])
+        return cls(sample_rate, frame_samples, offsets, start, end, bool(vbr))
+
+
+def build_seek_table(track_path):
+    """逐帧扫描 MP3 建立跳转表（只读帧头），不是 MP3 或无法同步时返回 None"""
+    with open(track_path, "rb") as f:
+        start = find_mp3_audio_start(f)
+        if start is None:
+            return None
+        f.seek(start)
+        skip_first = is_mp3_info_frame(f.read(256))
+        offsets = array("Q")
+        bitrates = set()
+        sample_rate = frame_samples = 0
+        for index, (offset, samples, rate, bitrate) in enumerate(iter_mp3_frames(f, start)):
+            if index == 0:
+                sample_rate, frame_samples = rate, samples
+                if skip_first:
+                    continue
+            offsets.append(offset)
+            bitrates.add(bitrate)
+        if not offsets:
+            return None
+        end = os.fstat(f.fileno()).st_size
+    return SeekTable(sample_rate, frame_samples, offsets, start, end, len(bitrates) > 1)
+
+
+def _is_mp3(track_path):
+    return track_path.lower().endswith((".mp3", ".mp2"))
+
+
+class SeekTableCache:
+    """按文件内容哈希缓存跳转表（cache/seektables/<hash>.seek），在后台线程中建立
+
+    get() 只返回已经在内存或磁盘上的表，不会阻塞；还没有时由 request() 在后台建立，
+    期间的跳转退回到播放器自身的按时间跳转。
+    """
+
+    def __init__(self, cache_dir="cache/seektables", max_bytes=16 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hashes = ContentHashIndex(os.path.join(cache_dir, "index.json"))
+        self.tables = LRUCache(max_bytes, cost=lambda table: len(table.offsets) * 8 + 64)
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="SeekTable")
+        self.pending = set()
+
+    def table_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.seek")
+
+    def get(self, track_path):
+        """返回已有的跳转表；非 MP3 或尚未建立时返回 None"""
+        if not _is_mp3(track_path):
+            return None
+        with self.lock:
+            table = self.tables.get(track_path)
+        if table is not None:
+            return table
+        try:
+            digest = self.hashes.lookup(track_path)
+            if digest is None:
+                return None
+            with open(self.table_path(digest), "rb") as f:
+                table = SeekTable.from_bytes(f.read())
+        except (OSError, ValueError, struct.error):
+            return None
+        with self.lock:
+            self.tables.put(track_path, table)
+        return table
+
+    def request(self, track_path):
+        """确保跳转表可用：内存或磁盘上没有时提交到后台线程建立"""
+        if not _is_mp3(track_path) or self.get(track_path) is not None:
+            return
+        with self.lock:
+            if track_path in self.pending:
+                return
+            self.pending.add(track_path)
+        self.executor.submit(self._build, track_path)
+
+    def _build(self, track_path):
+        try:
+            with metrics.timed("seek_table.build"):
+                stat = os.stat(track_path)
+                digest = hash_file(track_path)
+                table = build_seek_table(track_path)
+                if table is None:
+                    return
+                path = self.table_path(digest)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(table.to_bytes())
+                os.replace(tmp_path, path)
+                self.hashes.record(track_path, digest, stat)
+            with self.lock:
+                self.tables.put(track_path, table)
+        except OSError as e:
+            print(f"[ERROR] Failed to build seek table for '{track_path}'. Exception: {e}")
+        finally:
+            with self.lock:
+                self.pending.discard(track_path)
@@ -0,0 +1,117 @@
+import atexit
+import json
+import os
+import threading
+
+
+def atomic_write_json(path, data, indent=None):
+    """先写同目录下的临时文件并 fsync，再用 os.replace 原子替换，写到一半崩溃也不会截断原文件"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SettingsStore:
+    """带写回缓冲的 JSON 配置存储：修改只更新内存，合并后延迟一次性原子写盘
+
+    没有 Tk 根窗口时写盘在定时器线程中进行，get/set 可以在任意线程调用：写盘的是加锁取得的快照。
+    """
+
+    def __init__(self, path, default=None, root=None, delay_ms=500, indent=4):
+        self.path = path
+        self.root = root  # 有 Tk 根窗口时用 after 调度写盘，否则使用后台定时器
+        self.delay_ms = delay_ms
+        self.indent = indent
+        self.lock = threading.Lock()  # 保护 data、dirty 和 timer
+        self.write_lock = threading.Lock()  # 保证快照按顺序写盘
+        self.timer = None
+        self.dirty = False
+
+        # 统计：changes 为修改次数，coalesced 为被合并掉的写盘次数，flushes 为实际写盘次数
+        self.changes = 0
+        self.coalesced = 0
+        self.flushes = 0
+
+        self.data = self.load(default)
+        atexit.register(self.close)
+
+    def load(self, default=None):
+        """读取配置文件，不存在或损坏时返回默认值"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[ERROR] Failed to read config '{self.path}'. Exception: {e}")
+        return {} if default is None else default
+
+    def get(self, key, default=None):
+        with self.lock:
+            return self.data.get(key, default)
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        """记录一次修改；已经安排了写盘时本次修改直接合并进去"""
+        with self.lock:
+            self.changes += 1
+            self.dirty = True
+            if self.timer is not None:
+                self.coalesced += 1
+                return
+            if self.root is not None:
+                self.timer = self.root.after(self.delay_ms, self.flush)
+            else:
+                self.timer = threading.Timer(self.delay_ms / 1000, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """立即把内存中的配置写入磁盘（没有修改时什么也不做）；写盘失败时保留未保存标记"""
+        with self.write_lock:
+            with self.lock:
+                self._cancel_timer()
+                if not self.dirty:
+                    return
+                self.dirty = False
+                data = dict(self.data)
+            try:
+                atomic_write_json(self.path, data, indent=self.indent)
+                self.flushes += 1
+            except (OSError, TypeError, ValueError) as e:
+                with self.lock:
+                    self.dirty = True
+                print(f"[ERROR] Failed to write config '{self.path}'. Exception: {e}")
+
+    def close(self):
+        """退出前写回尚未保存的修改"""
+        self.flush()
+
+    def stats(self):
+        return {"changes": self.changes, "coalesced": self.coalesced, "flushes": self.flushes}
+
+    def _cancel_timer(self):
+        if self.timer is None:
+            return
+        if self.root is not None:
+            try:
+                self.root.after_cancel(self.timer)
+            except Exception:
+                pass  # 窗口已销毁
+        else:
+            self.timer.cancel()
+        self.timer = None
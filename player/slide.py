@@ -1,31 +1,39 @@
 import tkinter as tk
-from PIL import Image, ImageTk
-from ctypes import cast, POINTER
-from comtypes import CLSCTX_ALL
-from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+
+from .metrics import metrics
+from .volume_backends import NullVolumeBackend
+
+# 拖动音量条时最多每帧（毫秒）调用一次音量后端
+VOLUME_FRAME_MS = 16
+
+SLIDER_HEIGHT = 120
+
 
 class VolumeControl:
-    def __init__(self, root, initial_volume=50):
+    def __init__(self, root, initial_volume=50, backend=None):
         self.root = root
         self.volume_level = initial_volume
         self.is_slider_visible = False  # 控制音量条显示状态，初始为隐藏
 
-        # 获取系统音量控制
-        devices = AudioUtilities.GetSpeakers()
-        interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-        self.volume = cast(interface, POINTER(IAudioEndpointVolume))
-
-        # 设置初始音量
-        self.set_system_volume(initial_volume / 100.0)
+        # 音量后端（libVLC、系统混音器或空后端），在首帧之后由 start() 初始化
+        self.backend = backend or NullVolumeBackend()
+        self.started = False
+        self.apply_after_id = None  # 已安排的后端调用；拖动期间的多次修改合并为一次
+        self.applied_level = None  # 最后一次写入后端的音量
 
         # 创建音量条框架（包含自定义的音量条和标签）
         self.volume_slider_frame = tk.Frame(root, bg="white", bd=1, relief="solid")
         self.volume_slider_frame.place(x=root.winfo_width() - 70, y=20, anchor="ne")  # 固定在右上角位置
 
         # 创建一个Canvas作为自定义音量条
-        self.volume_canvas = tk.Canvas(self.volume_slider_frame, width=10, height=120, bg="white", highlightthickness=0)
+        self.volume_canvas = tk.Canvas(self.volume_slider_frame, width=10, height=SLIDER_HEIGHT, bg="white", highlightthickness=0)
         self.volume_canvas.pack(pady=5)
 
+        # 背景条、音量进度条和滑块只创建一次，之后用 coords 移动
+        self.track_line = self.volume_canvas.create_line(5, 0, 5, SLIDER_HEIGHT, fill="gray", width=2)
+        self.level_line = self.volume_canvas.create_line(5, 0, 5, SLIDER_HEIGHT, fill="green", width=2)
+        self.knob = self.volume_canvas.create_oval(0, -5, 10, 5, fill="green", outline="green")
+
         # 音量百分比标签，显示在音量条上方
         self.volume_label = tk.Label(self.volume_slider_frame, text=f"{self.volume_level}%", font=("Arial", 10), bg="white")
         self.volume_label.pack()
@@ -33,17 +41,39 @@ class VolumeControl:
         # 绑定音量条的点击和拖动事件
         self.volume_canvas.bind("<Button-1>", self.set_volume_from_click)
         self.volume_canvas.bind("<B1-Motion>", self.set_volume_from_click)
-        
+
         # 确保音量条初始隐藏
         self.volume_slider_frame.place_forget()
 
         # 更新音量条初始状态
         self.update_volume_display()
 
-    def set_system_volume(self, volume_level):
-        """设置系统音量"""
-        # 设置系统音量（范围从 0.0 到 1.0）
-        self.volume.SetMasterVolumeLevelScalar(volume_level, None)
+    def start(self):
+        """初始化音量后端并设置初始音量；失败时改用空后端，界面照常可用"""
+        self.started = True
+        try:
+            self.backend.start()
+        except Exception:
+            self.backend = NullVolumeBackend()
+            raise
+        finally:
+            self.apply_volume()
+
+    def schedule_apply(self):
+        """安排在下一帧把音量写入后端，同一帧内的多次修改只写一次"""
+        metrics.incr("volume.requests")
+        if self.apply_after_id is None and self.started:
+            self.apply_after_id = self.root.after(VOLUME_FRAME_MS, self.apply_volume)
+
+    def apply_volume(self):
+        """把当前音量写入后端（与上次写入的值相同时跳过）"""
+        self.apply_after_id = None
+        if self.volume_level == self.applied_level:
+            return
+        self.applied_level = self.volume_level
+        metrics.incr("volume.backend_calls")
+        with metrics.timed(f"volume.{self.backend.name}"):
+            self.backend.set_volume(self.volume_level / 100.0)
 
     def toggle_volume_slider(self, button=None):
         """显示或隐藏音量条，固定在界面右上角"""
@@ -59,26 +89,20 @@ class VolumeControl:
 
     def set_volume_from_click(self, event):
         """根据点击位置设置音量"""
-        slider_height = 120
         # 计算音量百分比
-        click_y = event.y
-        self.volume_level = max(0, min(int((1 - click_y / slider_height) * 100), 100))
+        volume_level = max(0, min(int((1 - event.y / SLIDER_HEIGHT) * 100), 100))
+        if volume_level == self.volume_level:
+            return
+        self.volume_level = volume_level
         self.update_volume_display()
-        
-        # 更新系统音量
-        self.set_system_volume(self.volume_level / 100.0)
+        self.schedule_apply()
 
     def update_volume_display(self):
-        """更新音量条和标签显示"""
+        """更新音量条和标签显示（移动已有的图形项，不重新创建）"""
         self.volume_label.config(text=f"{self.volume_level}%")
-        self.volume_canvas.delete("slider")  # 删除之前的滑块图形
-
-        # 计算滑块的位置并绘制
-        slider_height = 120
-        slider_position = slider_height * (1 - self.volume_level / 100)
-        self.volume_canvas.create_line(5, 0, 5, slider_height, fill="gray", width=2, tags="slider")  # 背景条
-        self.volume_canvas.create_line(5, slider_position, 5, slider_height, fill="green", width=2, tags="slider")  # 音量进度条
-        self.volume_canvas.create_oval(0, slider_position - 5, 10, slider_position + 5, fill="green", outline="green", tags="slider")  # 滑块圆形
+        slider_position = SLIDER_HEIGHT * (1 - self.volume_level / 100)
+        self.volume_canvas.coords(self.level_line, 5, slider_position, 5, SLIDER_HEIGHT)
+        self.volume_canvas.coords(self.knob, 0, slider_position - 5, 10, slider_position + 5)
 
     def get_volume(self):
         """返回当前音量级别"""
@@ -88,6 +112,4 @@ class VolumeControl:
         """通过代码设置音量（而非手动滑动）"""
         self.volume_level = volume
         self.update_volume_display()
-        
-        # 更新系统音量
-        self.set_system_volume(volume / 100.0)
+        self.schedule_apply()
@@ -0,0 +1,47 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """记录启动各阶段的耗时（相对进程开始计时），用于 --startup-profile"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.phases = []  # (名称, 开始偏移秒, 耗时秒, 线程名)
+        self.lock = threading.Lock()
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name):
+        """记录 with 块内代码的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def record(self, name, start, end):
+        with self.lock:
+            self.phases.append((name, start - self.origin, end - start, threading.current_thread().name))
+
+    def mark(self, name):
+        """记录一个时间点（耗时为 0），例如首帧绘制完成"""
+        now = time.perf_counter()
+        self.record(name, now, now)
+
+    def elapsed(self):
+        return time.perf_counter() - self.origin
+
+    def report(self):
+        """打印各阶段耗时（只打印一次）"""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        with self.lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+        print("Startup profile (ms):")
+        print(f"  {'phase':<28}{'start':>9}{'duration':>10}  thread")
+        for name, start, duration, thread_name in phases:
+            print(f"  {name:<28}{start * 1000:>9.1f}{duration * 1000:>10.1f}  {thread_name}")
@@ -0,0 +1,206 @@
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from .media_probe import iter_flac_blocks, scan_id3v2_frames
+from .metrics import metrics
+
+# 没有标签或无法读取时的结果：(标题, 艺术家, 专辑, 音轨号)
+EMPTY_TAGS = ("", "", "", 0)
+# 并行读取标签的线程数：主要时间花在打开文件和读取文件头上，线程足够
+TAG_READER_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+# Vorbis 注释最多读取的字节数（后面通常是 base64 编码的封面图片）
+MAX_COMMENT_BYTES = 256 * 1024
+
+# ID3v2 帧 ID -> 字段（v2.2 的帧 ID 为 3 个字符）
+_ID3_FIELDS = {
+    "TIT2": "title", "TT2": "title",
+    "TPE1": "artist", "TP1": "artist",
+    "TPE2": "album_artist", "TP2": "album_artist",
+    "TALB": "album", "TAL": "album",
+    "TRCK": "track", "TRK": "track",
+}
+# Vorbis 注释中的键（不区分大小写）-> 字段
+_VORBIS_FIELDS = {
+    "TITLE": "title",
+    "ARTIST": "artist",
+    "ALBUMARTIST": "album_artist",
+    "ALBUM": "album",
+    "TRACKNUMBER": "track",
+}
+_ID3_ENCODINGS = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}
+
+
+def _decode_id3_text(data):
+    """ID3v2 文本帧：第一个字节为编码；v2.4 的多个值以 NUL 分隔，只取第一个"""
+    if not data:
+        return ""
+    encoding = _ID3_ENCODINGS.get(data[0], "latin-1")
+    text = data[1:].decode(encoding, "replace")
+    return text.split("\x00", 1)[0].strip()
+
+
+# 音轨号的上限（播放列表模型用 16 位无符号数保存）
+MAX_TRACK_NUMBER = 0xFFFF
+
+
+def _track_number(text):
+    """"3/12" -> 3，无法识别时为 0；只接受 ASCII 数字（"²" 之类 isdigit() 也认，int() 却会出错）"""
+    text = text.split("/", 1)[0].strip()
+    if not (text.isascii() and text.isdigit()):
+        return 0
+    return min(int(text), MAX_TRACK_NUMBER)
+
+
+def _clean(text):
+    """去掉控制字符（播放列表模型用 0x1F 分隔字段）"""
+    if text.isprintable():
+        return text
+    return "".join(ch for ch in text if ch >= " ")
+
+
+def _result(fields):
+    """把读到的字段整理成 (标题, 艺术家, 专辑, 音轨号)；没有艺术家时用专辑艺术家"""
+    return (_clean(fields.get("title", "")), _clean(fields.get("artist") or fields.get("album_artist", "")),
+            _clean(fields.get("album", "")), _track_number(fields.get("track", "")))
+
+
+def _read_id3v2(f, fields):
+    for frame_id, data in scan_id3v2_frames(f, _ID3_FIELDS):
+        key = _ID3_FIELDS[frame_id]
+        if key not in fields:
+            text = _decode_id3_text(data)
+            if text:
+                fields[key] = text
+
+
+def _read_id3v1(f, fields):
+    """文件末尾 128 字节的 ID3v1 标签，只补充 ID3v2 中没有的字段"""
+    f.seek(0, os.SEEK_END)
+    if f.tell() < 128:
+        return
+    f.seek(-128, os.SEEK_END)
+    tag = f.read(128)
+    if tag[:3] != b"TAG":
+        return
+    for key, start in (("title", 3), ("artist", 33), ("album", 63)):
+        text = tag[start:start + 30].split(b"\x00", 1)[0].decode("latin-1").strip()
+        if text and key not in fields:
+            fields[key] = text
+    if tag[125] == 0 and tag[126] and "track" not in fields:  # ID3v1.1 的音轨号
+        fields["track"] = str(tag[126])
+
+
+def _parse_vorbis_comments(data, fields):
+    """解析 Vorbis 注释（数据可能被截断，读到哪里算哪里）"""
+    try:
+        vendor_length = struct.unpack_from("<I", data)[0]
+        pos = 4 + vendor_length
+        count = struct.unpack_from("<I", data, pos)[0]
+        pos += 4
+        for _ in range(count):
+            length = struct.unpack_from("<I", data, pos)[0]
+            pos += 4
+            if pos + length > len(data):
+                return
+            comment = data[pos:pos + length].decode("utf-8", "replace")
+            pos += length
+            key, _, value = comment.partition("=")
+            key = _VORBIS_FIELDS.get(key.upper())
+            if key and key not in fields and value.strip():
+                fields[key] = value.strip()
+    except struct.error:
+        return
+
+
+def _read_flac(f, fields):
+    for block_type, length in iter_flac_blocks(f):
+        if block_type == 4:
+            _parse_vorbis_comments(f.read(min(length, MAX_COMMENT_BYTES)), fields)
+            return
+
+
+def _read_ogg(f, fields):
+    """拼出 Ogg 流的第二个包（Vorbis 的注释头或 OpusTags），只读到 MAX_COMMENT_BYTES 为止"""
+    f.seek(0)
+    packets = []
+    packet = bytearray()
+    read = 0
+    while len(packets) < 2 and read < MAX_COMMENT_BYTES:
+        header = f.read(27)
+        if len(header) < 27 or header[:4] != b"OggS":
+            break
+        lacing = f.read(header[26])
+        body = f.read(sum(lacing))
+        read += 27 + len(lacing) + len(body)
+        pos = 0
+        for size in lacing:
+            packet += body[pos:pos + size]
+            pos += size
+            if size < 255:  # 小于 255 的段结束一个包
+                packets.append(bytes(packet))
+                packet = bytearray()
+                if len(packets) == 2:
+                    break
+    comment = packets[1] if len(packets) == 2 else bytes(packet)  # 被截断时用已读到的部分
+    if comment[:7] == b"\x03vorbis":
+        _parse_vorbis_comments(comment[7:], fields)
+    elif comment[:8] == b"OpusTags":
+        _parse_vorbis_comments(comment[8:], fields)
+
+
+def _read_mp3(f, fields):
+    _read_id3v2(f, fields)
+    if not ("title" in fields and "artist" in fields and "album" in fields):
+        _read_id3v1(f, fields)
+
+
+_READERS = {
+    ".mp3": _read_mp3,
+    ".mp2": _read_mp3,
+    ".flac": _read_flac,
+    ".ogg": _read_ogg,
+    ".oga": _read_ogg,
+    ".opus": _read_ogg,
+}
+
+
+def read_tags(track_path):
+    """只读文件头（和 MP3 末尾的 ID3v1）取出 (标题, 艺术家, 专辑, 音轨号)，没有标签时为 EMPTY_TAGS"""
+    reader = _READERS.get(os.path.splitext(track_path)[1].lower())
+    if reader is None:
+        return EMPTY_TAGS
+    fields = {}
+    try:
+        with open(track_path, "rb") as f:
+            reader(f, fields)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"[ERROR] Failed to read tags of '{track_path}'. Exception: {e}")
+    return _result(fields)
+
+
+class TagReader:
+    """在线程池中批量读取标签；文件很少时直接在当前线程读取"""
+
+    def __init__(self, workers=TAG_READER_WORKERS):
+        self.workers = workers
+        self.executor = None
+
+    def read_many(self, track_paths):
+        """按顺序返回每个文件的 (标题, 艺术家, 专辑, 音轨号)"""
+        if not track_paths:
+            return []
+        with metrics.timed("tags.read_batch"):
+            if len(track_paths) < 4 or self.workers <= 1:
+                results = [read_tags(path) for path in track_paths]
+            else:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="TagReader")
+                results = list(self.executor.map(read_tags, track_paths))
+        metrics.incr("tags.read", len(track_paths))
+        return results
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
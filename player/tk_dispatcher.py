@@ -0,0 +1,72 @@
+import queue
+import threading
+import tkinter as tk
+
+# 唤醒主线程失败（例如主循环还没启动）后重试的间隔（秒）
+RETRY_INTERVAL = 0.05
+
+
+class TkDispatcher:
+    """把其他线程（例如 libVLC 回调线程）产生的事件转交给 Tk 主线程处理
+
+    post() 只往队列里放数据，从不阻塞调用方；一个中转线程负责触发虚拟事件
+    唤醒 Tk 主循环，主线程再一次性取出所有待处理事件。没有事件时不会有任何唤醒。
+    只有窗口销毁后中转线程才退出；其他唤醒失败（主循环尚未启动等）会保留事件并定时重试。
+    """
+
+    def __init__(self, root, handler, sequence="<<PlayerEvent>>"):
+        self.root = root
+        self.handler = handler  # 在主线程中调用：handler(*args)
+        self.sequence = sequence
+        self.incoming = queue.Queue()  # 其他线程 -> 中转线程
+        self.pending = queue.Queue()  # 中转线程 -> 主线程
+        self.destroyed = False
+        self.root.bind(sequence, self.on_wakeup, add="+")
+        self.root.bind("<Destroy>", self.on_destroy, add="+")
+        self.thread = threading.Thread(target=self._relay, name="TkDispatcher", daemon=True)
+        self.thread.start()
+
+    def post(self, *args):
+        """在任意线程中调用，把事件交给主线程（非阻塞）"""
+        self.incoming.put(args)
+
+    def close(self):
+        self.incoming.put(None)
+
+    def _relay(self):
+        wakeup_failed = False
+        while True:
+            try:
+                item = self.incoming.get(timeout=RETRY_INTERVAL if wakeup_failed else None)
+            except queue.Empty:
+                pass  # 没有新事件，只重试唤醒
+            else:
+                if item is None:
+                    return
+                self.pending.put(item)
+                # 已有唤醒尚未处理时不再重复触发
+                if self.pending.qsize() > 1 and not wakeup_failed:
+                    continue
+            if self.pending.empty():
+                wakeup_failed = False  # 主线程已经取走
+                continue
+            try:
+                self.root.event_generate(self.sequence, when="tail")
+                wakeup_failed = False
+            except (tk.TclError, RuntimeError) as e:
+                if self.destroyed or "destroyed" in str(e):
+                    return  # 窗口已销毁
+                wakeup_failed = True  # 例如 "main thread is not in main loop"：事件留在 pending 中，稍后重试
+
+    def on_destroy(self, event):
+        if event.widget is self.root:
+            self.destroyed = True
+
+    def on_wakeup(self, event=None):
+        """主线程：处理所有待处理事件"""
+        while True:
+            try:
+                args = self.pending.get_nowait()
+            except queue.Empty:
+                return
+            self.handler(*args)
@@ -0,0 +1,41 @@
+import os
+
+
+class Track:
+    """一首曲目的记录：曲库扫描、播放列表之间传递曲目时使用
+
+    使用 __slots__，没有每个实例的 __dict__；播放列表常驻内存的数据放在 TrackModel 的数组里，
+    只在需要时按行生成 Track。
+    """
+
+    __slots__ = ("id", "path", "name", "title", "artist", "album", "track_no")
+
+    def __init__(self, track_id, path, name, title="", artist="", album="", track_no=0):
+        self.id = track_id
+        self.path = path  # 绝对路径（从播放列表模型生成时为 None）
+        self.name = name  # 文件名
+        self.title = title or ""
+        self.artist = artist or ""
+        self.album = album or ""
+        self.track_no = track_no or 0
+
+    def __repr__(self):
+        return f"Track({self.id!r}, {self.display_name()!r})"
+
+    def display_name(self):
+        """列表中显示的名称：有标签时为 “艺术家 - 标题”，否则为文件名"""
+        return display_name(self.name, self.title, self.artist)
+
+    def search_fields(self):
+        """建立搜索索引的字段：标签、文件名（不含扩展名）以及所在的两级文件夹名"""
+        fields = [self.title, self.artist, self.album, os.path.splitext(self.name)[0]]
+        if self.path:
+            folder = os.path.dirname(self.path)
+            fields += [os.path.basename(folder), os.path.basename(os.path.dirname(folder))]
+        return fields
+
+
+def display_name(name, title, artist):
+    if title and artist:
+        return f"{artist} - {title}"
+    return title or name
@@ -0,0 +1,286 @@
+import bisect
+import tkinter as tk
+import tkinter.font as tkfont
+from array import array
+
+from .track import Track, display_name
+
+
+# 行数据中各字段的分隔符（ASCII 单元分隔符，不会出现在文件名和标签里）
+_FIELD_SEPARATOR = "\x1f"
+
+
+class TrackModel:
+    """紧凑的播放列表数据模型：曲目 ID、音轨号存在 array 中，每行的文件名和标签（标题、艺术家、专辑）
+    以分隔符连接后 UTF-8 编码，拼接在一块 bytearray 里
+
+    每行只占约 26 字节的数组空间加上文本本身，十万首曲目也只有几 MB；需要时由 track() 按行生成 Track。
+    标签更新时新内容追加到末尾并改写该行的起止偏移，旧内容累积到一半时再整体压缩。
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.ids = array("q")
+        self.track_nos = array("H")
+        self.text_data = bytearray()
+        self.starts = array("Q")  # 第 i 行的文本位于 text_data[starts[i]:ends[i]]
+        self.ends = array("Q")
+        self.garbage = 0  # text_data 中已被替换的旧内容字节数
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, track_id, name, title="", artist="", album="", track_no=0):
+        self.ids.append(track_id)
+        self.track_nos.append(min(track_no or 0, 0xFFFF))
+        self.starts.append(len(self.text_data))
+        self.text_data += _FIELD_SEPARATOR.join((name, title or "", artist or "", album or "")).encode("utf-8")
+        self.ends.append(len(self.text_data))
+
+    def extend(self, rows):
+        """批量追加 (track_id, name) 行"""
+        for track_id, name in rows:
+            self.append(track_id, name)
+
+    def extend_tracks(self, tracks):
+        """批量追加 Track（整批编码后一次拼接）"""
+        encoded = [_FIELD_SEPARATOR.join((track.name, track.title, track.artist, track.album)).encode("utf-8")
+                   for track in tracks]
+        self.ids.extend(track.id for track in tracks)
+        self.track_nos.extend(min(track.track_no, 0xFFFF) for track in tracks)
+        offset = len(self.text_data)
+        for data in encoded:
+            self.starts.append(offset)
+            offset += len(data)
+            self.ends.append(offset)
+        self.text_data += b"".join(encoded)
+
+    def track_id(self, index):
+        return self.ids[index]
+
+    def fields(self, index):
+        """第 index 行的 [文件名, 标题, 艺术家, 专辑]"""
+        return self.text_data[self.starts[index]:self.ends[index]].decode("utf-8").split(_FIELD_SEPARATOR)
+
+    def name(self, index):
+        """列表中显示的名称：有标签时为 “艺术家 - 标题”，否则为文件名"""
+        name, title, artist, _ = self.fields(index)
+        return display_name(name, title, artist)
+
+    def track(self, index):
+        """第 index 行的 Track（不含路径）"""
+        return Track(self.ids[index], None, *self.fields(index), self.track_nos[index])
+
+    def index_of(self, track_id):
+        """返回曲目 ID 所在行，不存在时返回 None"""
+        try:
+            return self.ids.index(track_id)
+        except ValueError:
+            return None
+
+    def update_tracks(self, tracks):
+        """更新已有行的标签（一次遍历 ID 数组），返回被更新的行号"""
+        changed = {track.id: track for track in tracks}
+        rows = []
+        for index, track_id in enumerate(self.ids):
+            track = changed.get(track_id)
+            if track is None:
+                continue
+            rows.append(index)
+            self.garbage += self.ends[index] - self.starts[index]
+            self.starts[index] = len(self.text_data)
+            self.text_data += _FIELD_SEPARATOR.join(
+                (track.name, track.title, track.artist, track.album)).encode("utf-8")
+            self.ends[index] = len(self.text_data)
+            self.track_nos[index] = min(track.track_no, 0xFFFF)
+        if self.garbage > len(self.text_data) // 2:
+            self.compact()
+        return rows
+
+    def compact(self):
+        """按行顺序重写 text_data，丢掉被替换的旧内容"""
+        data = bytearray()
+        for index in range(len(self.ids)):
+            start = len(data)
+            data += self.text_data[self.starts[index]:self.ends[index]]
+            self.starts[index] = start
+            self.ends[index] = len(data)
+        self.text_data = data
+        self.garbage = 0
+
+    def remove_ids(self, track_ids):
+        """删除指定 ID 的所有行（一次重建，O(n)），返回被删除行原来的行号（升序）"""
+        removed = set(track_ids)
+        removed_rows = []
+        old_ids, old_track_nos, old_data = self.ids, self.track_nos, self.text_data
+        old_starts, old_ends = self.starts, self.ends
+        self.clear()
+        for index, track_id in enumerate(old_ids):
+            if track_id in removed:
+                removed_rows.append(index)
+            else:
+                self.ids.append(track_id)
+                self.track_nos.append(old_track_nos[index])
+                self.starts.append(len(self.text_data))
+                self.text_data += old_data[old_starts[index]:old_ends[index]]
+                self.ends.append(len(self.text_data))
+        return removed_rows
+
+
+class VirtualListView(tk.Frame):
+    """只绘制可见行的虚拟列表：画布上复用固定数量的文本项，滚动到任意位置都是 O(1)"""
+
+    def __init__(self, parent, model, on_select=None, on_activate=None, on_context=None,
+                 bg="#34495E", fg="white", select_bg="#1ABC9C", font=("Helvetica", 12)):
+        super().__init__(parent, bg=bg)
+        self.model = model
+        self.on_select = on_select  # 单击选中时回调，参数为行号
+        self.on_activate = on_activate  # 双击时回调，参数为行号
+        self.on_context = on_context  # 右键单击时回调，参数为行号
+        self.fg = fg
+        self.font = tkfont.Font(font=font)
+        self.row_height = self.font.metrics("linespace") + 4
+
+        self.rows = None  # 只显示部分行时，显示位置 -> 模型行号（升序）；None 表示显示全部
+        self.top = 0  # 第一条可见行的显示位置
+        self.selected = None  # 高亮行在模型中的行号
+        self.selected_pos = None  # 高亮行的显示位置（过滤时可能不可见）
+        self.visible_rows = 0
+        self.text_items = []
+
+        self.canvas = tk.Canvas(self, bg=bg, highlightthickness=0)
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.highlight = self.canvas.create_rectangle(0, 0, 0, 0, fill=select_bg, outline="", state="hidden")
+
+        self.canvas.bind("<Configure>", self.on_resize)
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<Double-Button-1>", self.on_double_click)
+        self.canvas.bind("<Button-3>", self.on_right_click)
+        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-4>", lambda e: self.scroll_rows(-3))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll_rows(3))
+
+    def size(self):
+        """当前显示的行数"""
+        return len(self.rows) if self.rows is not None else len(self.model)
+
+    def model_index(self, pos):
+        return self.rows[pos] if self.rows is not None else pos
+
+    def set_rows(self, rows):
+        """只显示 rows 中按升序列出的模型行（可在之后继续追加更大的行号）；None 表示恢复显示全部"""
+        self.rows = rows
+        self.top = 0
+        self.selected_pos = None
+        self.refresh()
+
+    def locate_selection(self):
+        """计算选中行的显示位置（rows 为升序，二分查找，每次刷新都可以调用）"""
+        if self.selected is None:
+            self.selected_pos = None
+        elif self.rows is None:
+            self.selected_pos = self.selected
+        else:
+            pos = bisect.bisect_left(self.rows, self.selected)
+            self.selected_pos = pos if pos < len(self.rows) and self.rows[pos] == self.selected else None
+
+    def on_resize(self, event):
+        """窗口尺寸变化时调整文本项池的大小"""
+        needed = event.height // self.row_height + 1
+        while len(self.text_items) < needed:
+            item = self.canvas.create_text(4, 0, anchor="nw", fill=self.fg, font=self.font)
+            self.text_items.append(item)
+        self.visible_rows = needed
+        self.refresh()
+
+    def refresh(self):
+        """重新绘制可见行并同步滚动条（数据变化后调用）"""
+        total = self.size()
+        max_top = max(0, total - self.visible_rows + 1)
+        self.top = max(0, min(self.top, max_top))
+
+        for slot, item in enumerate(self.text_items):
+            index = self.top + slot
+            if slot < self.visible_rows and index < total:
+                self.canvas.coords(item, 4, slot * self.row_height + 2)
+                self.canvas.itemconfigure(item, text=self.model.name(self.model_index(index)), state="normal")
+            else:
+                self.canvas.itemconfigure(item, state="hidden")
+
+        if self.selected_pos is None or self.rows is None:
+            self.locate_selection()
+        pos = self.selected_pos
+        if pos is not None and self.top <= pos < self.top + self.visible_rows:
+            y = (pos - self.top) * self.row_height
+            self.canvas.coords(self.highlight, 0, y, self.canvas.winfo_width(), y + self.row_height)
+            self.canvas.itemconfigure(self.highlight, state="normal")
+            self.canvas.tag_lower(self.highlight)
+        else:
+            self.canvas.itemconfigure(self.highlight, state="hidden")
+
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.visible_rows) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_to(self, index):
+        """把指定行滚动到顶部"""
+        self.top = int(index)
+        self.refresh()
+
+    def scroll_rows(self, count):
+        self.scroll_to(self.top + count)
+
+    def see(self, index):
+        """必要时滚动，使指定行可见"""
+        if index < self.top:
+            self.scroll_to(index)
+        elif index >= self.top + self.visible_rows - 1:
+            self.scroll_to(index - self.visible_rows + 2)
+
+    def yview(self, *args):
+        """滚动条命令：支持 moveto 和按行/按页滚动"""
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self.size())
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= max(1, self.visible_rows - 1)
+            self.scroll_rows(step)
+
+    def on_mouse_wheel(self, event):
+        self.scroll_rows(-3 if event.delta > 0 else 3)
+
+    def set_selection(self, index):
+        """高亮模型中的指定行（None 表示清除选中），必要时滚动使其可见"""
+        self.selected = index
+        self.locate_selection()
+        if self.selected_pos is not None:
+            self.see(self.selected_pos)
+        self.refresh()
+
+    def row_at(self, y):
+        """返回画布 y 坐标处的模型行号"""
+        pos = self.top + int(y) // self.row_height
+        return self.model_index(pos) if pos < self.size() else None
+
+    def on_click(self, event):
+        index = self.row_at(event.y)
+        if index is not None:
+            self.set_selection(index)
+            if self.on_select:
+                self.on_select(index)
+
+    def on_double_click(self, event):
+        index = self.row_at(event.y)
+        if index is not None and self.on_activate:
+            self.on_activate(index)
+
+    def on_right_click(self, event):
+        index = self.row_at(event.y)
+        if index is not None and self.on_context:
+            self.on_context(index)
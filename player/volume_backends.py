@@ -0,0 +1,73 @@
+import sys
+
+
+class NullVolumeBackend:
+    """不输出到任何地方的音量后端（测试或没有可用混音器时使用），只记录最后一次设置的值"""
+
+    name = "null"
+
+    def __init__(self):
+        self.level = None
+        self.calls = 0
+
+    def start(self):
+        pass
+
+    def set_volume(self, level):
+        self.level = level
+        self.calls += 1
+
+
+class VlcVolumeBackend:
+    """通过 libVLC 播放器音量控制（只影响本播放器，与曲目增益相乘）"""
+
+    name = "vlc"
+
+    def __init__(self, player):
+        self.player = player  # AudioPlayer
+
+    def start(self):
+        pass
+
+    def set_volume(self, level):
+        self.player.set_volume(level)
+
+
+class SystemVolumeBackend:
+    """通过 pycaw 控制 Windows 系统主音量；pycaw/comtypes 在 start() 中才导入"""
+
+    name = "system"
+
+    def __init__(self):
+        self.endpoint = None
+
+    def start(self):
+        if self.endpoint is not None:
+            return
+        from ctypes import cast, POINTER
+        from comtypes import CLSCTX_ALL
+        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+
+        devices = AudioUtilities.GetSpeakers()
+        interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+        self.endpoint = cast(interface, POINTER(IAudioEndpointVolume))
+
+    def set_volume(self, level):
+        """设置系统音量（范围从 0.0 到 1.0）"""
+        if self.endpoint is None:
+            self.start()
+        self.endpoint.SetMasterVolumeLevelScalar(level, None)
+
+
+VOLUME_BACKENDS = ("auto", "vlc", "system", "null")
+
+
+def create_volume_backend(name="auto", player=None):
+    """按名称创建音量后端；auto 在 Windows 上使用系统音量，其他平台使用 libVLC 音量"""
+    if name == "auto":
+        name = "system" if sys.platform == "win32" else "vlc"
+    if name == "system":
+        return SystemVolumeBackend()
+    if name == "vlc" and player is not None:
+        return VlcVolumeBackend(player)
+    return NullVolumeBackend()
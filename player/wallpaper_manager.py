@@ -1,8 +1,11 @@
 import os
-import json
 import tkinter as tk
 from tkinter import filedialog, Toplevel, Listbox, Button
-from PIL import Image, ImageTk
+from .image_cache import ImageDecoder
+from .settings_store import SettingsStore
+
+# 窗口尺寸变化后等待多久（毫秒）再重新缩放壁纸
+RESIZE_DEBOUNCE_MS = 150
 
 class WallpaperManager:
     def __init__(self, root, config_file="wallpaper_config.json", wallpaper_dir="resource/background"):
@@ -11,6 +14,11 @@ class WallpaperManager:
         self.wallpaper_dir = wallpaper_dir
         self.wallpaper_list = []
         self.current_index = 0
+        self.store = SettingsStore(config_file, root=root)  # 延迟写盘的配置存储
+        self.decoder = ImageDecoder(root)  # 后台解码 + 按路径和尺寸缓存的壁纸
+        self.shown_path = None  # 当前显示的壁纸
+        self.wanted_key = None  # 最近一次请求显示的 (路径, 尺寸)
+        self.resize_after_id = None
 
         # 确保背景标签存在
         if not hasattr(self.root, "background_label"):
@@ -18,27 +26,23 @@ class WallpaperManager:
             self.root.background_label.place(relwidth=1, relheight=1)
 
         self.load_config()
+        self.root.bind("<Configure>", self.on_configure, add="+")
 
     def load_config(self):
         """加载配置文件，初始化壁纸列表和当前索引"""
         if os.path.exists(self.config_file):
-            with open(self.config_file, "r") as f:
-                config = json.load(f)
-                self.wallpaper_list = config.get("wallpapers", [])
-                self.current_index = config.get("current_index", 0)
+            self.wallpaper_list = self.store.get("wallpapers", [])
+            self.current_index = self.store.get("current_index", 0)
         else:
             self.wallpaper_list = []
             self.current_index = 0
             self.save_config()
 
     def save_config(self):
-        """保存当前壁纸列表和索引到配置文件"""
-        config = {
-            "wallpapers": self.wallpaper_list,
-            "current_index": self.current_index
-        }
-        with open(self.config_file, "w") as f:
-            json.dump(config, f, indent=4)
+        """保存当前壁纸列表和索引到配置文件（延迟合并写盘）"""
+        self.store.data["wallpapers"] = self.wallpaper_list
+        self.store.data["current_index"] = self.current_index
+        self.store.mark_dirty()
 
     def add_wallpaper(self, wallpaper_path=None):
         """添加新的壁纸路径到列表并保存"""
@@ -112,10 +116,46 @@ class WallpaperManager:
         # 保存当前索引
         self.save_config()
 
+    def show_current(self):
+        """显示配置中记录的当前壁纸（后台解码，不阻塞启动）"""
+        if self.wallpaper_list:
+            self.current_index = min(self.current_index, len(self.wallpaper_list) - 1)
+            self.set_wallpaper(self.wallpaper_list[self.current_index])
+
+    def window_size(self):
+        return max(1, self.root.winfo_width()), max(1, self.root.winfo_height())
+
     def set_wallpaper(self, wallpaper_path):
-        """设置壁纸（实际应用于窗口背景）"""
-        image = Image.open(wallpaper_path)
-        bg_image = ImageTk.PhotoImage(image.resize((self.root.winfo_width(), self.root.winfo_height())))
+        """设置壁纸（实际应用于窗口背景）；缓存未命中时在后台解码，完成后再显示"""
+        size = self.window_size()
+        self.wanted_key = (wallpaper_path, size)
+        self.decoder.request(wallpaper_path, size, self.show_decoded)
+        self.prefetch_next(size)
+
+    def show_decoded(self, key, bg_image):
+        """解码完成（或缓存命中）后显示壁纸，过期的请求直接忽略"""
+        if key != self.wanted_key:
+            return
         self.root.background_label.config(image=bg_image)
         self.root.background_label.image = bg_image
-        print(f"Wallpaper changed to: {wallpaper_path}")
+        self.shown_path = key[0]
+        print(f"Wallpaper changed to: {key[0]}")
+
+    def prefetch_next(self, size):
+        """预先解码循环中的下一张壁纸，使下次切换直接命中缓存"""
+        if len(self.wallpaper_list) > 1:
+            next_path = self.wallpaper_list[(self.current_index + 1) % len(self.wallpaper_list)]
+            self.decoder.prefetch(next_path, size)
+
+    def on_configure(self, event):
+        """窗口尺寸变化时防抖，停止调整后再按新尺寸重新缩放"""
+        if event.widget is not self.root or not self.shown_path:
+            return
+        if self.resize_after_id:
+            self.root.after_cancel(self.resize_after_id)
+        self.resize_after_id = self.root.after(RESIZE_DEBOUNCE_MS, self.on_resize_settled)
+
+    def on_resize_settled(self):
+        self.resize_after_id = None
+        if self.wanted_key and self.wanted_key[1] != self.window_size():
+            self.set_wallpaper(self.shown_path)
@@ -0,0 +1,125 @@
+import tkinter as tk
+
+
+def format_time(seconds):
+    """秒数格式化为 m:ss"""
+    seconds = max(0, int(seconds))
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class WaveformSeekBar(tk.Canvas):
+    """波形进度条：整条包络是一个多边形，已播放部分用一个半透明矩形覆盖，加一条播放位置竖线
+
+    更新进度只需移动两个图形项（位置没有移动一个像素、时间标签没有变化时什么都不做），
+    因此可以按屏幕刷新率调用 set_position；点击或拖动后按横坐标直接换算成毫秒回调 on_seek。
+    拖动过程中每次移动还会回调 on_scrub（调用方负责合并这些跳转）。
+    """
+
+    def __init__(self, parent, on_seek=None, on_scrub=None, width=500, height=60, bg="#2C3E50",
+                 wave_color="#7F8C8D", played_color="#1ABC9C", cursor_color="white"):
+        super().__init__(parent, width=width, height=height, bg=bg, highlightthickness=0, cursor="hand2")
+        self.on_seek = on_seek  # 回调参数为目标位置（毫秒）
+        self.on_scrub = on_scrub  # 拖动中的目标位置（毫秒）
+        self.scrubbed_ms = None  # 本次拖动最后一次交给 on_scrub 的位置
+        self.peaks = None
+        self.duration_ms = 0
+        self.position_ms = 0
+        self.dragging = False
+        self.shown_x = None  # 上次绘制时播放位置竖线的横坐标
+        self.shown_text = None  # 上次显示的时间标签
+
+        # 没有包络时显示一条中线
+        self.wave = self.create_polygon(0, 0, 0, 0, fill=wave_color, outline=wave_color)
+        self.played = self.create_rectangle(0, 0, 0, 0, fill=played_color, outline="", stipple="gray50")
+        self.cursor_line = self.create_line(0, 0, 0, 0, fill=cursor_color)
+        self.time_label = self.create_text(0, 0, anchor="ne", fill=cursor_color, font=("Arial", 9))
+
+        self.bind("<Configure>", lambda e: self.redraw())
+        self.bind("<ButtonPress-1>", self.on_press)
+        self.bind("<B1-Motion>", self.on_drag)
+        self.bind("<ButtonRelease-1>", self.on_release)
+
+    def set_peaks(self, peaks):
+        """显示新的包络（None 表示还没有波形数据）"""
+        self.peaks = peaks
+        if peaks is not None and peaks.duration_ms:
+            self.duration_ms = peaks.duration_ms
+        self.redraw()
+
+    def set_duration(self, duration_ms):
+        """没有包络时用播放器报告的时长换算位置"""
+        if self.peaks is None or not self.peaks.duration_ms:
+            self.duration_ms = duration_ms
+            self.show_position()
+
+    def set_position(self, position_ms):
+        """更新播放位置（拖动过程中忽略播放器的进度）"""
+        if not self.dragging:
+            self.position_ms = position_ms
+            self.show_position()
+
+    def redraw(self):
+        """按当前尺寸重建包络多边形（只在尺寸或曲目变化时调用）"""
+        width, height = self.winfo_width(), self.winfo_height()
+        middle = height / 2
+        if self.peaks is None or width <= 1:
+            self.coords(self.wave, 0, middle, width, middle, width, middle + 1, 0, middle + 1)
+        else:
+            mins, maxs = self.peaks.resample(width)
+            scale = (height / 2 - 1) / 127
+            top = []
+            bottom = []
+            for x in range(len(maxs)):
+                top.extend((x, middle - max(maxs[x], 1) * scale))
+                bottom.extend((x, middle - min(mins[x], -1) * scale))
+            # 上沿从左到右，下沿从右到左，围成一个多边形
+            for i in range(len(bottom) - 2, -1, -2):
+                top.extend((bottom[i], bottom[i + 1]))
+            self.coords(self.wave, *top)
+        self.coords(self.time_label, width - 4, 2)
+        self.shown_x = None
+        self.show_position()
+
+    def show_position(self):
+        width, height = self.winfo_width(), self.winfo_height()
+        x = round(self.x_for(self.position_ms, width))
+        if x != self.shown_x:
+            self.shown_x = x
+            self.coords(self.played, 0, 0, x, height)
+            self.coords(self.cursor_line, x, 0, x, height)
+        text = f"{format_time(self.position_ms / 1000)} / {format_time(self.duration_ms / 1000)}" if self.duration_ms > 0 else ""
+        if text != self.shown_text:
+            self.shown_text = text
+            self.itemconfigure(self.time_label, text=text)
+
+    def x_for(self, position_ms, width):
+        if self.duration_ms <= 0:
+            return 0
+        return max(0, min(width, position_ms / self.duration_ms * width))
+
+    def ms_at(self, x):
+        """画布横坐标对应的播放位置（毫秒）"""
+        width = max(1, self.winfo_width())
+        return int(max(0, min(width, x)) / width * self.duration_ms)
+
+    def on_press(self, event):
+        self.dragging = True
+        self.scrubbed_ms = None
+        self.on_drag(event)
+
+    def on_drag(self, event):
+        position_ms = self.ms_at(event.x)
+        if position_ms == self.position_ms:
+            return
+        self.position_ms = position_ms
+        self.show_position()
+        if self.on_scrub and self.duration_ms > 0:
+            self.scrubbed_ms = position_ms
+            self.on_scrub(position_ms)
+
+    def on_release(self, event):
+        self.dragging = False
+        self.position_ms = self.ms_at(event.x)
+        self.show_position()
+        if self.on_seek and self.duration_ms > 0 and self.position_ms != self.scrubbed_ms:
+            self.on_seek(self.position_ms)  # 松开的位置已经在拖动中请求过时不再重复跳转
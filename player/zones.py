@@ -0,0 +1,397 @@
+import heapq
+import os
+import queue
+import threading
+import time
+from array import array
+
+from .audio_player import AudioPlayer, import_vlc
+from .log import get_logger
+from .lru_cache import LRUCache
+from .media_probe import MetadataCache
+from .metrics import metrics
+from .play_queue import PlayQueue
+from .seek_table import SeekTableCache
+from .track_list import TrackModel
+
+logger = get_logger(__name__)
+
+# 区域开始播放后等待多久再认领新出现的 libVLC 线程和内存增量（解码/输出线程由输入线程异步创建）
+ATTRIBUTION_DELAY = 0.15
+
+_TASK_DIR = "/proc/self/task"
+
+
+def _thread_ids():
+    """当前进程所有原生线程的 ID（只支持 Linux，其他平台返回 None）"""
+    try:
+        return {int(tid) for tid in os.listdir(_TASK_DIR)}
+    except OSError:
+        return None
+
+
+def _thread_cpu_seconds(tid):
+    """线程累计的用户态 + 内核态 CPU 时间（秒），线程已退出时返回 None"""
+    try:
+        with open(f"{_TASK_DIR}/{tid}/stat", "rb") as f:
+            fields = f.read().rsplit(b")", 1)[1].split()
+    except OSError:
+        return None
+    # 去掉 "pid (comm)" 之后，utime/stime 是第 12、13 个字段
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MediaCache:
+    """多个播放器共享的 libVLC Media 缓存：同一文件只创建、解析一次"""
+
+    def __init__(self, instance, max_items=256):
+        self.instance = instance
+        self.items = LRUCache(max_items)
+        self.lock = threading.Lock()
+
+    def media(self, track_path):
+        with self.lock:
+            media = self.items.get(track_path)
+            if media is None:
+                media = self.instance.media_new(track_path)
+                self.items.put(track_path, media)
+            return media
+
+
+class Zone:
+    """一个独立的播放区域：自己的播放器、播放列表、播放队列和音量"""
+
+    def __init__(self, name, player):
+        self.name = name
+        self.player = player
+        self.tracks = TrackModel()
+        self.paths = []  # 行号 -> 路径
+        self.gains = array("d")  # 行号 -> 响度增益（dB）
+        self.queue = PlayQueue(self.tracks)
+        self.volume = 1.0
+        self.state = "stopped"
+        self.next_path = None  # 已预加载的下一首（换播放列表后行号会指向别的歌，按路径判断）
+
+        # 资源占用统计：认领的 libVLC 线程及其最后一次读到的 CPU 时间
+        self.thread_cpu = {}
+        self.cpu_exited = 0.0  # 已退出线程的 CPU 时间
+        self.rss_delta = None  # 第一次开始播放时进程常驻内存的增量（估算）
+        self.last_sample = None  # (时间, CPU 秒)，用于计算 CPU 占用率
+
+
+class ZoneManager:
+    """多区域播放：所有区域共享一个 libVLC 实例、一个 Media 缓存和元数据缓存
+
+    每个区域只额外创建两个 media player。切换区域状态和调用播放器在同一把锁下串行执行，
+    创建 Media 在锁外进行，时长由播放器在后台线程读取，一个区域换歌不会卡住其他区域的命令；
+    libVLC 回调只把事件放进队列，由事件线程处理曲目结束后的自动切换。
+    每个区域的 CPU 和内存通过认领它开始播放后新出现的 libVLC 线程来估算（仅 Linux）；
+    多个区域同时开始播放时，无法区分的异步线程不计入任何区域，所以结果是下限估计。
+    """
+
+    def __init__(self, vlc_args=(), media_cache_size=256):
+        self.vlc_args = vlc_args
+        self.media_cache_size = media_cache_size
+        self.instance = None
+        self.media_cache = None
+        self.metadata_cache = MetadataCache()
+        self.seek_tables = SeekTableCache()
+        self.zones = {}
+        self.lock = threading.RLock()
+        self.events = queue.Queue()
+        self.timers = []  # 事件线程中的定时任务 (到期时间, 序号, 函数, 参数)
+        self.timer_seq = 0
+        self.event_thread = None
+        self.known_threads = set()  # 已认领或启动前就存在的线程
+        self.start_seq = 0  # 每次有区域开始播放时递增，用于判断延迟认领是否会混淆
+        self.shared_rss = None  # 创建共享 libVLC 实例带来的内存增量
+
+    def start(self):
+        """创建共享的 libVLC 实例和事件线程（重复调用无副作用）"""
+        with self.lock:
+            if self.instance is not None:
+                return
+            rss_before = _rss_bytes()
+            vlc = import_vlc()
+            with metrics.timed("zones.instance"):
+                self.instance = vlc.Instance(*self.vlc_args)
+            self.media_cache = MediaCache(self.instance, self.media_cache_size)
+            self.known_threads = _thread_ids() or set()
+            rss_after = _rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                self.shared_rss = rss_after - rss_before
+            self.event_thread = threading.Thread(target=self._event_loop, name="ZoneEvents", daemon=True)
+            self.event_thread.start()
+
+    def add_zone(self, name, audio_device=None):
+        """添加一个区域（可指定输出设备），返回 Zone"""
+        self.start()
+        with self.lock:
+            if name in self.zones:
+                raise ValueError(f"zone {name!r} already exists")
+            player = AudioPlayer(instance=self.instance, media_cache=self.media_cache,
+                                 metadata_cache=self.metadata_cache, audio_device=audio_device,
+                                 seek_tables=self.seek_tables)
+            player.start()
+            zone = Zone(name, player)
+            player.add_listener(lambda kind, value, zone=zone: self.events.put((zone, kind, value)))
+            self.zones[name] = zone
+            metrics.incr("zones.added")
+            return zone
+
+    def remove_zone(self, name):
+        with self.lock:
+            zone = self.zones.pop(name)
+            zone.player.stop()
+            zone.player.next_player.stop()
+            zone.state = "stopped"
+
+    def zone(self, name):
+        return self.zones[name]
+
+    def set_tracks(self, name, rows):
+        """设置区域的播放列表，rows 为 (track_id, path, name, gain_db)"""
+        with self.lock:
+            zone = self.zones[name]
+            zone.tracks.clear()
+            zone.queue.clear()
+            zone.paths = []
+            zone.gains = array("d")
+            for track_id, track_path, track_name, gain_db in rows:
+                zone.tracks.append(track_id, track_name)
+                zone.paths.append(track_path)
+                zone.gains.append(gain_db)
+
+    def play(self, name, index=None):
+        """播放指定行；不指定时继续暂停的曲目，或从播放队列取下一首"""
+        with self.lock:
+            zone = self.zones[name]
+            if index is None:
+                if zone.state == "paused":
+                    zone.player.resume()
+                    zone.state = "playing"
+                    return
+                index = zone.queue.next()
+                if index is None:
+                    return
+        self._play_index(zone, index)
+
+    def pause(self, name):
+        with self.lock:
+            zone = self.zones[name]
+            if zone.state == "playing":
+                zone.player.pause()
+                zone.state = "paused"
+
+    def next(self, name, auto=False):
+        with self.lock:
+            zone = self.zones[name]
+            next_index = zone.queue.peek_next(auto)
+            if next_index is None:
+                return
+            threads_before = _thread_ids()
+            if auto and zone.paths[next_index] == zone.next_path and zone.player.play_preloaded():
+                zone.queue.next(auto)
+                self._started(zone, threads_before, None)
+                self._preload_next(zone)
+                return
+            zone.queue.next(auto)
+        self._play_index(zone, next_index)
+
+    def previous(self, name):
+        with self.lock:
+            zone = self.zones[name]
+            index = zone.queue.previous()
+        if index is not None:
+            self._play_index(zone, index)
+
+    def set_volume(self, name, level):
+        """设置区域音量（0.0 到 1.0），与曲目增益相乘后作用于该区域的播放器"""
+        with self.lock:
+            zone = self.zones[name]
+            zone.volume = level
+            zone.player.set_volume(level)
+
+    def set_mode(self, name, mode):
+        with self.lock:
+            zone = self.zones[name]
+            zone.queue.set_mode(mode)
+            if zone.state != "stopped":
+                self._preload_next(zone)
+
+    def stop_all(self):
+        with self.lock:
+            for zone in self.zones.values():
+                zone.player.stop()
+                zone.state = "stopped"
+
+    def _play_index(self, zone, index):
+        """播放区域的某一行；调用时不能持有锁：Media 在锁外创建，锁内只切换状态和调用播放器"""
+        with self.lock:
+            zone.queue.play(index)
+            track_path = zone.paths[index]
+        media = self.media_cache.media(track_path)
+        with self.lock:
+            if (self.zones.get(zone.name) is not zone or zone.queue.current != index
+                    or zone.paths[index:index + 1] != [track_path]):
+                metrics.incr("zones.load_superseded")  # 期间区域被删除、换了播放列表或已切到别的曲目
+                return
+            threads_before = _thread_ids()
+            rss_before = _rss_bytes() if zone.rss_delta is None else None
+            zone.player.volume = zone.volume
+            zone.player.load(track_path, zone.gains[index], media=media)
+            zone.player.play()
+            zone.state = "playing"
+            self._started(zone, threads_before, rss_before)
+            self._preload_next(zone)
+
+    def _preload_next(self, zone):
+        next_index = zone.queue.peek_next(auto=True)
+        zone.next_path = None if next_index is None else zone.paths[next_index]
+        if next_index is not None:
+            zone.player.preload(zone.next_path, zone.gains[next_index])
+
+    def _started(self, zone, threads_before, rss_before):
+        """区域刚开始播放：立即认领 play() 期间同步创建的线程，稍后再认领异步创建的线程"""
+        threads_after = _thread_ids()
+        if threads_before is None or threads_after is None:
+            return
+        self._claim(zone, threads_after - threads_before)
+        self.start_seq += 1
+        self._schedule(ATTRIBUTION_DELAY, self._attribute, zone, threads_after, rss_before, self.start_seq)
+
+    def _attribute(self, zone, threads_after, rss_before, start_seq):
+        """延迟认领：只有期间没有其他区域开始播放时，新出现的线程和内存增量才能确定属于该区域"""
+        if start_seq != self.start_seq:
+            metrics.incr("zones.attribution_skipped")
+            return
+        threads_now = _thread_ids()
+        if threads_now is not None:
+            self._claim(zone, threads_now - threads_after)
+        if rss_before is not None and zone.rss_delta is None:
+            rss_now = _rss_bytes()
+            if rss_now is not None:
+                zone.rss_delta = max(0, rss_now - rss_before)
+
+    def _claim(self, zone, thread_ids):
+        for tid in thread_ids - self.known_threads:
+            zone.thread_cpu[tid] = _thread_cpu_seconds(tid) or 0.0
+            self.known_threads.add(tid)
+
+    def footprint(self):
+        """返回每个区域的资源占用估算：CPU 时间、最近一次采样以来的 CPU 占用率和内存"""
+        now = time.monotonic()
+        result = []
+        with self.lock:
+            zone_count = max(1, len(self.zones))
+            for zone in self.zones.values():
+                cpu = zone.cpu_exited
+                for tid, last in list(zone.thread_cpu.items()):
+                    seconds = _thread_cpu_seconds(tid)
+                    if seconds is None:
+                        # 线程已退出（例如换曲时的输入线程），保留最后读到的时间
+                        zone.cpu_exited += last
+                        cpu += last
+                        del zone.thread_cpu[tid]
+                        self.known_threads.discard(tid)
+                    else:
+                        zone.thread_cpu[tid] = seconds
+                        cpu += seconds
+                cpu_percent = None
+                if zone.last_sample is not None and now > zone.last_sample[0]:
+                    cpu_percent = (cpu - zone.last_sample[1]) / (now - zone.last_sample[0]) * 100
+                zone.last_sample = (now, cpu)
+                memory = None
+                if zone.rss_delta is not None:
+                    memory = zone.rss_delta + (self.shared_rss or 0) / zone_count
+                result.append({
+                    "zone": zone.name,
+                    "state": zone.state,
+                    "track": zone.player.current_track,
+                    "threads": len(zone.thread_cpu),
+                    "cpu_seconds": round(cpu, 3),
+                    "cpu_percent": None if cpu_percent is None else round(cpu_percent, 1),
+                    "memory_kb": None if memory is None else int(memory / 1024),
+                })
+        return result
+
+    def _schedule(self, delay, function, *args):
+        with self.lock:
+            self.timer_seq += 1
+            heapq.heappush(self.timers, (time.monotonic() + delay, self.timer_seq, function, args))
+        self.events.put(None)  # 唤醒事件线程重新计算等待时间
+
+    def _event_loop(self):
+        """事件线程：处理 libVLC 事件（曲目结束时自动切换）和定时任务"""
+        while True:
+            timeout = None
+            with self.lock:
+                while self.timers and self.timers[0][0] <= time.monotonic():
+                    _, _, function, args = heapq.heappop(self.timers)
+                    function(*args)
+                if self.timers:
+                    timeout = max(0.0, self.timers[0][0] - time.monotonic())
+            try:
+                item = self.events.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if item is None:
+                continue
+            zone, kind, value = item
+            if kind == "end" and zone.state == "playing" and zone.name in self.zones:
+                try:
+                    self.next(zone.name, auto=True)
+                except Exception as e:
+                    logger.error("Zone %s failed to advance: %s", zone.name, e)
+
+
+def run_zones(count, roots=(), interval=10.0, library_db="cache/library.db"):
+    """无界面演示：count 个区域各自随机播放曲库，定期打印每个区域的资源占用"""
+    from .library_index import LibraryIndex
+    from .loudness import track_gain_db
+
+    library = LibraryIndex(library_db)
+    for root_path in roots:
+        library.add_root(root_path)
+    library.rescan()
+    loudness = library.loudness_map()
+    rows = []
+    for batch in library.iter_tracks():
+        for track_id, track_path, name in batch:
+            gain = track_gain_db(*loudness[track_id]) if track_id in loudness else 0.0
+            rows.append((track_id, track_path, name, gain))
+    if not rows:
+        print("Library is empty; add folders with --library.")
+        return
+
+    manager = ZoneManager(vlc_args=("--no-video", "--quiet"))
+    for i in range(count):
+        name = f"zone{i + 1}"
+        manager.add_zone(name)
+        manager.set_tracks(name, rows)
+        manager.set_mode(name, 2)
+        manager.set_volume(name, 0.5)
+        manager.play(name)
+    print(f"{count} zones playing {len(rows)} tracks on one libVLC instance "
+          f"(shared instance ~{(manager.shared_rss or 0) // 1024} KB). Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(interval)
+            print(f"{'zone':<8}{'state':<9}{'threads':>8}{'cpu s':>9}{'cpu %':>8}{'mem KB':>10}  track")
+            for item in manager.footprint():
+                cpu_percent = "-" if item["cpu_percent"] is None else f"{item['cpu_percent']:.1f}"
+                memory = "-" if item["memory_kb"] is None else item["memory_kb"]
+                print(f"{item['zone']:<8}{item['state']:<9}{item['threads']:>8}{item['cpu_seconds']:>9.2f}"
+                      f"{cpu_percent:>8}{memory:>10}  {os.path.basename(item['track'] or '')}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop_all()
@@ -0,0 +1,102 @@
+"""测试用的小型音频文件构造函数（只有正确的文件头和帧结构，音频数据全为 0）"""
+import struct
+
+# MPEG1 Layer III 帧头中的码率序号（kbps -> 序号）和采样率序号
+MP3_BITRATE_INDEX = {32: 1, 40: 2, 48: 3, 56: 4, 64: 5, 80: 6, 96: 7, 112: 8, 128: 9, 160: 10, 192: 11,
+                     224: 12, 256: 13, 320: 14}
+MP3_SAMPLE_RATE_INDEX = {44100: 0, 48000: 1, 32000: 2}
+MP3_FRAME_SAMPLES = 1152
+
+
+def mp3_frame_length(kbps, sample_rate=44100):
+    return MP3_FRAME_SAMPLES // 8 * kbps * 1000 // sample_rate
+
+
+def mp3_frame(kbps, sample_rate=44100, xing=None):
+    """一个 MPEG1 Layer III 立体声帧（无填充）；xing 为 (帧数, 字节数) 时写入 Xing 头"""
+    header = bytes([0xFF, 0xFB, MP3_BITRATE_INDEX[kbps] << 4 | MP3_SAMPLE_RATE_INDEX[sample_rate] << 2, 0x00])
+    frame = bytearray(mp3_frame_length(kbps, sample_rate))
+    frame[:4] = header
+    if xing is not None:
+        frames, stream_bytes = xing
+        frame[36:52] = b"Xing" + struct.pack(">III", 0x03, frames, stream_bytes)
+    return bytes(frame)
+
+
+def mp3_stream(bitrates, sample_rate=44100, xing=False):
+    """按 bitrates 中的码率依次拼出音频帧；xing 为真时在前面加一个 Xing 头帧"""
+    frames = b"".join(mp3_frame(kbps, sample_rate) for kbps in bitrates)
+    if not xing:
+        return frames
+    info = mp3_frame(bitrates[0], sample_rate, xing=(len(bitrates), len(frames)))
+    return info + frames
+
+
+def synchsafe(size):
+    return bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+
+
+def id3v2_tag(frames, version=3):
+    """ID3v2.3/2.4 标签；frames 为 [(帧 ID, 帧内容)]"""
+    body = b""
+    for frame_id, data in frames:
+        size = synchsafe(len(data)) if version == 4 else struct.pack(">I", len(data))
+        body += frame_id.encode("latin-1") + size + b"\x00\x00" + data
+    return b"ID3" + bytes([version, 0, 0]) + synchsafe(len(body)) + body
+
+
+def id3_text(text, encoding=3):
+    """ID3v2 文本帧内容"""
+    codec = {0: "latin-1", 1: "utf-16", 3: "utf-8"}[encoding]
+    return bytes([encoding]) + text.encode(codec)
+
+
+def id3v1_tag(title="", artist="", album="", track=0):
+    def field(text):
+        return text.encode("latin-1")[:30].ljust(30, b"\x00")
+    return b"TAG" + field(title) + field(artist) + field(album) + b"2001" + bytes(28) + bytes([0, track, 0])
+
+
+def vorbis_comments(comments, vendor="test"):
+    data = struct.pack("<I", len(vendor)) + vendor.encode() + struct.pack("<I", len(comments))
+    for comment in comments:
+        comment = comment.encode("utf-8")
+        data += struct.pack("<I", len(comment)) + comment
+    return data
+
+
+def flac_file(comments=None, sample_rate=44100, total_samples=441000):
+    """STREAMINFO（可选 VORBIS_COMMENT）加一段空音频数据"""
+    info = bytearray(34)
+    info[10:18] = (sample_rate << 44 | 1 << 41 | 15 << 36 | total_samples).to_bytes(8, "big")
+    blocks = [(0, bytes(info))]
+    if comments is not None:
+        blocks.append((4, vorbis_comments(comments)))
+    data = b"fLaC"
+    for index, (block_type, block) in enumerate(blocks):
+        last = 0x80 if index == len(blocks) - 1 else 0
+        data += bytes([block_type | last]) + len(block).to_bytes(3, "big") + block
+    return data + bytes(1000)
+
+
+def ogg_page(packets, granule=0, serial=1, sequence=0):
+    """一页 Ogg，packets 中每个包都在本页结束"""
+    lacing = b""
+    for packet in packets:
+        lacing += b"\xff" * (len(packet) // 255) + bytes([len(packet) % 255])
+    header = b"OggS\x00\x00" + struct.pack("<qII", granule, serial, sequence) + b"\x00\x00\x00\x00"
+    return header + bytes([len(lacing)]) + lacing + b"".join(packets)
+
+
+def opus_file(comments, samples=48000 * 3, pre_skip=312):
+    head = b"OpusHead\x01\x02" + struct.pack("<HIhB", pre_skip, 44100, 0, 0)
+    tags = b"OpusTags" + vorbis_comments(comments)
+    return (ogg_page([head]) + ogg_page([tags], sequence=1)
+            + ogg_page([bytes(100)], granule=samples + pre_skip, sequence=2))
+
+
+def vorbis_file(comments, sample_rate=44100, samples=44100 * 2):
+    ident = b"\x01vorbis" + struct.pack("<IBI", 0, 2, sample_rate) + bytes(14)
+    comment = b"\x03vorbis" + vorbis_comments(comments) + b"\x01"
+    return (ogg_page([ident]) + ogg_page([comment, b"\x05vorbis"], sequence=1)
+            + ogg_page([bytes(100)], granule=samples, sequence=2))
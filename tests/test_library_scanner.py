@@ -0,0 +1,96 @@
+import os
+import queue
+import time
+
+from player.library_index import LibraryIndex
+from player.library_scanner import LibraryScanner
+
+
+def make_library(root, albums=3, tracks=4):
+    paths = []
+    for album in range(albums):
+        folder = os.path.join(root, f"album_{album}")
+        os.makedirs(folder)
+        for track in range(tracks):
+            path = os.path.join(folder, f"track_{track}.wav")
+            with open(path, "wb"):
+                pass
+            paths.append(path)
+        with open(os.path.join(folder, "cover.txt"), "w") as f:
+            f.write("not audio")
+    return paths
+
+
+def drain(scanner, timeout=10):
+    """取出扫描结果直到 done，返回 (各类条目, 统计)"""
+    items = {"added": [], "removed": [], "tagged": []}
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            kind, value = scanner.queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if kind == "done":
+            scanner.thread.join(timeout)
+            return items, value
+        items[kind].extend(value)
+    raise AssertionError("scanner did not finish")
+
+
+def test_first_scan_streams_every_audio_file(tmp_path):
+    paths = make_library(str(tmp_path / "music"))
+    scanner = LibraryScanner(str(tmp_path / "lib.db"), [str(tmp_path / "music")], batch_size=5)
+    scanner.start()
+    items, stats = drain(scanner)
+    assert len(items["added"]) == len(paths)
+    assert stats["added"] == len(paths)
+    assert scanner.finished
+
+
+def test_second_scan_replays_index_without_rescanning(tmp_path):
+    paths = make_library(str(tmp_path / "music"))
+    db_path = str(tmp_path / "lib.db")
+    first = LibraryScanner(db_path, [str(tmp_path / "music")])
+    first.start()
+    drain(first)
+
+    second = LibraryScanner(db_path)
+    second.start()
+    items, stats = drain(second)
+    assert len(items["added"]) == len(paths)  # 来自索引
+    assert stats["added"] == 0
+    assert stats["dirs_scanned"] == 0
+
+
+def test_deleted_file_is_reported_as_removed(tmp_path):
+    paths = make_library(str(tmp_path / "music"))
+    db_path = str(tmp_path / "lib.db")
+    scanner = LibraryScanner(db_path, [str(tmp_path / "music")])
+    scanner.start()
+    drain(scanner)
+
+    library = LibraryIndex(db_path)
+    track_id = library.get_id(paths[0])
+    library.close()
+    os.remove(paths[0])
+    folder = os.path.dirname(paths[0])
+    stat = os.stat(folder)
+    os.utime(folder, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))  # 保证目录修改时间变化
+
+    scanner = LibraryScanner(db_path)
+    scanner.start()
+    items, stats = drain(scanner)
+    assert items["removed"] == [track_id]
+    assert stats["removed"] == 1
+
+
+def test_stop_releases_a_blocked_scanner(tmp_path):
+    make_library(str(tmp_path / "music"), albums=4, tracks=10)
+    scanner = LibraryScanner(str(tmp_path / "lib.db"), [str(tmp_path / "music")], batch_size=1,
+                             max_pending_batches=1)
+    scanner.start()
+    time.sleep(0.2)  # 队列已满，工作线程阻塞在 put 上
+    assert not scanner.finished
+    scanner.stop()
+    scanner.thread.join(5)
+    assert scanner.finished
@@ -0,0 +1,102 @@
+import struct
+
+import pytest
+
+from audio_fixtures import (MP3_FRAME_SAMPLES, flac_file, id3v1_tag, id3v2_tag, id3_text, mp3_frame, mp3_stream,
+                            opus_file, synchsafe, vorbis_file)
+from player.media_probe import (MetadataCache, parse_mp3_frame_header, probe_media, read_id3v2_tag,
+                                scan_id3v2_frames)
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def wav_file(seconds, sample_rate=8000):
+    byte_rate = sample_rate * 2
+    fmt = struct.pack("<HHIIHH", 1, 1, sample_rate, byte_rate, 2, 16)
+    data = bytes(int(seconds * byte_rate))
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", len(data)) + data
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def test_parse_mp3_frame_header():
+    frame_length, samples, rate, kbps, version, mono = parse_mp3_frame_header(mp3_frame(128))
+    assert (frame_length, samples, rate, kbps, version, mono) == (417, MP3_FRAME_SAMPLES, 44100, 128, 1, False)
+    assert parse_mp3_frame_header(b"\xff\xfb") is None
+    assert parse_mp3_frame_header(b"\xff\xfb\xf0\x00") is None  # 码率序号 15 无效
+    assert parse_mp3_frame_header(b"\xff\xfb\x9c\x00") is None  # 采样率序号 3 无效
+
+
+def test_cbr_mp3_duration_ignores_id3_tags(tmp_path):
+    tag = id3v2_tag([("TIT2", id3_text("x"))])
+    data = tag + mp3_stream([128] * 100) + id3v1_tag("x")
+    info = probe_media(write(tmp_path, "a.mp3", data))
+    assert info["bitrate"] == 128 and info["sample_rate"] == 44100
+    assert info["duration"] == pytest.approx(100 * 417 * 8 / 128000, abs=0.01)
+
+
+def test_vbr_mp3_uses_xing_frame_count(tmp_path):
+    bitrates = [320, 32] * 50
+    info = probe_media(write(tmp_path, "a.mp3", mp3_stream(bitrates, xing=True)))
+    assert info["duration"] == pytest.approx(len(bitrates) * MP3_FRAME_SAMPLES / 44100, abs=0.01)
+
+
+def test_vbr_mp3_without_header_is_scanned(tmp_path):
+    bitrates = [320] * 20 + [32] * 60  # 码率在前 32 帧内就有变化
+    info = probe_media(write(tmp_path, "a.mp3", mp3_stream(bitrates)))
+    assert info["duration"] == pytest.approx(len(bitrates) * MP3_FRAME_SAMPLES / 44100, abs=0.01)
+
+
+def test_wav_flac_and_ogg(tmp_path):
+    assert probe_media(write(tmp_path, "a.wav", wav_file(1.5)))["duration"] == pytest.approx(1.5)
+    assert probe_media(write(tmp_path, "a.flac", flac_file()))["duration"] == pytest.approx(10.0)
+    assert probe_media(write(tmp_path, "a.opus", opus_file([])))["duration"] == pytest.approx(3.0)
+    info = probe_media(write(tmp_path, "a.ogg", vorbis_file([])))
+    assert info["duration"] == pytest.approx(2.0) and info["sample_rate"] == 44100
+
+
+@pytest.mark.parametrize("name, data", [
+    ("empty.mp3", b""),
+    ("empty.flac", b""),
+    ("noise.mp3", b"\x00" * 4096),
+    ("huge_tag.mp3", b"ID3\x03\x00\x00" + synchsafe(0x0FFFFFFF) + bytes(20)),  # 标签长度远超文件
+    ("page.ogg", b"OggS\x00\x02"),
+    ("ident.opus", opus_file([])[:40]),  # 只有第一页的一部分
+    ("streaminfo.flac", flac_file()[:20]),
+    ("riff.wav", b"RIFF\x00\x00\x00\x00WAVE"),
+    ("fmt.wav", wav_file(1)[:24]),  # fmt 块被截断
+    ("data.wav", b"RIFF\x00\x00\x00\x00WAVEdata\x10\x00\x00\x00"),  # data 块在 fmt 之前
+    ("unknown.xyz", b"whatever"),
+])
+def test_truncated_or_malformed_headers(tmp_path, name, data):
+    assert probe_media(write(tmp_path, name, data)) is None
+
+
+def test_missing_file(tmp_path):
+    assert probe_media(str(tmp_path / "missing.mp3")) is None
+
+
+def test_id3v2_frames_and_truncated_tags(tmp_path):
+    tag = id3v2_tag([("TIT2", id3_text("Title")), ("APIC", bytes(5000)), ("TALB", id3_text("Album"))])
+    with open(write(tmp_path, "a.mp3", tag), "rb") as f:
+        assert dict(scan_id3v2_frames(f, {"TALB"})) == {"TALB": id3_text("Album")}
+        version, body = read_id3v2_tag(f)
+        assert version == 3 and len(body) == len(tag) - 10
+    with open(write(tmp_path, "b.mp3", tag[:30]), "rb") as f:
+        assert [frame_id for frame_id, _ in scan_id3v2_frames(f, {"TIT2", "TALB"})] == ["TIT2"]
+    with open(write(tmp_path, "c.mp3", b"ID3\x05\x00\x00" + synchsafe(10) + bytes(10)), "rb") as f:
+        assert read_id3v2_tag(f) is None  # 未知版本
+        assert list(scan_id3v2_frames(f, {"TIT2"})) == []
+
+
+def test_metadata_cache_invalidates_on_change(tmp_path):
+    path = write(tmp_path, "a.wav", wav_file(1))
+    cache = MetadataCache(str(tmp_path / "metadata.json"))
+    assert cache.lookup(path)["duration"] == pytest.approx(1.0)
+    write(tmp_path, "a.wav", wav_file(2))
+    assert cache.lookup(path)["duration"] == pytest.approx(2.0)
+    cache.flush()
+    assert MetadataCache(str(tmp_path / "metadata.json")).get(path)["duration"] == pytest.approx(2.0)
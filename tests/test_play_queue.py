@@ -0,0 +1,93 @@
+import random
+
+from player.play_queue import MODE_LOOP, MODE_REPEAT_ONE, MODE_SHUFFLE, PlayQueue
+
+
+def make_queue(size, mode=MODE_LOOP, seed=1):
+    return PlayQueue(list(range(size)), mode=mode, rng=random.Random(seed))
+
+
+def test_loop_wraps_and_repeat_one_only_on_auto():
+    queue = make_queue(3)
+    assert [queue.next() for _ in range(4)] == [0, 1, 2, 0]
+    queue.set_mode(MODE_REPEAT_ONE)
+    assert queue.next(auto=True) == 0
+    assert queue.next() == 1
+
+
+def test_empty_model_has_no_next():
+    queue = make_queue(0)
+    assert queue.peek_next() is None
+    assert queue.next() is None
+
+
+def test_peek_does_not_advance():
+    queue = make_queue(5, MODE_SHUFFLE)
+    row = queue.peek_next()
+    assert queue.peek_next() == row
+    assert queue.next() == row
+
+
+def test_shuffle_round_has_no_repeats():
+    queue = make_queue(50, MODE_SHUFFLE)
+    rows = [queue.next() for _ in range(50)]
+    assert sorted(rows) == list(range(50))
+    # 新一轮的第一首不会紧接着重复上一轮的最后一首
+    assert queue.next() != rows[-1]
+
+
+def test_single_track_shuffle_repeats_it():
+    queue = make_queue(1, MODE_SHUFFLE)
+    assert [queue.next() for _ in range(3)] == [0, 0, 0]
+
+
+def test_up_next_equal_to_pending_shuffle_pick_is_not_replayed():
+    queue = make_queue(20, MODE_SHUFFLE)
+    queue.next()
+    pick = queue.peek_next()  # 预加载时已经抽出
+    queue.enqueue(pick)
+    assert queue.next() == pick
+    assert queue.pending is None
+    assert queue.next() != pick
+
+
+def test_forward_history_equal_to_pending_shuffle_pick_is_not_replayed():
+    queue = make_queue(20, MODE_SHUFFLE)
+    first = queue.next()
+    second = queue.next()
+    queue.previous()
+    assert queue.current == first
+    queue.play(queue.current)  # 同一行，不清空前进历史
+    queue.pending = second  # 前进历史的下一首恰好是已抽出的那首
+    assert queue.next() == second
+    assert queue.pending is None
+    assert queue.next() != second
+
+
+def test_previous_and_forward_history():
+    queue = make_queue(5)
+    queue.play(3)
+    queue.play(1)
+    assert queue.previous() == 3
+    assert queue.next() == 1  # 前进历史优先
+    assert queue.next() == 2
+
+
+def test_up_next_comes_before_mode_order():
+    queue = make_queue(5)
+    queue.play(0)
+    queue.enqueue(4)
+    queue.enqueue(2)
+    assert [queue.next(), queue.next(), queue.next()] == [4, 2, 3]
+
+
+def test_rows_removed_remaps_rows():
+    queue = make_queue(10)
+    queue.play(2)
+    queue.play(5)
+    queue.play(8)
+    queue.enqueue(9)
+    queue.rows_removed([1, 5])
+    assert queue.current == 6
+    assert list(queue.back) == [1]  # 2 -> 1，5 被删除
+    assert list(queue.up_next) == [7]
@@ -0,0 +1,78 @@
+import pytest
+
+from player.playback_clock import SLEW_SECONDS, SNAP_THRESHOLD, PlaybackClock
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_clock(position=0.0):
+    now = FakeTime()
+    clock = PlaybackClock(clock=now)
+    clock.reset(position, running=True)
+    return clock, now
+
+
+def test_interpolates_between_samples():
+    clock, now = make_clock(10.0)
+    now.now += 0.25
+    assert clock.position() == pytest.approx(10.25)
+    clock.set_rate(2.0)
+    now.now += 0.5
+    assert clock.position() == pytest.approx(11.25)
+
+
+def test_small_drift_is_slewed_in():
+    clock, now = make_clock(10.0)
+    now.now += 1.0
+    clock.sample(11.2)  # 插值为 11.0，落后 0.2 秒
+    assert clock.position() == pytest.approx(11.0)  # 不会跳变
+    now.now += SLEW_SECONDS
+    assert clock.position() == pytest.approx(11.2 + SLEW_SECONDS)
+    now.now += 1.0
+    assert clock.position() == pytest.approx(12.2 + SLEW_SECONDS)  # 追平后按原速率走
+
+
+def test_clock_running_ahead_never_goes_backwards():
+    clock, now = make_clock(10.0)
+    now.now += 1.0
+    clock.sample(10.2)  # 插值为 11.0，超前 0.8 秒
+    positions = []
+    for _ in range(10):
+        now.now += SLEW_SECONDS / 10
+        positions.append(clock.position())
+    assert positions == sorted(positions)
+    assert positions[0] >= 11.0
+
+
+def test_large_drift_snaps():
+    clock, now = make_clock(10.0)
+    now.now += 1.0
+    clock.sample(11.0 + SNAP_THRESHOLD + 5)
+    assert clock.position() == pytest.approx(17.0)
+
+
+def test_pause_freezes_and_resume_continues():
+    clock, now = make_clock(3.0)
+    now.now += 2.0
+    clock.pause()
+    now.now += 10.0
+    assert clock.position() == pytest.approx(5.0)
+    clock.sample(5.5)  # 暂停时报告的位置直接采用
+    assert clock.position() == pytest.approx(5.5)
+    clock.resume()
+    now.now += 1.0
+    assert clock.position() == pytest.approx(6.5)
+
+
+def test_time_going_backwards_holds_position():
+    clock, now = make_clock(4.0)
+    now.now -= 1.0
+    assert clock.position() == 4.0
+    clock.reset(-3.0)
+    assert clock.position() == 0.0
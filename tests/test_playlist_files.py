@@ -0,0 +1,138 @@
+import os
+import queue
+import time
+from array import array
+
+import pytest
+
+from player.library_scanner import LibraryScanner, PlaylistImporter
+from player.playlist_files import (candidate_paths, iter_native, iter_playlist_locations, location_to_path,
+                                   primary_path, write_native, write_playlist)
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_m3u_skips_comments_blank_lines_and_bom(tmp_path):
+    path = tmp_path / "list.m3u8"
+    text = "\ufeff#EXTM3U\r\n#EXTINF:12,Song\r\nmusic/a.mp3\r\n\r\n  /abs/b.flac  \r\n#c\n"
+    path.write_bytes(text.encode("utf-8"))
+    assert list(iter_playlist_locations(str(path))) == ["music/a.mp3", "/abs/b.flac"]
+
+
+def test_m3u_keeps_non_utf8_bytes(tmp_path):
+    path = tmp_path / "list.m3u"
+    path.write_bytes(b"caf\xe9.mp3\n")
+    location, = iter_playlist_locations(str(path))
+    assert os.fsencode(location) == b"caf\xe9.mp3"
+
+
+def test_pls_reads_file_entries_in_order(tmp_path):
+    path = tmp_path / "list.pls"
+    path.write_text("[playlist]\nFile1=a.mp3\nTitle1=A\nfile2 = ignored\nFILE3=c.ogg\nFile4=\nFileX=x.mp3\n"
+                    "NumberOfEntries=3\n")
+    assert list(iter_playlist_locations(str(path))) == ["a.mp3", "c.ogg"]
+
+
+def test_write_m3u_and_pls_round_trip(tmp_path):
+    inside = str(tmp_path / "music" / "a.mp3")
+    outside = os.path.abspath(os.sep + os.path.join("elsewhere", "b.mp3"))
+    entries = [(inside, "Song A"), (outside, "Song B")]
+    for name in ("list.m3u", "list.pls"):
+        path = str(tmp_path / name)
+        assert write_playlist(path, iter(entries)) == 2
+        locations = list(iter_playlist_locations(path))
+        assert locations == [os.path.join("music", "a.mp3"), outside]  # 播放列表目录下写相对路径
+        base_dir = str(tmp_path)
+        assert [primary_path(location, base_dir) for location in locations] == [inside, outside]
+    assert read_lines(str(tmp_path / "list.m3u"))[:2] == ["#EXTM3U", "#EXTINF:-1,Song A"]
+    pls = read_lines(str(tmp_path / "list.pls"))
+    assert pls[0] == "[playlist]" and pls[-2:] == ["NumberOfEntries=2", "Version=2"]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_failed_write_keeps_old_playlist(tmp_path):
+    path = str(tmp_path / "list.m3u")
+    write_playlist(path, [("/a.mp3", "A")])
+
+    def entries():
+        yield "/b.mp3", "B"
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        write_playlist(path, entries())
+    assert list(iter_playlist_locations(path)) == ["/a.mp3"]
+    assert os.listdir(tmp_path) == ["list.m3u"]
+
+
+def test_locations_and_candidates():
+    assert location_to_path("file:///music/a%20b.mp3") == "/music/a b.mp3"
+    assert location_to_path("http://radio.example/stream") is None
+    assert primary_path("http://radio.example/stream", "/lists") is None
+    assert primary_path("../music/./a.mp3", "/lists/mine") == os.path.normpath("/lists/music/a.mp3")
+    assert candidate_paths("http://radio.example/stream", "/lists") == []
+    if os.sep == "/":
+        assert candidate_paths("sub\\a.mp3", "/lists", ["/music"]) == [
+            "/lists/sub\\a.mp3", "/music/sub\\a.mp3", "/lists/sub/a.mp3", "/music/sub/a.mp3"]
+
+
+def test_native_round_trip_in_chunks(tmp_path):
+    path = str(tmp_path / "list.mpl")
+    ids = array("q", [5, -1, 2 ** 40, 7, 9])
+    assert write_native(path, ids) == 5
+    chunks = list(iter_native(path, chunk_entries=2))
+    assert [list(chunk) for chunk in chunks] == [[5, -1], [2 ** 40, 7], [9]]
+
+
+def test_truncated_or_foreign_native_file(tmp_path):
+    path = str(tmp_path / "list.mpl")
+    write_native(path, range(10))
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:-12])  # 最后一个完整 ID 之后还有半个
+    assert [track_id for chunk in iter_native(path) for track_id in chunk] == list(range(8))
+    for broken in (data[:6], b"XXXX" + data[4:]):
+        with open(path, "wb") as f:
+            f.write(broken)
+        with pytest.raises(ValueError):
+            list(iter_native(path))
+
+
+def drain(scanner, timeout=10):
+    added = []
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            kind, value = scanner.queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if kind == "done":
+            return added, value
+        if kind == "added":
+            added.extend(value)
+    raise AssertionError("import did not finish")
+
+
+def test_import_resolves_relative_paths_and_counts_misses(tmp_path):
+    music = tmp_path / "music"
+    music.mkdir()
+    for name in ("a.wav", "b.wav"):
+        (music / name).write_bytes(b"")
+    db_path = str(tmp_path / "lib.db")
+    scanner = LibraryScanner(db_path, [str(music)])
+    scanner.start()
+    drain(scanner)
+
+    (music / "new.wav").write_bytes(b"")  # 存在但还没有索引
+    playlist = tmp_path / "lists" / "mix.m3u"
+    playlist.parent.mkdir()
+    playlist.write_text("#EXTM3U\n../music/b.wav\nhttp://radio.example/stream\nmissing.wav\n"
+                        f"{music / 'a.wav'}\n../music/new.wav\n")
+    importer = PlaylistImporter(db_path, str(playlist), batch_size=2)
+    importer.start()
+    tracks, stats = drain(importer)
+    assert [os.path.basename(track.path) for track in tracks] == ["b.wav", "a.wav", "new.wav"]
+    assert stats == {"entries": 5, "added": 1, "missing": 1, "skipped": 1}
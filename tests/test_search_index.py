@@ -0,0 +1,76 @@
+from player import search_index
+from player.search_index import SearchIndex, tokenize
+
+
+def matching(index, query, ids):
+    result = index.search(query)
+    return [track_id for track_id in ids if track_id in result]
+
+
+def make_index():
+    index = SearchIndex()
+    index.add(1, "Blue in Green", "Miles Davis", "Kind of Blue")
+    index.add(2, "So What", "Miles Davis", "Kind of Blue")
+    index.add(3, "Blue Train", "John Coltrane", "Blue Train")
+    index.add(4, "Giant Steps", "John Coltrane", "")
+    return index
+
+
+def test_tokenize_lowercases_and_splits():
+    assert tokenize("Kind-of BLUE (1959)") == ["kind", "of", "blue", "1959"]
+    assert tokenize("  ") == []
+
+
+def test_empty_query_means_no_filter():
+    assert make_index().search(" ") is None
+
+
+def test_prefix_terms_intersect():
+    index = make_index()
+    ids = [1, 2, 3, 4]
+    assert matching(index, "blu", ids) == [1, 2, 3]
+    assert matching(index, "blue mil", ids) == [1, 2]
+    assert matching(index, "COLTRANE gi", ids) == [4]
+    assert matching(index, "nothing", ids) == []
+
+
+def test_readd_and_remove_update_postings():
+    index = make_index()
+    index.add(3, "Moment's Notice", "John Coltrane")  # 重新索引
+    assert matching(index, "blue", [1, 2, 3, 4]) == [1, 2]
+    index.remove(1)
+    index.remove(99)  # 不存在的 ID
+    assert matching(index, "blue", [1, 2, 3, 4]) == [2]
+    assert len(index) == 3
+
+
+def test_cached_short_prefix_sees_later_changes():
+    index = make_index()
+    assert matching(index, "g", [1, 2, 3, 4, 5]) == [1, 4]
+    index.add(5, "Goodbye Pork Pie Hat")
+    assert matching(index, "g", [1, 2, 3, 4, 5]) == [1, 4, 5]
+    index.remove(4)
+    assert matching(index, "g", [1, 2, 3, 4, 5]) == [1, 5]
+
+
+def test_pending_tokens_merge_and_drop_empty_words(monkeypatch):
+    monkeypatch.setattr(search_index, "_PENDING_MERGE_SIZE", 3)
+    index = SearchIndex()
+    index.add(1, "alpha beta")
+    index.remove(1)
+    index.add(2, "gamma delta epsilon")  # 触发合并，alpha、beta 已无曲目
+    assert index.pending_tokens == []
+    assert "alpha" not in index.sorted_tokens
+    assert matching(index, "del", [1, 2]) == [2]
+    index.add(3, "alphabet")
+    assert matching(index, "alpha", [1, 2, 3]) == [3]
+
+
+def test_unselective_terms_are_checked_per_track():
+    index = SearchIndex()
+    index.max_candidates = 2
+    for track_id in range(10):
+        index.add(track_id, "common", f"song{track_id}")
+    result = index.search("common")
+    assert result.candidates is None
+    assert [track_id for track_id in range(12) if track_id in result] == list(range(10))
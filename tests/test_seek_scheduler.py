@@ -0,0 +1,71 @@
+import threading
+import time
+
+from player.seek_scheduler import SeekScheduler
+
+
+def wait_idle(scheduler, timeout=2):
+    deadline = time.monotonic() + timeout
+    while scheduler.busy():
+        assert time.monotonic() < deadline, "seek scheduler did not go idle"
+        time.sleep(0.005)
+
+
+def test_requests_during_a_seek_coalesce_to_the_latest():
+    seeks = []
+    release = threading.Event()
+
+    def seek(position):
+        seeks.append(position)
+        release.wait(2)
+
+    scheduler = SeekScheduler(seek, min_interval=0)
+    scheduler.request(1)
+    time.sleep(0.05)  # 第一个跳转正在执行
+    for position in range(2, 20):
+        scheduler.request(position)
+    release.set()
+    wait_idle(scheduler)
+    scheduler.close()
+    assert seeks == [1, 19]
+
+
+def test_cancel_drops_pending_and_waits_for_running_seek():
+    seeks = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def seek(position):
+        seeks.append(position)
+        started.set()
+        release.wait(2)
+
+    scheduler = SeekScheduler(seek, min_interval=0)
+    scheduler.request(5)
+    assert started.wait(2)
+    scheduler.request(6)  # 属于上一首，换歌后不能再执行
+    threading.Timer(0.05, release.set).start()
+    scheduler.cancel()
+    assert release.is_set()  # cancel() 等到正在执行的跳转结束才返回
+    wait_idle(scheduler)
+    scheduler.request(7)
+    wait_idle(scheduler)
+    scheduler.close()
+    assert seeks == [5, 7]
+
+
+def test_failing_seek_does_not_stop_the_worker():
+    seeks = []
+
+    def seek(position):
+        seeks.append(position)
+        if position == 1:
+            raise RuntimeError("boom")
+
+    scheduler = SeekScheduler(seek, min_interval=0)
+    scheduler.request(1)
+    wait_idle(scheduler)
+    scheduler.request(2)
+    wait_idle(scheduler)
+    scheduler.close()
+    assert seeks == [1, 2]
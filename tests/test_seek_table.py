@@ -0,0 +1,62 @@
+import struct
+from array import array
+
+import pytest
+
+from audio_fixtures import MP3_FRAME_SAMPLES, mp3_frame_length, mp3_stream, synchsafe
+from player.seek_table import SeekTable, build_seek_table
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_vbr_table_lands_on_the_frame_containing_the_time(tmp_path):
+    bitrates = [128, 320, 64, 320, 128, 32] * 20
+    path = write(tmp_path, "vbr.mp3", mp3_stream(bitrates, xing=True))
+    table = build_seek_table(path)
+    assert table.vbr
+    assert len(table) == len(bitrates)  # Xing 头帧不计入
+    assert table.frame_samples == MP3_FRAME_SAMPLES and table.sample_rate == 44100
+
+    info_length = mp3_frame_length(128)
+    expected = info_length + sum(mp3_frame_length(kbps) for kbps in bitrates[:7])
+    assert table.offset_at(table.time_of(7) + table.frame_seconds / 2) == expected
+    assert table.frame_at(-1) == 0
+    assert table.frame_at(table.duration + 10) == len(bitrates) - 1
+
+
+def test_cbr_table_after_id3_tag(tmp_path):
+    tag = b"ID3\x04\x00\x00" + synchsafe(20) + bytes(20)
+    path = write(tmp_path, "cbr.mp3", tag + mp3_stream([128] * 10))
+    table = build_seek_table(path)
+    assert not table.vbr
+    assert table.stream_start == len(tag)
+    assert table.offsets[0] == len(tag)
+    assert table.fraction_at(0) == 0.0
+    assert 0 < table.fraction_at(table.duration) < 1
+
+
+def test_not_an_mp3(tmp_path):
+    assert build_seek_table(write(tmp_path, "empty.mp3", b"")) is None
+    assert build_seek_table(write(tmp_path, "noise.mp3", b"\x00\x01" * 500)) is None
+
+
+def test_round_trip():
+    table = SeekTable(48000, 1152, array("Q", [10, 400, 900]), 10, 1300, True)
+    copy = SeekTable.from_bytes(table.to_bytes())
+    assert list(copy.offsets) == [10, 400, 900]
+    assert (copy.sample_rate, copy.frame_samples, copy.stream_start, copy.stream_end, copy.vbr) == \
+        (48000, 1152, 10, 1300, True)
+
+
+def test_corrupt_tables_are_rejected():
+    data = SeekTable(44100, 1152, array("Q", [0, 417]), 0, 834, False).to_bytes()
+    with pytest.raises(ValueError):
+        SeekTable.from_bytes(b"XXXX" + data[4:])
+    with pytest.raises(ValueError):
+        SeekTable.from_bytes(data[:-3])  # 偏移数据被截断
+    with pytest.raises(struct.error):
+        SeekTable.from_bytes(data[:10])  # 文件头被截断
@@ -0,0 +1,87 @@
+import pytest
+
+from audio_fixtures import (flac_file, id3_text, id3v1_tag, id3v2_tag, mp3_stream, opus_file, synchsafe,
+                            vorbis_file)
+from player.tags import EMPTY_TAGS, MAX_TRACK_NUMBER, TagReader, _track_number, read_tags
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("3", 3),
+    (" 07/12 ", 7),
+    ("", 0),
+    ("/12", 0),
+    ("A1", 0),
+    ("-1", 0),
+    ("²", 0),  # 上标数字：isdigit() 为真但 int() 会出错
+    ("٣", 0),  # 阿拉伯-印度数字
+    ("１２", 0),  # 全角数字
+    ("1" * 25, MAX_TRACK_NUMBER),
+    ("65536", MAX_TRACK_NUMBER),
+])
+def test_track_number(text, expected):
+    assert _track_number(text) == expected
+
+
+def test_malformed_track_tags_do_not_drop_other_fields(tmp_path):
+    tag = id3v2_tag([("TIT2", id3_text("Title")), ("TRCK", id3_text("²/10"))])
+    assert read_tags(write(tmp_path, "a.mp3", tag + mp3_stream([128] * 3))) == ("Title", "", "", 0)
+    flac = flac_file(["TITLE=Song", "TRACKNUMBER=" + "9" * 22])
+    assert read_tags(write(tmp_path, "b.flac", flac)) == ("Song", "", "", MAX_TRACK_NUMBER)
+
+
+def test_id3v23_with_id3v1_fallback(tmp_path):
+    tag = id3v2_tag([("TIT2", id3_text("Héllo", encoding=1)), ("TPE2", id3_text("Band", encoding=0)),
+                     ("TRCK", id3_text("4/9"))])
+    data = tag + mp3_stream([128] * 3) + id3v1_tag("Old title", "Old artist", "Old album", 2)
+    # 专辑艺术家只在没有艺术家时使用
+    assert read_tags(write(tmp_path, "a.mp3", data)) == ("Héllo", "Old artist", "Old album", 4)
+
+
+def test_id3v24_multiple_values_and_control_characters(tmp_path):
+    tag = id3v2_tag([("TIT2", id3_text("One\x00Two")), ("TALB", id3_text("Al\x1fbum")),
+                     ("APIC", bytes(3000)), ("TPE1", id3_text("Artist"))], version=4)
+    assert read_tags(write(tmp_path, "a.mp3", tag + mp3_stream([128]))) == ("One", "Artist", "Album", 0)
+
+
+def test_id3v1_only(tmp_path):
+    data = mp3_stream([128] * 3) + id3v1_tag("Title", "Artist", "Album", 7)
+    assert read_tags(write(tmp_path, "a.mp3", data)) == ("Title", "Artist", "Album", 7)
+
+
+def test_vorbis_comments_in_flac_and_ogg(tmp_path):
+    comments = ["title=Song", "ALBUMARTIST=Band", "Album=Record", "TRACKNUMBER=2/11", "junk"]
+    expected = ("Song", "Band", "Record", 2)
+    assert read_tags(write(tmp_path, "a.flac", flac_file(comments))) == expected
+    assert read_tags(write(tmp_path, "a.opus", opus_file(comments))) == expected
+    assert read_tags(write(tmp_path, "a.ogg", vorbis_file(comments))) == expected
+
+
+@pytest.mark.parametrize("name, data", [
+    ("empty.mp3", b""),
+    ("header.mp3", b"ID3\x03\x00\x00" + synchsafe(100000) + b"TIT2\x00\x00\x00\xff"),  # 标签长度远超文件
+    ("frame.mp3", id3v2_tag([("TIT2", id3_text("x"))])[:-5]),
+    ("header.flac", b"fLaC\x84\x00"),
+    ("comments.flac", flac_file(["TITLE=Song"])[:60]),
+    ("page.ogg", b"OggS\x00\x02"),
+    ("packet.opus", opus_file(["TITLE=Song"])[:40]),
+    ("plain.wav", b"RIFF"),
+])
+def test_truncated_or_malformed_files(tmp_path, name, data):
+    tags = read_tags(write(tmp_path, name, data))
+    assert len(tags) == 4 and isinstance(tags[3], int)
+
+
+def test_tag_reader_keeps_order(tmp_path):
+    paths = [write(tmp_path, f"{index}.flac", flac_file([f"TITLE=Song {index}"])) for index in range(6)]
+    paths.append(str(tmp_path / "missing.flac"))
+    reader = TagReader(workers=3)
+    results = reader.read_many(paths)
+    reader.close()
+    assert [title for title, _, _, _ in results] == [f"Song {index}" for index in range(6)] + [""]
+    assert results[-1] == EMPTY_TAGS